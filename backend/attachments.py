@@ -0,0 +1,239 @@
+import hashlib
+import os
+import re
+import time
+import uuid
+from typing import AsyncIterator, Optional, Tuple
+
+import anyio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+import jobs
+import models
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+CHUNK_SIZE = 1024 * 1024  # Bytes written to disk, and read back for downloads, per call
+MAX_ATTACHMENT_BYTES = int(os.getenv("MAX_ATTACHMENT_BYTES", str(100 * 1024 * 1024)))
+# Set behind nginx (e.g. "/protected-uploads/") to hand downloads to its sendfile via X-Accel-Redirect
+ACCEL_REDIRECT_PREFIX = os.getenv("ATTACHMENT_ACCEL_REDIRECT")
+# A blob touched this recently is never reclaimed: an upload that found it may not have inserted its row yet
+BLOB_GRACE_SECONDS = float(os.getenv("ATTACHMENT_BLOB_GRACE_SECONDS", "3600"))
+
+
+class AttachmentTooLarge(Exception):
+    pass
+
+# -------------------------
+# Content-addressed storage
+# -------------------------
+# Files live at UPLOAD_DIR/blobs/<first two hex digits>/<sha256>. Identical uploads share one
+# blob; the attachments table holds one row per upload pointing at it.
+
+def safe_filename(name: Optional[str]) -> str:
+    # Base name only, without quotes or control characters, for Content-Disposition
+    name = os.path.basename((name or "").replace("\\", "/"))
+    name = re.sub(r'[\x00-\x1f"\x7f]', "", name).strip()
+    return name[:255] or "attachment"
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(UPLOAD_DIR, "blobs", sha256[:2], sha256)
+
+
+async def store(chunks: AsyncIterator[bytes]) -> Tuple[str, int]:
+    # Streams the body into a temporary file in CHUNK_SIZE writes while hashing it, then moves
+    # it into place, or drops it when the blob already exists. Returns (sha256, size).
+    tmp_dir = os.path.join(UPLOAD_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    size = 0
+    pending = bytearray()
+    try:
+        async with await anyio.open_file(tmp_path, "wb") as handle:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > MAX_ATTACHMENT_BYTES:
+                    raise AttachmentTooLarge(f"Attachments are limited to {MAX_ATTACHMENT_BYTES} bytes")
+                digest.update(chunk)
+                pending += chunk
+                if len(pending) >= CHUNK_SIZE:
+                    await handle.write(bytes(pending))
+                    pending.clear()
+            if pending:
+                await handle.write(bytes(pending))
+        sha256 = digest.hexdigest()
+        target = blob_path(sha256)
+        try:
+            os.utime(target)  # Reused; fresh again, so it is not reclaimed before this upload's row exists
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp_path, target)  # Atomic; a concurrent identical upload just replaces it
+        return sha256, size
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+async def reclaim(db: AsyncSession, sha256: str) -> bool:
+    # Removes the blob unless a row points at it or an upload touched it within the grace period.
+    # It is moved aside before the checks, so an identical upload from then on writes a new copy
+    # instead of relying on this one; one that found it earlier left it fresh. True if removed.
+    referenced = select(models.Attachment.id).where(models.Attachment.sha256 == sha256).limit(1)
+    if await db.scalar(referenced) is not None:
+        return False  # Shared with other attachments; checked first so downloads never see it moved
+    tmp_dir = os.path.join(UPLOAD_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    aside = os.path.join(tmp_dir, f"{sha256}.{uuid.uuid4().hex}.reclaim")
+    try:
+        os.rename(blob_path(sha256), aside)
+    except FileNotFoundError:
+        return False
+    fresh = time.time() - os.stat(aside).st_mtime < BLOB_GRACE_SECONDS
+    await db.rollback()  # A new snapshot, so the re-check sees rows committed meanwhile
+    if fresh or await db.scalar(referenced) is not None:
+        os.rename(aside, blob_path(sha256))  # Same content as any copy written meanwhile
+        return False
+    os.remove(aside)
+    return True
+
+
+@jobs.handler("reclaim_blob")
+async def reclaim_blob(payload: dict):
+    # Enqueued by crud.delete_attachment to run once the grace period has passed
+    from database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        await reclaim(db, payload["sha256"])
+
+
+async def collect_garbage(db: AsyncSession) -> int:
+    # Removes blobs no attachment row points at. Deleting a meeting, record or user removes
+    # their attachment rows in bulk and leaves the files for this sweep.
+    referenced = set((await db.scalars(select(models.Attachment.sha256).distinct())).all())
+    removed = 0
+    blobs = os.path.join(UPLOAD_DIR, "blobs")
+    for directory, _, files in os.walk(blobs):
+        for name in files:
+            if name not in referenced and await reclaim(db, name):
+                removed += 1
+    return removed
+
+# -------------------------
+# Downloads
+# -------------------------
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    # A single "bytes=start-end" range as an inclusive (start, end) pair. None means send the
+    # whole file (no header, or several ranges, which may be ignored); ValueError means 416.
+    if not header or "," in header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        raise ValueError("Malformed range")
+    first, last = match.groups()
+    if first == "":
+        start, end = max(size - int(last), 0), size - 1  # Suffix range: the last N bytes
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+class AttachmentResponse(Response):
+    # Serves a blob with Range support. The body goes out by the first available route:
+    #   1. nginx X-Accel-Redirect when ATTACHMENT_ACCEL_REDIRECT is set (nginx sendfile and ranges)
+    #   2. the ASGI "http.response.zerocopysend" extension when the server offers it
+    #   3. CHUNK_SIZE reads streamed from a worker thread
+    def __init__(self, attachment: models.Attachment, range_header: Optional[str] = None):
+        self.background = None
+        self.raw_headers = []
+        self.attachment = attachment
+        self.path = blob_path(attachment.sha256)
+        self.size = attachment.size
+        self.status_code = 200
+        self.start, self.end = 0, self.size - 1
+        self.header_map = {
+            "content-type": attachment.content_type or "application/octet-stream",
+            "content-disposition": f'attachment; filename="{attachment.filename}"',
+            "accept-ranges": "bytes",
+            "etag": f'"{attachment.sha256}"',
+            "cache-control": "private, max-age=31536000, immutable",
+        }
+        try:
+            byte_range = parse_range(range_header, self.size)
+        except ValueError:
+            self.status_code = 416
+            self.header_map["content-range"] = f"bytes */{self.size}"
+            self.start, self.end = 0, -1
+            return
+        if byte_range is not None:
+            self.status_code = 206
+            self.start, self.end = byte_range
+            self.header_map["content-range"] = f"bytes {self.start}-{self.end}/{self.size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        length = self.end - self.start + 1
+        headers = dict(self.header_map)
+        if ACCEL_REDIRECT_PREFIX and self.status_code != 416:
+            # nginx answers Range itself from the full file
+            headers.pop("content-range", None)
+            headers["x-accel-redirect"] = ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + os.path.relpath(self.path, UPLOAD_DIR)
+            await self._start(send, 200, headers, 0)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await self._start(send, self.status_code, headers, length)
+        if length <= 0 or scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as handle:
+                await send({"type": "http.response.zerocopysend", "file": handle.fileno(), "offset": self.start, "count": length, "more_body": False})
+            return
+        async with await anyio.open_file(self.path, "rb") as handle:
+            await handle.seek(self.start)
+            remaining = length
+            while remaining > 0:
+                chunk = await handle.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
+
+    async def _start(self, send: Send, status_code: int, headers: dict, length: int):
+        headers["content-length"] = str(max(length, 0))
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(key.encode(), value.encode("latin-1", "replace")) for key, value in headers.items()],
+        })
+
+# -------------------------
+# Command line
+# -------------------------
+#   python attachments.py gc
+
+async def _run_gc() -> int:
+    from database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        return await collect_garbage(db)
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+    if sys.argv[1:] != ["gc"]:
+        sys.exit("usage: python attachments.py gc")
+    print(f"Removed {asyncio.run(_run_gc())} unreferenced blobs")
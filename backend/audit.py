@@ -0,0 +1,280 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import date, datetime
+from typing import Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+import models
+
+logger = logging.getLogger(__name__)
+
+# AUDIT_LOG_FILE sends events to a local append-only JSON lines file instead of the audit_events table
+AUDIT_LOG_FILE = os.getenv("AUDIT_LOG_FILE")
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "1"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))  # Also flushes early once this many are waiting
+AUDIT_MAX_PENDING = int(os.getenv("AUDIT_MAX_PENDING", "100000"))  # Bounds memory while the sink is down
+GENESIS = "0" * 64  # prev_hash of the first event of a chain
+FIELDS = ("chain", "seq", "occurred_at", "actor_id", "actor_role", "action", "target_type", "target_id")
+
+
+class Actor(NamedTuple):
+    id: Optional[int]
+    role: Optional[str]
+
+
+ANONYMOUS = Actor(None, None)
+
+# -------------------------
+# Hash chain
+# -------------------------
+# Every event carries the hash of the one before it in its chain, so changing or removing an
+# event breaks every later link. Each process writes its own chain, numbered by seq, which
+# keeps the chains linear with several workers and never needs a read before a write.
+
+def digest(event: dict) -> str:
+    fields = [event["occurred_at"].isoformat() if name == "occurred_at" else event[name] for name in FIELDS]
+    payload = json.dumps(fields, separators=(",", ":"))
+    return hashlib.sha256((event["prev_hash"] + payload).encode()).hexdigest()
+
+
+class ChainCheck:
+    # Fed events ordered by (chain, seq); reports gaps, broken links and altered events. Events
+    # cut from the end of a chain leave no trace in it; compare with the head in /metrics/audit.
+    def __init__(self, max_errors: int = 100):
+        self.max_errors = max_errors
+        self.chains = 0
+        self.events = 0
+        self.errors: List[str] = []
+        self._chain = None
+        self._prev = GENESIS
+        self._seq = 1
+
+    def _error(self, message: str):
+        if len(self.errors) < self.max_errors:
+            self.errors.append(message)
+
+    def feed(self, event: dict):
+        if event["chain"] != self._chain:
+            self._chain, self._prev, self._seq = event["chain"], GENESIS, 1
+            self.chains += 1
+        self.events += 1
+        name, seq = event["chain"], event["seq"]
+        if seq != self._seq:
+            self._error(f"{name}: expected seq {self._seq}, found {seq}")
+        if event["prev_hash"] != self._prev:
+            self._error(f"{name}: event {seq} does not follow the one before it")
+        if digest(event) != event["hash"]:
+            self._error(f"{name}: event {seq} has been altered")
+        self._prev, self._seq = event["hash"], seq + 1
+
+    def result(self) -> dict:
+        return {"valid": not self.errors, "chains": self.chains, "events": self.events, "errors": self.errors}
+
+
+async def verify_table(db: AsyncSession) -> dict:
+    check = ChainCheck()
+    columns = [getattr(models.AuditEvent, name) for name in (*FIELDS, "prev_hash", "hash")]
+    result = await db.stream(select(*columns).order_by(models.AuditEvent.chain, models.AuditEvent.seq))
+    async for row in result:
+        check.feed(row._asdict())
+    return check.result()
+
+
+def verify_file(path: str) -> dict:
+    # Lines from several processes interleave in the file; each chain is checked in seq order
+    with open(path) as handle:
+        events = [json.loads(line) for line in handle if line.strip()]
+    check = ChainCheck()
+    for event in sorted(events, key=lambda event: (event["chain"], event["seq"])):
+        event["occurred_at"] = datetime.fromisoformat(event["occurred_at"])
+        check.feed(event)
+    return check.result()
+
+# -------------------------
+# Partitions
+# -------------------------
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+async def ensure_partition(db: AsyncSession, month: date):
+    # Postgres only: creates the monthly partition before its first row arrives. Until it
+    # exists rows land in audit_events_default, which is why this runs a month ahead.
+    if db.bind.dialect.name != "postgresql":
+        return
+    start, end = month.replace(day=1), _next_month(month)
+    await db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS audit_events_{start:%Y_%m} PARTITION OF audit_events "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    await db.commit()
+
+# -------------------------
+# Buffered writer
+# -------------------------
+
+class AuditLog:
+    # record() only appends to a list, so auditing adds no I/O to the request. A background task
+    # chains and writes what has accumulated every AUDIT_FLUSH_SECONDS, or sooner once
+    # AUDIT_BATCH_SIZE events wait, in one multi-row insert (or one file append) per batch. A
+    # failed write keeps the batch for the next attempt; past AUDIT_MAX_PENDING new events are
+    # dropped and counted rather than growing without bound.
+    def __init__(self, path: Optional[str] = AUDIT_LOG_FILE, flush_seconds: float = AUDIT_FLUSH_SECONDS,
+                 batch_size: int = AUDIT_BATCH_SIZE, max_pending: int = AUDIT_MAX_PENDING):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.chain: Optional[str] = None  # Named on first write, in the process that writes
+        self.seq = 0
+        self.head = GENESIS
+        self._pending: List[tuple] = []
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._partition_month: Optional[date] = None
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dropped = 0
+
+    def record(self, actor: Actor, action: str, target_type: str, target_id: Optional[int]):
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.error("Audit buffer full, %d events dropped", self.dropped)
+            return
+        self._pending.append((datetime.utcnow(), actor.id, actor.role, action, target_type, target_id))
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def record_many(self, actor: Actor, action: str, target_type: str, target_ids: Iterable[int]):
+        for target_id in target_ids:
+            self.record(actor, action, target_type, target_id)
+
+    def _chain(self, batch: List[tuple]) -> List[dict]:
+        if self.chain is None:
+            self.chain = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        events, seq, head = [], self.seq, self.head
+        for occurred_at, actor_id, actor_role, action, target_type, target_id in batch:
+            seq += 1
+            event = {
+                "chain": self.chain, "seq": seq, "occurred_at": occurred_at, "actor_id": actor_id,
+                "actor_role": actor_role, "action": action, "target_type": target_type,
+                "target_id": target_id, "prev_hash": head,
+            }
+            event["hash"] = head = digest(event)
+            events.append(event)
+        return events
+
+    async def _write(self, events: List[dict]):
+        if self.path:
+            lines = "".join(
+                json.dumps({**event, "occurred_at": event["occurred_at"].isoformat()}, separators=(",", ":")) + "\n"
+                for event in events
+            )
+            await asyncio.to_thread(self._append, lines.encode())
+            return
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(models.AuditEvent), events)
+            await db.commit()
+
+    def _append(self, data: bytes):
+        # One O_APPEND write per batch, so batches from several workers never interleave mid-line
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    async def flush(self):
+        async with self._lock:
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                events = self._chain(batch)
+                try:
+                    await self._write(events)
+                except Exception:
+                    self.failures += 1
+                    logger.exception("Audit write failed; %d events kept for retry", len(self._pending))
+                    return
+                # Only appends happen meanwhile, so the batch is still the front of the list
+                del self._pending[:len(batch)]
+                self.seq, self.head = events[-1]["seq"], events[-1]["hash"]
+                self.written += len(events)
+                self.flushes += 1
+
+    async def _maintain(self):
+        month = _next_month(datetime.utcnow().date())
+        if self.path or self._partition_month == month:
+            return
+        async with AsyncSessionLocal() as db:
+            await ensure_partition(db, month)
+        self._partition_month = month
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self._maintain()
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Audit flusher failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Writes whatever is still buffered before the worker exits
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def snapshot(self) -> dict:
+        return {
+            "sink": self.path or "table",
+            "chain": self.chain,
+            "seq": self.seq,
+            "head": self.head,
+            "pending": len(self._pending),
+            "written": self.written,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "dropped": self.dropped,
+        }
+
+
+log = AuditLog()
+
+
+async def _verify_database() -> dict:
+    async with AsyncSessionLocal() as db:
+        return await verify_table(db)
+
+
+if __name__ == "__main__":
+    # python audit.py [file]: checks the chains in an AUDIT_LOG_FILE, or in the table without one
+    import sys
+    path = sys.argv[1] if len(sys.argv) > 1 else AUDIT_LOG_FILE
+    report = verify_file(path) if path else asyncio.run(_verify_database())
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["valid"] else 1)
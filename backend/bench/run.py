@@ -0,0 +1,253 @@
+# Drives the real endpoints with concurrent clients and reports latency percentiles,
+# throughput and SQL statements per request. Run from backend/ against a seeded database:
+#   DATABASE_URL=sqlite:///bench.db python -m bench.run --save bench/results.json --baseline bench/baseline.json
+# Without --url the app runs in-process through httpx's ASGI transport, which is what makes
+# query counting possible; with --url a running server is measured over the network.
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy import event, func, select
+
+from bench.seed import BENCH_PASSWORD
+from database import SessionLocal, async_engine
+import models
+
+SCENARIOS = ["token", "doctor_requests", "meetings", "medicines"]
+# Metrics where a larger number is an improvement; for all others larger is a regression
+HIGHER_IS_BETTER = {"throughput_rps"}
+COMPARED = ["p50_ms", "p95_ms", "p99_ms", "throughput_rps", "queries_per_request"]
+
+
+class QueryCounter:
+    # Counts statements sent through the API's async engine while a scenario runs
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+    def install(self):
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    # Nearest-rank percentile over sorted samples
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def table_counts() -> Dict[str, int]:
+    with SessionLocal() as db:
+        return {model.__tablename__: db.scalar(select(func.count()).select_from(model))
+                for model in (models.User, models.Meeting, models.MedicalRecord, models.Medicine)}
+
+
+def load_fixtures(sample_size: int, seed_value: int) -> dict:
+    # Picks the accounts and records the scenarios act on straight from the database
+    rng = random.Random(seed_value)
+    with SessionLocal() as db:
+        doctors = db.scalars(select(models.User.username).where(models.User.role == "doctor").order_by(models.User.id)).all()
+        patients = db.scalars(select(models.User.username).where(models.User.role == "patient").order_by(models.User.id)).all()
+        if not doctors or not patients:
+            raise SystemExit("Benchmark database is empty; run python -m bench.seed first.")
+        doctors = rng.sample(doctors, min(sample_size, len(doctors)))
+        # Medicines may only be prescribed by the meeting's doctor, so records come from sampled doctors
+        records = db.execute(
+            select(models.MedicalRecord.id, models.User.username)
+            .join(models.Meeting, models.MedicalRecord.meeting_id == models.Meeting.id)
+            .join(models.User, models.Meeting.doctor_id == models.User.id)
+            .where(models.User.username.in_(doctors))
+            .order_by(models.MedicalRecord.id)
+        ).all()
+    if not records:
+        raise SystemExit("Sampled doctors have no medical records; reseed with more meetings.")
+    return {
+        "doctors": doctors,
+        "patients": rng.sample(patients, min(sample_size, len(patients))),
+        "records": [tuple(row) for row in rng.sample(records, min(sample_size * 10, len(records)))],
+    }
+
+
+async def login(client: httpx.AsyncClient, username: str) -> str:
+    response = await client.post("/token", data={"username": username, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def build_scenarios(fixtures: dict, tokens: Dict[str, str], rng: random.Random) -> Dict[str, Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]]:
+    def auth(username: str) -> dict:
+        return {"Authorization": f"Bearer {tokens[username]}"}
+
+    async def token(client):
+        return await client.post("/token", data={"username": rng.choice(fixtures["patients"]), "password": BENCH_PASSWORD})
+
+    async def doctor_requests(client):
+        return await client.get("/doctor_requests", headers=auth(rng.choice(fixtures["doctors"])))
+
+    async def meetings(client):
+        return await client.get("/meetings", params={"limit": 100})
+
+    async def medicines(client):
+        record_id, doctor = rng.choice(fixtures["records"])
+        payload = {"name": "Benchmarkol", "dosage": 10.0, "frequency": "Once a day"}
+        return await client.post(f"/medical_records/{record_id}/medicines", json=payload, headers=auth(doctor))
+
+    return {"token": token, "doctor_requests": doctor_requests, "meetings": meetings, "medicines": medicines}
+
+
+async def run_scenario(client: httpx.AsyncClient, call, requests: int, concurrency: int, counter: Optional[QueryCounter]) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await call(client)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    queries_before = counter.count if counter else 0
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "queries_per_request": round((counter.count - queries_before) / len(latencies), 2) if counter and latencies else None,
+    }
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    volumes = table_counts()
+    fixtures = load_fixtures(args.sample, args.seed)
+    counter = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        from main import app
+        counter = QueryCounter()
+        counter.install()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=args.timeout)
+
+    async with client:
+        tokens = {}
+        for username in fixtures["doctors"]:
+            tokens[username] = await login(client, username)
+        calls = build_scenarios(fixtures, tokens, rng)
+        results = {}
+        for name in args.scenarios:
+            if args.warmup:
+                await run_scenario(client, calls[name], args.warmup, args.concurrency, None)
+            requests = args.requests if name != "token" else max(1, args.requests // args.token_divisor)
+            results[name] = await run_scenario(client, calls[name], requests, args.concurrency, counter)
+
+    return {
+        "meta": {
+            "target": args.url or "in-process",
+            "database": async_engine.dialect.name,
+            "volumes": volumes,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "endpoints": results,
+    }
+
+# -------------------------
+# Reporting
+# -------------------------
+
+def print_report(report: dict):
+    header = f"{'endpoint':<18}{'reqs':>7}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'queries':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, row in report["endpoints"].items():
+        queries = "-" if row["queries_per_request"] is None else f"{row['queries_per_request']:.2f}"
+        print(f"{name:<18}{row['requests']:>7}{row['errors']:>6}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+              f"{row['p99_ms']:>10.2f}{row['throughput_rps']:>10.1f}{queries:>9}")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    # Prints the change of every metric against the baseline and returns the regressions
+    # larger than tolerance percent
+    regressions = []
+    print(f"\nAgainst baseline recorded {baseline.get('meta', {}).get('recorded_at', '?')}:")
+    for name, row in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if before is None:
+            print(f"  {name}: not in baseline")
+            continue
+        changes = []
+        for metric in COMPARED:
+            old, new = before.get(metric), row.get(metric)
+            if old is None or new is None:
+                continue
+            delta = (new - old) / old * 100 if old else 0.0
+            changes.append(f"{metric} {old} -> {new} ({delta:+.1f}%)")
+            if metric == "queries_per_request":
+                # Statement counts are near deterministic; half a statement more per request is an N+1 creeping in
+                regressed = new - old >= 0.5
+            else:
+                regressed = (-delta if metric in HIGHER_IS_BETTER else delta) > tolerance
+            if regressed:
+                regressions.append(f"{name}.{metric} {delta:+.1f}%")
+        print(f"  {name}: " + ", ".join(changes))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latency benchmark for the hospital API")
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--token-divisor", type=int, default=5, help="/token runs requests/divisor times; bcrypt is slow by design")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--sample", type=int, default=20, help="Doctors and patients acting as clients")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Compare against a previously saved result")
+    parser.add_argument("--tolerance", type=float, default=20.0, help="Allowed regression in percent before exiting non-zero")
+    args = parser.parse_args(argv)
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # One INFO line per request otherwise
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.save:
+        with open(args.save, "w") as handle:
+            json.dump(report, handle, indent=2)
+            handle.write("\n")
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as handle:
+            regressions = compare(report, json.load(handle), args.tolerance)
+        if regressions:
+            print("\nRegressions: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# Seeds a benchmark database with realistic volumes. Run from backend/:
+#   DATABASE_URL=sqlite:///bench.db python -m bench.seed --patients 2000
+# The schema is migrated to head first; use --reset to start from an empty database.
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import func, insert, select
+
+from database import SessionLocal
+from hashing import get_context
+import models
+
+BENCH_PASSWORD = "bench-password"
+BATCH_SIZE = 5000
+FREQUENCIES = ["Once a day", "Twice a day", "Every 8 hours", "As needed"]
+DRUGS = ["Amoxicillin", "Ibuprofen", "Paracetamol", "Metformin", "Lisinopril", "Omeprazole", "Atorvastatin", "Cetirizine"]
+DIAGNOSES = ["Seasonal flu", "Hypertension follow-up", "Type 2 diabetes check", "Migraine", "Back pain", "Allergic rhinitis"]
+
+
+def migrate(reset: bool):
+    config = Config("alembic.ini")
+    config.attributes["configure_logger"] = False
+    if reset:
+        command.downgrade(config, "base")
+    command.upgrade(config, "head")
+
+
+def insert_batches(db, model, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+
+def seed(doctors: int, patients: int, meetings_per_patient: int, records_per_meeting: int, medicines_per_record: int, seed_value: int):
+    rng = random.Random(seed_value)
+    hashed = get_context().hash(BENCH_PASSWORD)  # One bcrypt hash shared by every seeded account
+    with SessionLocal() as db:
+        if db.scalar(select(func.count()).select_from(models.User)):
+            raise SystemExit("Database already has users; rerun with --reset to reseed it.")
+
+        users = [{"username": "admin", "email": "admin@bench.local", "name": "Admin", "surname": "Bench",
+                  "role": "admin", "is_confirmed": True, "hashed_password": hashed}]
+        users += [{"username": f"doctor{i}", "email": f"doctor{i}@bench.local", "name": "Doctor", "surname": str(i),
+                   "role": "doctor", "is_confirmed": True, "hashed_password": hashed} for i in range(doctors)]
+        users += [{"username": f"patient{i}", "email": f"patient{i}@bench.local", "name": "Patient", "surname": str(i),
+                   "role": "patient", "is_confirmed": False, "hashed_password": hashed} for i in range(patients)]
+        insert_batches(db, models.User, users)
+        doctor_ids = db.scalars(select(models.User.id).where(models.User.role == "doctor").order_by(models.User.id)).all()
+        patient_ids = db.scalars(select(models.User.id).where(models.User.role == "patient").order_by(models.User.id)).all()
+
+        # Each doctor's bookings walk forward in 30 minute steps so no slot is booked twice
+        next_slot = {doctor_id: datetime(2024, 1, 1, 9) for doctor_id in doctor_ids}
+        meetings = []
+        for patient_id in patient_ids:
+            for _ in range(meetings_per_patient):
+                doctor_id = rng.choice(doctor_ids)
+                next_slot[doctor_id] += timedelta(minutes=30)
+                meetings.append({"patient_id": patient_id, "doctor_id": doctor_id, "scheduled_date": next_slot[doctor_id],
+                                 "status": rng.choices(["Pending", "Confirmed", "Reject"], [3, 6, 1])[0]})
+        insert_batches(db, models.Meeting, meetings)
+        meeting_ids = db.scalars(select(models.Meeting.id).order_by(models.Meeting.id)).all()
+
+        records = [{"meeting_id": meeting_id, "description": rng.choice(DIAGNOSES), "created_at": datetime(2024, 1, 1)}
+                   for meeting_id in meeting_ids for _ in range(records_per_meeting)]
+        insert_batches(db, models.MedicalRecord, records)
+        record_ids = db.scalars(select(models.MedicalRecord.id).order_by(models.MedicalRecord.id)).all()
+
+        medicines = [{"medical_record_id": record_id, "name": rng.choice(DRUGS), "dosage": rng.choice([5.0, 10.0, 250.0, 500.0]),
+                      "frequency": rng.choice(FREQUENCIES)} for record_id in record_ids for _ in range(medicines_per_record)]
+        insert_batches(db, models.Medicine, medicines)
+        db.commit()
+        return {"users": len(users), "meetings": len(meetings), "medical_records": len(records), "medicines": len(medicines)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a benchmark database")
+    parser.add_argument("--doctors", type=int, default=50)
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--meetings-per-patient", type=int, default=10)
+    parser.add_argument("--records-per-meeting", type=int, default=1)
+    parser.add_argument("--medicines-per-record", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate the schema first")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    migrate(args.reset)
+    counts = seed(args.doctors, args.patients, args.meetings_per_patient, args.records_per_meeting, args.medicines_per_record, args.seed)
+    print(f"Seeded {counts} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import argparse
+import asyncio
+import codecs
+import csv
+import io
+import json
+import sys
+from datetime import date, datetime, time
+from typing import Any, AsyncIterator, Iterable, List, Literal, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import Select, insert, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, read_session
+import cache
+from hashing import hash_password
+import models
+import schemas
+
+BATCH_SIZE = 1000  # Rows per multi-row INSERT
+EXPORT_CHUNK = 1000  # Rows fetched per round trip from the server-side cursor
+READ_CHUNK = 64 * 1024
+MAX_REPORTED_ERRORS = 1000
+
+Entity = Literal["users", "meetings", "medical_records", "medicines"]
+Format = Literal["csv", "ndjson"]
+
+ENTITIES = {
+    "users": (models.User, schemas.UserImport),
+    "meetings": (models.Meeting, schemas.MeetingImport),
+    "medical_records": (models.MedicalRecord, schemas.MedicalRecordImport),
+    "medicines": (models.Medicine, schemas.MedicineImport),
+}
+EXPORT_EXCLUDE = {"users": {"hashed_password"}}
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# -------------------------
+# Parsing
+# -------------------------
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # Splits an incoming byte stream into text lines without holding more than one chunk
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: Format) -> AsyncIterator[Tuple[int, Union[dict, Exception]]]:
+    # Yields (line number, record) pairs; unparseable input is yielded as an exception
+    line_no = 0
+    if fmt == "ndjson":
+        async for line in iter_lines(chunks):
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield line_no, exc
+                continue
+            yield line_no, record if isinstance(record, dict) else ValueError("Expected a JSON object")
+        return
+
+    header = None
+    buffered: List[str] = []
+    first_line = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not buffered:
+            first_line = line_no
+        buffered.append(line)
+        # An odd number of quotes means a quoted field continues on the next line
+        if sum(part.count('"') for part in buffered) % 2:
+            continue
+        row = next(csv.reader(buffered), [])
+        buffered = []
+        if header is None:
+            header = row
+            continue
+        if not any(row):
+            continue
+        if len(row) != len(header):
+            yield first_line, ValueError(f"Expected {len(header)} fields, got {len(row)}")
+            continue
+        # Empty CSV cells mean "not provided" so model defaults apply
+        yield first_line, {key: value for key, value in zip(header, row) if value != ""}
+    if buffered:
+        yield first_line, ValueError("Unterminated quoted field")
+
+
+async def iter_file(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as handle:
+        while chunk := handle.read(READ_CHUNK):
+            yield chunk
+
+# -------------------------
+# Import
+# -------------------------
+
+def _fail(report: schemas.ImportReport, line: int, error: Exception):
+    report.failed += 1
+    if len(report.errors) < MAX_REPORTED_ERRORS:
+        message = str(error).strip()
+        report.errors.append(schemas.RowError(line=line, error=message.splitlines()[0] if message else type(error).__name__))
+
+
+async def _hold_transaction(db: AsyncSession):
+    # pysqlite (and aiosqlite over it) opens a transaction only ahead of a write, so the first
+    # batch's SAVEPOINT would start one that its RELEASE commits, and the import would commit
+    # batch by batch. Opening it here keeps every batch in the one transaction, as on Postgres.
+    # Only imports do this: everywhere else reads stay outside a transaction and take no lock.
+    if db.bind.dialect.name != "sqlite":
+        return
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    if not raw.driver_connection.in_transaction:
+        await connection.exec_driver_sql("BEGIN")
+
+
+async def _flush(db: AsyncSession, model, batch: List[Tuple[int, dict]], report: schemas.ImportReport):
+    try:
+        async with db.begin_nested():
+            await db.execute(insert(model), [values for _, values in batch])
+        report.inserted += len(batch)
+        return
+    except DBAPIError:
+        pass
+    # The batch hit a constraint; replay it row by row to report exactly which rows failed
+    for line, values in batch:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(model), [values])
+            report.inserted += 1
+        except DBAPIError as exc:
+            _fail(report, line, exc.orig or exc)
+
+
+async def _sync_sequence(db: AsyncSession, model):
+    # Explicit ids bypass the Postgres sequence; move it past the largest id
+    if db.bind.dialect.name == "postgresql":
+        table = model.__tablename__
+        await db.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+
+async def import_rows(db: AsyncSession, entity: Entity, records: AsyncIterator[Tuple[int, Union[dict, Exception]]]) -> schemas.ImportReport:
+    # Validates every row, inserts valid ones in multi-row batches and commits once at the end
+    model, schema = ENTITIES[entity]
+    report = schemas.ImportReport(entity=entity)
+    await _hold_transaction(db)
+    batch: List[Tuple[int, dict]] = []
+    explicit_ids = False
+    async for line, record in records:
+        if isinstance(record, Exception):
+            _fail(report, line, record)
+            continue
+        try:
+            values = schema.model_validate(record).model_dump(exclude_none=True)
+        except ValidationError as exc:
+            error = exc.errors()[0]
+            location = ".".join(map(str, error["loc"]))
+            _fail(report, line, ValueError(f"{location}: {error['msg']}" if location else error["msg"]))
+            continue
+        if "password" in values:
+            values["hashed_password"] = await hash_password(values.pop("password"))
+        explicit_ids = explicit_ids or "id" in values
+        batch.append((line, values))
+        if len(batch) >= BATCH_SIZE:
+            await _flush(db, model, batch, report)
+            batch = []
+    if batch:
+        await _flush(db, model, batch, report)
+    if explicit_ids:
+        await _sync_sequence(db, model)
+    await db.commit()
+    if entity == "users" and report.inserted:
+        await cache.responses.invalidate("users")
+    return report
+
+# -------------------------
+# Export
+# -------------------------
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return value
+
+
+def _csv_line(values: Iterable[Any]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(["" if value is None else _plain(value) for value in values])
+    return buffer.getvalue()
+
+
+def export_columns(entity: Entity) -> List[str]:
+    model, _ = ENTITIES[entity]
+    return [column.key for column in model.__table__.columns if column.key not in EXPORT_EXCLUDE.get(entity, ())]
+
+
+async def stream_rows(stmt: Select, columns: List[str], fmt: Format) -> AsyncIterator[str]:
+    # Iterates a server-side cursor in EXPORT_CHUNK partitions, so memory stays flat
+    # regardless of table size. Uses its own session, on a read replica when one is
+    # configured: the request's session is closed before a streaming response body is produced.
+    if fmt == "csv":
+        yield _csv_line(columns)
+    async with read_session() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_CHUNK))
+        async for partition in result.partitions():
+            if fmt == "csv":
+                yield "".join(_csv_line(row) for row in partition)
+            else:
+                yield "".join(json.dumps(dict(zip(columns, map(_plain, row)))) + "\n" for row in partition)
+
+
+def export_rows(entity: Entity, fmt: Format) -> AsyncIterator[str]:
+    model, _ = ENTITIES[entity]
+    columns = export_columns(entity)
+    stmt = select(*[model.__table__.c[column] for column in columns]).order_by(model.id)
+    return stream_rows(stmt, columns, fmt)
+
+# -------------------------
+# Command line
+# -------------------------
+#   python bulk.py import users users.csv
+#   python bulk.py export meetings --format ndjson -o meetings.ndjson
+
+def _guess_format(path: str) -> Format:
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+async def _run_import(entity: Entity, path: str, fmt: Format) -> schemas.ImportReport:
+    async with AsyncSessionLocal() as db:
+        return await import_rows(db, entity, iter_records(iter_file(path), fmt))
+
+
+async def _run_export(entity: Entity, fmt: Format, output):
+    async for piece in export_rows(entity, fmt):
+        output.write(piece)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import and export of hospital data")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import")
+    import_parser.add_argument("entity", choices=list(ENTITIES))
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=["csv", "ndjson"])
+    export_parser = commands.add_parser("export")
+    export_parser.add_argument("entity", choices=list(ENTITIES))
+    export_parser.add_argument("--format", choices=["csv", "ndjson"], default="ndjson")
+    export_parser.add_argument("-o", "--output")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        report = asyncio.run(_run_import(args.entity, args.path, args.format or _guess_format(args.path)))
+        print(report.model_dump_json(indent=2))
+        return 1 if report.failed else 0
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        asyncio.run(_run_export(args.entity, args.format, output))
+    finally:
+        if args.output:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
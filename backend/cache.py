@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL")  # e.g. redis://localhost:6379/0; unset keeps the cache in-process
+
+
+class TTLCache:
+    # In-process LRU with a per-entry time to live. Entries are per worker process, so
+    # invalidation only reaches the local worker; the TTL bounds staleness elsewhere.
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+
+# Authenticated principals keyed by user id, filled by main.get_current_user
+principals = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+
+# -------------------------
+# Response cache
+# -------------------------
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+    headers: Dict[str, str]
+
+    @classmethod
+    def build(cls, body: bytes, headers: Optional[Dict[str, str]] = None) -> "CachedResponse":
+        return cls(f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', body, headers or {})
+
+
+class MemoryBackend:
+    # Per worker; a write served by another worker only becomes visible here after the TTL
+    def __init__(self, maxsize: int, ttl: float):
+        self.entries = TTLCache(maxsize, ttl)
+        self._generations: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: CachedResponse):
+        self.entries.set(key, value)
+
+    async def generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    async def bump(self, namespace: str):
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def snapshot(self) -> dict:
+        return {"backend": "memory", **self.entries.snapshot()}
+
+
+class RedisBackend:
+    # Shared by every worker, so invalidation is immediate everywhere
+    def __init__(self, url: str, ttl: float, prefix: str = "response-cache"):
+        import redis.asyncio  # Optional dependency, only needed when RESPONSE_CACHE_URL is set
+        self.client = redis.asyncio.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        raw = await self.client.get(f"{self.prefix}:{key}")
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return CachedResponse(entry["etag"], entry["body"].encode(), entry["headers"])
+
+    async def set(self, key: str, value: CachedResponse):
+        entry = json.dumps({"etag": value.etag, "body": value.body.decode(), "headers": value.headers})
+        await self.client.set(f"{self.prefix}:{key}", entry, px=int(self.ttl * 1000))
+
+    async def generation(self, namespace: str) -> int:
+        return int(await self.client.get(f"{self.prefix}:generation:{namespace}") or 0)
+
+    async def bump(self, namespace: str):
+        await self.client.incr(f"{self.prefix}:generation:{namespace}")
+
+    def snapshot(self) -> dict:
+        return {"backend": "redis", "ttl": self.ttl}
+
+
+class ResponseCache:
+    # Serialized responses keyed by namespace generation, route, caller role and query string.
+    # Invalidating a namespace bumps its generation, which orphans every key built from the old
+    # one at once; orphans age out through the TTL (or LRU eviction in memory).
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def key(self, namespace: str, *parts: Any) -> str:
+        generation = await self.backend.generation(namespace)
+        return "|".join([namespace, str(generation), *map(str, parts)])
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        return await self.backend.get(key)
+
+    async def set(self, key: str, value: CachedResponse):
+        await self.backend.set(key, value)
+
+    async def invalidate(self, namespace: str):
+        await self.backend.bump(namespace)
+
+    def snapshot(self) -> dict:
+        return self.backend.snapshot()
+
+
+def response_backend():
+    if RESPONSE_CACHE_URL:
+        return RedisBackend(RESPONSE_CACHE_URL, RESPONSE_CACHE_TTL)
+    return MemoryBackend(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+
+
+# Directory listings (/doctors, /patients, /user/{id}); every user write invalidates "users"
+responses = ResponseCache(response_backend())
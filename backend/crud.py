@@ -1,18 +1,28 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from datetime import datetime
+from typing import List, Optional, Set
+from sqlalchemy import Date, Row, Select, cast, delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import datetime, timedelta
+from hashing import hash_password
+import attachments
+import cache
+import events
+import jobs
+from pagination import Page, paginate
+from scheduling import Interval, IntervalIndex, SlotConflict
+import scheduling
+import tokens
 import models
 import schemas
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # -------------------------
 # User Management
 # -------------------------
 
-def create_user(db: Session, user: schemas.UserCreate) -> models.User:
-    hashed_password = pwd_context.hash(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate) -> models.User:
+    hashed_password = await hash_password(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -22,84 +32,171 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User:
         role=user.role,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await cache.responses.invalidate("users")
+    await db.refresh(db_user)
     return db_user
 
-def get_user(db: Session, username: str) -> Optional[models.User]:
-    return db.query(models.User).filter(models.User.username == username).first()
+async def get_user(db: AsyncSession, username: str) -> Optional[models.User]:
+    return await db.scalar(select(models.User).where(models.User.username == username))
 
-def get_user_by_id(db: Session, user_id: int) -> Optional[models.User]:
-    return db.query(models.User).filter(models.User.id == user_id).first()
+async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[models.User]:
+    return await db.scalar(select(models.User).where(models.User.id == user_id))
 
-def get_user_id(db: Session, username: str) -> Optional[int]:
-    user = get_user(db, username)
+async def get_user_id(db: AsyncSession, username: str) -> Optional[int]:
+    user = await get_user(db, username)
     return user.id if user else None
 
-def update_user(db: Session, user_id: int, user_update: schemas.UserCreate) -> Optional[models.User]:
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+async def update_user(db: AsyncSession, user_id: int, user_update: schemas.UserCreate) -> Optional[models.User]:
+    db_user = await get_user_by_id(db, user_id)
     if not db_user:
         return None
 
     db_user.username = user_update.username
     db_user.email = user_update.email
-    db_user.hashed_password = pwd_context.hash(user_update.password)
+    db_user.hashed_password = await hash_password(user_update.password)
     db_user.name = user_update.name
     db_user.surname = user_update.surname
     db_user.role = user_update.role
 
-    db.commit()
-    db.refresh(db_user)
+    # Outstanding tokens carry the old username and role
+    await tokens.revoke_user(db, user_id)
+    await db.commit()
+    cache.principals.invalidate(user_id)
+    await cache.responses.invalidate("users")
+    await db.refresh(db_user)
     return db_user
 
-def delete_user(db: Session, user_id: int) -> bool:
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not db_user:
+async def delete_user(db: AsyncSession, user_id: int) -> bool:
+    meetings = select(models.Meeting.id).where(or_(models.Meeting.patient_id == user_id, models.Meeting.doctor_id == user_id))
+    await _delete_meeting_children(db, meetings)
+    await db.execute(delete(models.Meeting).where(models.Meeting.id.in_(meetings)), execution_options=BULK)
+    await db.execute(delete(models.DoctorAvailability).where(models.DoctorAvailability.doctor_id == user_id), execution_options=BULK)
+    await tokens.revoke_user(db, user_id)
+    if await _delete_returning(db, models.User, user_id) is None:
         return False
-
-    db.delete(db_user)
-    db.commit()
+    cache.principals.invalidate(user_id)
+    await cache.responses.invalidate("users")
     return True
 
-def get_users(db: Session) -> List[models.User]:
-    return db.query(models.User).all()
+async def get_users(db: AsyncSession, role: Optional[str] = None, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    stmt = select(models.User)
+    if role is not None:
+        stmt = stmt.where(models.User.role == role)
+    return await paginate(db, stmt, [models.User.id], cursor, limit)
 
-def confirm_doctor(db: Session, doctor_id: int) -> models.User:
-    db_doctor = db.query(models.User).filter(models.User.id == doctor_id).first()
+async def confirm_doctor(db: AsyncSession, doctor_id: int) -> models.User:
+    db_doctor = await get_user_by_id(db, doctor_id)
     db_doctor.is_confirmed = True
-    db.commit()
-    db.refresh(db_doctor)
+    await db.commit()
+    cache.principals.invalidate(doctor_id)
+    await cache.responses.invalidate("users")
+    await db.refresh(db_doctor)
     return db_doctor
 
 # def get_doctor(db: Session) -> List[models.User]:
 #     return db.query(models.User).all()
 
-def get_doctors(db: Session) -> List[models.User]:
-    return db.query(models.User).filter(models.User.role == "doctor").all()
+async def get_doctors(db: AsyncSession) -> List[models.User]:
+    return (await db.scalars(select(models.User).where(models.User.role == "doctor"))).all()
 
-def get_patients(db: Session) -> List[models.User]:
-    return db.query(models.User).filter(models.User.role == "patient").all()
+async def get_patients(db: AsyncSession, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    return await get_users(db, role="patient", cursor=cursor, limit=limit)
 
-def get_confirmed_doctors(db: Session) -> List[models.User]:
-    return db.query(models.User).filter(models.User.role == "doctor", models.User.is_confirmed == True).all()
+async def get_confirmed_doctors(db: AsyncSession) -> List[models.User]:
+    stmt = select(models.User).where(models.User.role == "doctor", models.User.is_confirmed == True)
+    return (await db.scalars(stmt)).all()
+
+# -------------------------
+# Eager-loading strategies
+# -------------------------
+
+# Meetings serialize their records and each record its medicines. selectinload issues one
+# extra IN query per level regardless of page size and, unlike joinedload, plays well with LIMIT.
+# An AsyncSession cannot lazy-load during serialization, so every read path that returns
+# these objects to a handler must name its graph explicitly.
+MEETING_GRAPH = selectinload(models.Meeting.medical_records).selectinload(models.MedicalRecord.medicines)
+RECORD_GRAPH = selectinload(models.MedicalRecord.medicines)
+
+# -------------------------
+# Set-based writes
+# -------------------------
+
+# Mutators are single INSERT/UPDATE/DELETE ... RETURNING statements instead of
+# SELECT, mutate, commit, refresh. RETURNING hands back the written row (or nothing when
+# the id does not exist, which the handlers turn into a 404). The session is per request,
+# so there are no other loaded objects to synchronize.
+BULK = {"synchronize_session": False}
+
+async def _update_returning(db: AsyncSession, model, row_id: int, values: dict, graph=None, commit: bool = True):
+    stmt = update(model).where(model.id == row_id).values(**values).returning(model)
+    if graph is not None:
+        stmt = stmt.options(graph)
+    row = await db.scalar(stmt, execution_options={**BULK, "populate_existing": True})
+    if commit:
+        await db.commit()
+    return row
+
+async def _delete_returning(db: AsyncSession, model, row_id: int, *columns) -> Optional[Row]:
+    # The deleted row's id, or the given columns of it; None when nothing matched
+    stmt = delete(model).where(model.id == row_id).returning(*(columns or (model.id,)))
+    deleted = (await db.execute(stmt, execution_options=BULK)).first()
+    if deleted is None:
+        await db.rollback()  # Nothing matched; undo any dependent rows removed beforehand
+        return None
+    await db.commit()
+    return deleted
+
+async def _delete_attachments(db: AsyncSession, condition):
+    # Set-based attachment deletes hand their blobs to the same reclaim job as delete_attachment,
+    # queued in the caller's transaction so a rollback keeps both the rows and the blobs
+    stmt = delete(models.Attachment).where(condition).returning(models.Attachment.sha256)
+    for sha256 in sorted(set((await db.scalars(stmt, execution_options=BULK)).all())):
+        await jobs.enqueue(db, "reclaim_blob", {"sha256": sha256}, delay=attachments.BLOB_GRACE_SECONDS)
+
+async def _delete_meeting_children(db: AsyncSession, meetings):
+    # The ORM delete cascade (meeting -> records -> medicines, attachments) as set-based
+    # statements. Children go first so foreign keys hold at every step.
+    records = select(models.MedicalRecord.id).where(models.MedicalRecord.meeting_id.in_(meetings))
+    await db.execute(delete(models.Medicine).where(models.Medicine.medical_record_id.in_(records)), execution_options=BULK)
+    await _delete_attachments(db, models.Attachment.medical_record_id.in_(records))
+    await db.execute(delete(models.MedicalRecord).where(models.MedicalRecord.meeting_id.in_(meetings)), execution_options=BULK)
 
 # -------------------------
 # Meeting Management
 # -------------------------
 
-def create_meeting_request(db: Session, meeting_data: schemas.MeetingCreate, patient_id: int, doctor_id: int) -> models.Meeting:
-    db_meeting = models.Meeting(
+def _publish_meeting(kind: str, db_meeting: models.Meeting):
+    # Pushed to both parties' open event streams (see events.py), after the commit
+    events.meeting_changed(kind, schemas.MeetingSummary.model_validate(db_meeting).model_dump(mode="json"))
+
+async def create_meeting_request(db: AsyncSession, meeting_data: schemas.MeetingCreate, patient_id: int, doctor_id: int) -> models.Meeting:
+    stmt = insert(models.Meeting).values(
         patient_id=patient_id,
         doctor_id=doctor_id,
         scheduled_date=meeting_data.scheduled_date,
         status="Pending",
-    )
-    db.add(db_meeting)
-    db.commit()
-    db.refresh(db_meeting)
+    ).returning(models.Meeting)
+    try:
+        db_meeting = await db.scalar(stmt)
+        await jobs.enqueue(db, "appointment_requested", {
+            "meeting_id": db_meeting.id,
+            "patient_id": patient_id,
+            "doctor_id": doctor_id,
+            "scheduled_date": db_meeting.scheduled_date.isoformat(),
+        })
+        await db.commit()
+    except IntegrityError:
+        # uq_meetings_doctor_slot rejects a second live booking of the same slot
+        await db.rollback()
+        if await has_live_booking(db, doctor_id, meeting_data.scheduled_date):
+            raise SlotConflict("This slot is already booked")
+        raise
+    set_committed_value(db_meeting, "medical_records", [])  # A new meeting has no records to load
+    _publish_meeting("created", db_meeting)
     return db_meeting
 
-def confirm_meeting(db: Session, meeting_id: int, status: int,) -> Optional[models.Meeting]:
+async def confirm_meeting(db: AsyncSession, meeting_id: int, status: int,) -> Optional[models.Meeting]:
     # Map integer status codes to string values
     status_mapping = {
         1: "Reject",
@@ -108,125 +205,408 @@ def confirm_meeting(db: Session, meeting_id: int, status: int,) -> Optional[mode
     # Validate the status value
     if status not in status_mapping:
         return False
-    # Fetch the meeting from the database
-    db_meeting = db.query(models.Meeting).filter(models.Meeting.id == meeting_id).first()
-    if not db_meeting:
-        return None
-    # Update the meeting status
-    db_meeting.status = status_mapping[status]
-    db.commit()
-    db.refresh(db_meeting)
+    # Update the meeting status; None when the meeting does not exist
+    try:
+        db_meeting = await _update_returning(db, models.Meeting, meeting_id, {"status": status_mapping[status]}, MEETING_GRAPH, commit=False)
+        if db_meeting is not None:
+            # Notifications run after the response, from the job queue; the job commits with the change
+            await jobs.enqueue(db, "meeting_status_changed", {
+                "meeting_id": db_meeting.id,
+                "patient_id": db_meeting.patient_id,
+                "doctor_id": db_meeting.doctor_id,
+                "status": db_meeting.status,
+            })
+        await db.commit()
+    except IntegrityError:
+        # Reviving a rejected meeting whose slot has been booked again since
+        await db.rollback()
+        raise SlotConflict("This slot is already booked")
+    if db_meeting is not None:
+        _publish_meeting(STATUS_FIELDS[db_meeting.status], db_meeting)  # confirmed or rejected
     return db_meeting
 
 
-def get_meeting(db: Session, meeting_id: int) -> Optional[models.Meeting]:
-    return db.query(models.Meeting).filter(models.Meeting.id == meeting_id).first()
-
-def get_meetings(db: Session) -> List[models.Meeting]:
-    return db.query(models.Meeting).all()
-
-def update_meeting(db: Session, meeting_id: int, meeting_update: schemas.MeetingCreate) -> Optional[models.Meeting]:
-    db_meeting = db.query(models.Meeting).filter(models.Meeting.id == meeting_id).first()
-    if not db_meeting:
-        return None
-
-    db_meeting.scheduled_date = meeting_update.scheduled_date
-    db.commit()
-    db.refresh(db_meeting)
+async def get_meeting(db: AsyncSession, meeting_id: int) -> Optional[models.Meeting]:
+    stmt = (
+        select(models.Meeting)
+        .options(MEETING_GRAPH)
+        .where(models.Meeting.id == meeting_id)
+        .execution_options(populate_existing=True)
+    )
+    return await db.scalar(stmt)
+
+async def get_meeting_detail(db: AsyncSession, meeting_id: int, sections: Set[str]) -> Optional[models.Meeting]:
+    # Only the requested sections are loaded: the parties are joined into the meeting's own
+    # query, records and medicines add one IN query each. At most three statements.
+    options = []
+    if "patient" in sections:
+        options.append(joinedload(models.Meeting.patient))
+    if "doctor" in sections:
+        options.append(joinedload(models.Meeting.doctor))
+    if "medicines" in sections:
+        options.append(MEETING_GRAPH)
+    elif "medical_records" in sections:
+        options.append(selectinload(models.Meeting.medical_records))
+    stmt = (
+        select(models.Meeting)
+        .options(*options)
+        .where(models.Meeting.id == meeting_id)
+        .execution_options(populate_existing=True)
+    )
+    return await db.scalar(stmt)
+
+def filter_meetings(stmt: Select, filters: schemas.MeetingFilter) -> Select:
+    if filters.status is not None:
+        stmt = stmt.where(models.Meeting.status == filters.status)
+    if filters.doctor_id is not None:
+        stmt = stmt.where(models.Meeting.doctor_id == filters.doctor_id)
+    if filters.patient_id is not None:
+        stmt = stmt.where(models.Meeting.patient_id == filters.patient_id)
+    if filters.date_from is not None:
+        stmt = stmt.where(models.Meeting.scheduled_date >= filters.date_from)
+    if filters.date_to is not None:
+        stmt = stmt.where(models.Meeting.scheduled_date < filters.date_to)
+    return stmt
+
+def meeting_order(filters: schemas.MeetingFilter) -> list:
+    if filters.order_by == "scheduled_date":
+        return [models.Meeting.scheduled_date, models.Meeting.id]
+    return [models.Meeting.id]
+
+async def get_meetings(db: AsyncSession, filters: Optional[schemas.MeetingFilter] = None, cursor: Optional[str] = None, limit: Optional[int] = None, shallow: bool = False) -> Page:
+    filters = filters or schemas.MeetingFilter()
+    stmt = select(models.Meeting)
+    if not shallow:
+        stmt = stmt.options(MEETING_GRAPH)
+    stmt = filter_meetings(stmt, filters)
+    return await paginate(db, stmt, meeting_order(filters), cursor, limit)
+
+def meeting_rows(filters: schemas.MeetingFilter) -> Select:
+    # Flat column rows (no nested records) for streaming exports
+    stmt = select(*models.Meeting.__table__.columns)
+    return filter_meetings(stmt, filters).order_by(*meeting_order(filters))
+
+async def update_meeting(db: AsyncSession, meeting_id: int, meeting_update: schemas.MeetingCreate) -> Optional[models.Meeting]:
+    try:
+        db_meeting = await _update_returning(db, models.Meeting, meeting_id, {"scheduled_date": meeting_update.scheduled_date}, MEETING_GRAPH)
+    except IntegrityError:
+        # uq_meetings_doctor_slot: the new time is another live booking's slot
+        await db.rollback()
+        raise SlotConflict("This slot is already booked")
+    if db_meeting is not None:
+        _publish_meeting("updated", db_meeting)
     return db_meeting
 
-def delete_meeting(db: Session, meeting_id: int) -> bool:
-    db_meeting = db.query(models.Meeting).filter(models.Meeting.id == meeting_id).first()
-    if not db_meeting:
+async def delete_meeting(db: AsyncSession, meeting_id: int) -> bool:
+    await _delete_meeting_children(db, [meeting_id])
+    deleted = await _delete_returning(db, models.Meeting, meeting_id, models.Meeting.id, models.Meeting.patient_id, models.Meeting.doctor_id)
+    if deleted is None:
         return False
-
-    db.delete(db_meeting)
-    db.commit()
+    events.meeting_changed("deleted", dict(deleted._mapping))
     return True
 
+# -------------------------
+# Doctor Availability
+# -------------------------
+
+async def get_working_hours(db: AsyncSession, doctor_id: int) -> List[models.DoctorAvailability]:
+    stmt = (
+        select(models.DoctorAvailability)
+        .where(models.DoctorAvailability.doctor_id == doctor_id)
+        .order_by(models.DoctorAvailability.weekday, models.DoctorAvailability.start_time)
+    )
+    return (await db.scalars(stmt)).all()
+
+async def set_working_hours(db: AsyncSession, doctor_id: int, hours: List[schemas.WorkingHoursCreate]) -> List[models.DoctorAvailability]:
+    # Replaces the whole weekly schedule in one transaction
+    await db.execute(delete(models.DoctorAvailability).where(models.DoctorAvailability.doctor_id == doctor_id))
+    db.add_all([models.DoctorAvailability(doctor_id=doctor_id, **block.model_dump()) for block in hours])
+    await db.commit()
+    return await get_working_hours(db, doctor_id)
+
+async def get_booked_starts(db: AsyncSession, doctor_id: int, date_from: datetime, date_to: datetime) -> List[datetime]:
+    stmt = select(models.Meeting.scheduled_date).where(
+        models.Meeting.doctor_id == doctor_id,
+        models.Meeting.status != "Reject",
+        models.Meeting.scheduled_date >= date_from,
+        models.Meeting.scheduled_date < date_to,
+    )
+    return (await db.scalars(stmt)).all()
+
+async def has_live_booking(db: AsyncSession, doctor_id: int, scheduled_date: datetime) -> bool:
+    stmt = select(models.Meeting.id).where(
+        models.Meeting.doctor_id == doctor_id,
+        models.Meeting.status != "Reject",
+        models.Meeting.scheduled_date == scheduled_date,
+    )
+    return await db.scalar(stmt) is not None
+
+async def get_free_slots(db: AsyncSession, doctor_id: int, date_from: datetime, date_to: datetime) -> List[Interval]:
+    hours = await get_working_hours(db, doctor_id)
+    # Meetings that start up to one slot before the window can still run into it
+    starts = await get_booked_starts(db, doctor_id, date_from - scheduling.longest_slot(hours), date_to)
+    return scheduling.free_slots(hours, scheduling.booked_intervals(hours, starts), date_from, date_to)
+
+async def reserve_slot(db: AsyncSession, patient_id: int, doctor_id: int, scheduled_date: datetime) -> models.Meeting:
+    # Lock the doctor row so concurrent reservations for one doctor run one at a time
+    # (SQLite ignores FOR UPDATE but already serializes writers); the unique slot index
+    # in create_meeting_request is the final guard either way.
+    await db.execute(select(models.User.id).where(models.User.id == doctor_id).with_for_update())
+    hours = await get_working_hours(db, doctor_id)
+    slot = scheduling.slot_at(hours, scheduled_date)
+    if slot is None:
+        await db.rollback()
+        raise SlotConflict("Requested time is not a slot in the doctor's working hours")
+    starts = await get_booked_starts(db, doctor_id, slot.start - scheduling.longest_slot(hours), slot.end)
+    if IntervalIndex(scheduling.booked_intervals(hours, starts)).overlaps(slot.start, slot.end):
+        await db.rollback()
+        raise SlotConflict("This slot is already booked")
+    return await create_meeting_request(db, schemas.MeetingCreate(scheduled_date=scheduled_date), patient_id, doctor_id)
+
 # -------------------------
 # Medical Record Management
 # -------------------------
 
-def create_medical_record(db: Session, meeting_id: int, record_data: schemas.MedicalRecordCreate) -> models.MedicalRecord:
+async def create_medical_record(db: AsyncSession, meeting_id: int, record_data: schemas.MedicalRecordCreate) -> models.MedicalRecord:
     db_record = models.MedicalRecord(
         meeting_id=meeting_id,
         description=record_data.description,
         created_at=datetime.utcnow(),
     )
     db.add(db_record)
-    db.commit()
-    db.refresh(db_record)
-    return db_record
+    await db.commit()
+    return await get_medical_record(db, db_record.id)
+
+async def get_medical_record(db: AsyncSession, record_id: int) -> Optional[models.MedicalRecord]:
+    stmt = (
+        select(models.MedicalRecord)
+        .options(RECORD_GRAPH)
+        .where(models.MedicalRecord.id == record_id)
+        .execution_options(populate_existing=True)
+    )
+    return await db.scalar(stmt)
+
+def filter_medical_records(stmt: Select, filters: schemas.MedicalRecordFilter) -> Select:
+    if filters.meeting_id is not None:
+        stmt = stmt.where(models.MedicalRecord.meeting_id == filters.meeting_id)
+    if filters.doctor_id is not None or filters.patient_id is not None:
+        stmt = stmt.join(models.Meeting, models.MedicalRecord.meeting_id == models.Meeting.id)
+        if filters.doctor_id is not None:
+            stmt = stmt.where(models.Meeting.doctor_id == filters.doctor_id)
+        if filters.patient_id is not None:
+            stmt = stmt.where(models.Meeting.patient_id == filters.patient_id)
+    if filters.date_from is not None:
+        stmt = stmt.where(models.MedicalRecord.created_at >= filters.date_from)
+    if filters.date_to is not None:
+        stmt = stmt.where(models.MedicalRecord.created_at < filters.date_to)
+    return stmt
+
+async def get_medical_records(db: AsyncSession, filters: Optional[schemas.MedicalRecordFilter] = None, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    filters = filters or schemas.MedicalRecordFilter()
+    stmt = filter_medical_records(select(models.MedicalRecord).options(RECORD_GRAPH), filters)
+    return await paginate(db, stmt, [models.MedicalRecord.id], cursor, limit)
+
+def medical_record_rows(filters: schemas.MedicalRecordFilter) -> Select:
+    # Flat column rows (no nested medicines) for streaming exports
+    stmt = select(*models.MedicalRecord.__table__.columns)
+    return filter_medical_records(stmt, filters).order_by(models.MedicalRecord.id)
+
+async def update_medical_record(db: AsyncSession, record_id: int, description: str) -> Optional[models.MedicalRecord]:
+    return await _update_returning(db, models.MedicalRecord, record_id, {"description": description}, RECORD_GRAPH)
+
+
+async def delete_medical_record(db: AsyncSession, record_id: int) -> bool:
+    await db.execute(delete(models.Medicine).where(models.Medicine.medical_record_id == record_id), execution_options=BULK)
+    await _delete_attachments(db, models.Attachment.medical_record_id == record_id)
+    return await _delete_returning(db, models.MedicalRecord, record_id) is not None
+
+# -------------------------
+# Medicine Management
+# -------------------------
 
-def get_medical_record(db: Session, record_id: int) -> Optional[models.MedicalRecord]:
-    return db.query(models.MedicalRecord).filter(models.MedicalRecord.id == record_id).first()
+async def create_medicine(db: AsyncSession, medicine_data: schemas.MedicineCreate, medical_record_id: int) -> models.Medicine:
+    stmt = insert(models.Medicine).values(
+        name=medicine_data.name,
+        dosage=medicine_data.dosage,
+        frequency=medicine_data.frequency,
+        medical_record_id=medical_record_id,
+    ).returning(models.Medicine)
+    db_medicine = await db.scalar(stmt)
+    await db.commit()
+    return db_medicine
 
-def get_medical_records(db: Session) -> List[models.MedicalRecord]:
-    return db.query(models.MedicalRecord).all()
+async def create_medicines(db: AsyncSession, medicines: List[schemas.MedicineCreate], medical_record_id: int) -> List[models.Medicine]:
+    # One multi-row INSERT ... RETURNING in one transaction; rows come back in request order
+    stmt = insert(models.Medicine).returning(models.Medicine, sort_by_parameter_order=True)
+    rows = [{**medicine.model_dump(), "medical_record_id": medical_record_id} for medicine in medicines]
+    created = (await db.scalars(stmt, rows)).all()
+    await db.commit()
+    return created
 
-def update_medical_record(db: Session, record_id: int, description: str) -> Optional[models.MedicalRecord]:
-    db_record = db.query(models.MedicalRecord).filter(models.MedicalRecord.id == record_id).first()
-    if not db_record:
-        return None
+async def get_medicines_by_medical_record(db: AsyncSession, medical_record_id: int) -> List[models.Medicine]:
+    stmt = select(models.Medicine).where(models.Medicine.medical_record_id == medical_record_id)
+    return (await db.scalars(stmt)).all()
 
-    db_record.description = description  # Update the description
-    db.commit()  # Commit the transaction
-    db.refresh(db_record)  # Refresh the instance with updated values
-    return db_record
+async def get_medicine_by_id(db: AsyncSession, medicine_id: int) -> Optional[models.Medicine]:
+    return await db.scalar(select(models.Medicine).where(models.Medicine.id == medicine_id))
 
+async def get_medicines(db: AsyncSession) -> List[models.Medicine]:
+    return (await db.scalars(select(models.Medicine))).all()
 
-def delete_medical_record(db: Session, record_id: int) -> bool:
-    db_record = db.query(models.MedicalRecord).filter(models.MedicalRecord.id == record_id).first()
-    if not db_record:
-        return False
+async def update_medicine(db: AsyncSession, medicine_id: int, medicine_update: schemas.Medicine) -> Optional[models.Medicine]:
+    # The path identifies the row; an id in the body is not applied
+    values = medicine_update.model_dump(exclude_unset=True, exclude={"id"})
+    if not values:
+        return await get_medicine_by_id(db, medicine_id)
+    return await _update_returning(db, models.Medicine, medicine_id, values)
 
-    db.delete(db_record)
-    db.commit()
-    return True
+async def delete_medicine(db: AsyncSession, medicine_id: int) -> bool:
+    return await _delete_returning(db, models.Medicine, medicine_id) is not None
 
 # -------------------------
-# Medicine Management
+# Attachment Management
 # -------------------------
 
-def create_medicine(db: Session, medicine_data: schemas.MedicineCreate, medical_record_id: int) -> models.Medicine:
-    db_medicine = models.Medicine(
-        name=medicine_data.name,
-        dosage=medicine_data.dosage,
-        frequency=medicine_data.frequency,
-        medical_record_id=medical_record_id,
+async def get_record_parties(db: AsyncSession, record_id: int):
+    # (doctor_id, patient_id) of the meeting a record belongs to, or None for an unknown record
+    stmt = (
+        select(models.Meeting.doctor_id, models.Meeting.patient_id)
+        .join(models.MedicalRecord, models.MedicalRecord.meeting_id == models.Meeting.id)
+        .where(models.MedicalRecord.id == record_id)
     )
-    db.add(db_medicine)
-    db.commit()
-    db.refresh(db_medicine)
-    return db_medicine
-
-def get_medicines_by_medical_record(db: Session, medical_record_id: int) -> List[models.Medicine]:
-    return db.query(models.Medicine).filter(models.Medicine.medical_record_id == medical_record_id).all()
+    return (await db.execute(stmt)).first()
+
+async def create_attachment(db: AsyncSession, record_id: int, filename: str, content_type: Optional[str], size: int, sha256: str) -> models.Attachment:
+    stmt = insert(models.Attachment).values(
+        medical_record_id=record_id,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        sha256=sha256,
+        created_at=datetime.utcnow(),
+    ).returning(models.Attachment)
+    attachment = await db.scalar(stmt)
+    await db.commit()
+    return attachment
+
+async def get_attachments(db: AsyncSession, record_id: int) -> List[models.Attachment]:
+    stmt = select(models.Attachment).where(models.Attachment.medical_record_id == record_id).order_by(models.Attachment.id)
+    return (await db.scalars(stmt)).all()
+
+async def get_attachment(db: AsyncSession, attachment_id: int):
+    # (attachment, doctor_id, patient_id) in one query, or None
+    stmt = (
+        select(models.Attachment, models.Meeting.doctor_id, models.Meeting.patient_id)
+        .join(models.MedicalRecord, models.MedicalRecord.id == models.Attachment.medical_record_id)
+        .join(models.Meeting, models.Meeting.id == models.MedicalRecord.meeting_id)
+        .where(models.Attachment.id == attachment_id)
+    )
+    return (await db.execute(stmt)).first()
+
+async def delete_attachment(db: AsyncSession, attachment_id: int) -> Optional[str]:
+    # The deleted attachment's blob hash, or None if there was no such attachment. The blob
+    # itself goes later, from a job, if nothing points at it by then (see attachments.reclaim).
+    sha256 = await db.scalar(
+        delete(models.Attachment).where(models.Attachment.id == attachment_id).returning(models.Attachment.sha256),
+        execution_options=BULK,
+    )
+    if sha256 is not None:
+        await jobs.enqueue(db, "reclaim_blob", {"sha256": sha256}, delay=attachments.BLOB_GRACE_SECONDS)
+    await db.commit()
+    return sha256
 
-def get_medicine_by_id(db: Session, medicine_id: int) -> Optional[models.Medicine]:
-    return db.query(models.Medicine).filter(models.Medicine.id == medicine_id).first()
+# -------------------------
+# Job Management
+# -------------------------
 
-def get_medicines(db: Session) -> List[models.Medicine]:
-    return db.query(models.Medicine).all()
+async def get_job(db: AsyncSession, job_id: int) -> Optional[models.Job]:
+    return await db.scalar(select(models.Job).where(models.Job.id == job_id))
 
-def update_medicine(db: Session, medicine_id: int, medicine_update: schemas.Medicine) -> Optional[models.Medicine]:
-    db_medicine = db.query(models.Medicine).filter(models.Medicine.id == medicine_id).first()
-    if not db_medicine:
-        return None
+async def get_jobs(db: AsyncSession, status: Optional[str] = None, kind: Optional[str] = None, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    stmt = select(models.Job)
+    if status is not None:
+        stmt = stmt.where(models.Job.status == status)
+    if kind is not None:
+        stmt = stmt.where(models.Job.kind == kind)
+    return await paginate(db, stmt, [models.Job.id], cursor, limit)
 
-    for key, value in medicine_update.dict(exclude_unset=True).items():
-        setattr(db_medicine, key, value)
+# -------------------------
+# Audit Log
+# -------------------------
 
-    db.commit()
-    db.refresh(db_medicine)
-    return db_medicine
+async def get_audit_events(db: AsyncSession, filters: schemas.AuditEventFilter, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    # Time order; the occurred_at index (and on Postgres, partition pruning) serves the range
+    stmt = select(models.AuditEvent)
+    if filters.date_from is not None:
+        stmt = stmt.where(models.AuditEvent.occurred_at >= filters.date_from)
+    if filters.date_to is not None:
+        stmt = stmt.where(models.AuditEvent.occurred_at < filters.date_to)
+    if filters.actor_id is not None:
+        stmt = stmt.where(models.AuditEvent.actor_id == filters.actor_id)
+    if filters.action is not None:
+        stmt = stmt.where(models.AuditEvent.action == filters.action)
+    if filters.target_type is not None:
+        stmt = stmt.where(models.AuditEvent.target_type == filters.target_type)
+    if filters.target_id is not None:
+        stmt = stmt.where(models.AuditEvent.target_id == filters.target_id)
+    order = [models.AuditEvent.occurred_at, models.AuditEvent.chain, models.AuditEvent.seq]
+    return await paginate(db, stmt, order, cursor, limit)
 
-def delete_medicine(db: Session, medicine_id: int) -> bool:
-    db_medicine = db.query(models.Medicine).filter(models.Medicine.id == medicine_id).first()
-    if not db_medicine:
-        return False
+# -------------------------
+# Statistics
+# -------------------------
 
-    db.delete(db_medicine)
-    db.commit()
-    return True
+DEFAULT_STATS_WINDOW = timedelta(days=30)  # Each side of now when no range is given
+MAX_STATS_RANGE = timedelta(days=366)
+STATUS_FIELDS = {"Pending": "pending", "Confirmed": "confirmed", "Reject": "rejected"}
+
+def period_start(db: AsyncSession, column, granularity: str):
+    # First day of the day/week containing column; weeks start on Monday
+    if db.bind.dialect.name == "postgresql":
+        return cast(func.date_trunc(granularity, column), Date)
+    if granularity == "week":
+        return func.date(column, "weekday 0", "-6 days")
+    return func.date(column)
+
+async def get_stats(db: AsyncSession, date_from: datetime, date_to: datetime, granularity: str = "day", doctor_id: Optional[int] = None) -> schemas.Stats:
+    # Two aggregate queries over ix_meetings_doctor_id_scheduled_date: status counts per
+    # period, and record/prescription counts of the meetings in the same window
+    in_window = [models.Meeting.scheduled_date >= date_from, models.Meeting.scheduled_date < date_to]
+    if doctor_id is not None:
+        in_window.append(models.Meeting.doctor_id == doctor_id)
+
+    period = period_start(db, models.Meeting.scheduled_date, granularity).label("period")
+    counts = await db.execute(
+        select(period, models.Meeting.status, func.count())
+        .where(*in_window)
+        .group_by(period, models.Meeting.status)
+        .order_by(period)
+    )
+    periods = {}
+    for day, status, count in counts:
+        field = STATUS_FIELDS.get(status)
+        if field is not None:
+            entry = periods.setdefault(day, schemas.PeriodStats(period=day))
+            setattr(entry, field, getattr(entry, field) + count)
+
+    meetings = select(models.Meeting.id).where(*in_window)
+    records = select(models.MedicalRecord.id).where(models.MedicalRecord.meeting_id.in_(meetings))
+    record_count, prescription_count = (await db.execute(select(
+        select(func.count()).select_from(models.MedicalRecord).where(models.MedicalRecord.meeting_id.in_(meetings)).scalar_subquery(),
+        select(func.count()).select_from(models.Medicine).where(models.Medicine.medical_record_id.in_(records)).scalar_subquery(),
+    ))).one()
+
+    totals = schemas.StatusCounts()
+    for entry in periods.values():
+        for field in STATUS_FIELDS.values():
+            setattr(totals, field, getattr(totals, field) + getattr(entry, field))
+    return schemas.Stats(
+        doctor_id=doctor_id,
+        date_from=date_from,
+        date_to=date_to,
+        granularity=granularity,
+        totals=totals,
+        periods=list(periods.values()),
+        medical_records=record_count,
+        prescriptions=prescription_count,
+    )
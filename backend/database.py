@@ -1,8 +1,18 @@
 import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from fastapi import Request
+from jose import JWTError, jwt
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -12,6 +22,250 @@ URL_DATABASE = os.getenv("DATABASE_URL")
 if not URL_DATABASE:
     raise ValueError("DATABASE_URL is not set in environment variables.")
 
-engine = create_engine(URL_DATABASE)
+# Async drivers used by the request handlers, keyed by the backend of DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases.")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+ASYNC_URL_DATABASE = os.getenv("ASYNC_DATABASE_URL") or to_async_url(URL_DATABASE)
+
+# -------------------------
+# Connection pool settings
+# -------------------------
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Seconds; -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+
+class PoolStats:
+    # Connection acquisition timings for one pool, recorded by the instrumented pool classes below
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_avg": self.wait_seconds_total / attempts if attempts else 0.0,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+class _TimedCheckout:
+    # _do_get is where QueuePool blocks for a free connection (or opens a new one), so timing it
+    # gives the acquire latency a request actually sees
+    stats: PoolStats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            entry = super()._do_get()
+        except Exception:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return entry
+
+    def recreate(self):
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+
+def pool_options(url: str, poolclass) -> dict:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}  # In-memory SQLite must keep its single shared connection
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+# Sync engine: schema management and offline scripts
+engine = create_engine(URL_DATABASE, **pool_options(URL_DATABASE, InstrumentedQueuePool))
 SessionLocal = sessionmaker(autocommit=False,autoflush=False,bind=engine)
-Base = declarative_base()
\ No newline at end of file
+
+# Async engine: everything served by the API
+async_engine = create_async_engine(ASYNC_URL_DATABASE, **pool_options(ASYNC_URL_DATABASE, InstrumentedAsyncQueuePool))
+
+# -------------------------
+# Read replicas
+# -------------------------
+# DATABASE_REPLICA_URLS is a comma-separated list of replica URLs (same form as DATABASE_URL).
+# GET and HEAD requests read from a randomly picked replica; everything else, and every
+# statement after a session's first write, goes to the primary. For a local setup, point it at
+# a second Postgres instance, or at a copy of a SQLite file to see the routing (a copy does not
+# replicate, so it shows exactly what a lagging replica would).
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# After a user's own write, their reads stay on the primary this long, covering replication lag
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+READ_METHODS = ("GET", "HEAD")
+
+replica_engines = [
+    create_async_engine(to_async_url(url), **pool_options(to_async_url(url), InstrumentedAsyncQueuePool))
+    for url in REPLICA_URLS
+]
+
+
+class RoutingSession(Session):
+    # A session given info["replica"] reads there until it writes. Its first flush or
+    # INSERT/UPDATE/DELETE moves it to the primary for good, so a request sees its own writes.
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["wrote"] = True
+        replica = self.info.get("replica")
+        if replica is not None and not self.info.get("wrote"):
+            return replica.sync_engine
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+class StickyUsers:
+    # Users who wrote in the last REPLICA_STICKY_SECONDS, per worker process. A user whose next
+    # read lands on another worker can see replication lag, so keep the window above it.
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self._until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, user_id: int):
+        with self._lock:
+            now = time.monotonic()
+            if len(self._until) > 10000:
+                self._until = {user: until for user, until in self._until.items() if until > now}
+            self._until[user_id] = now + self.seconds
+
+    def __contains__(self, user_id: int) -> bool:
+        with self._lock:
+            return self._until.get(user_id, 0) > time.monotonic()
+
+
+sticky_users = StickyUsers(REPLICA_STICKY_SECONDS)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _mark_writer(session):
+    if session.info.get("wrote") and session.info.get("user_id") is not None:
+        sticky_users.mark(session.info["user_id"])
+
+
+def on_commit(session, callback: Callable[[], None]):
+    # Runs callback once the session's current transaction has committed; a rollback drops it.
+    # For in-process side effects that must not get ahead of the database.
+    session.info.setdefault("on_commit", []).append(callback)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _run_on_commit(session):
+    for callback in session.info.pop("on_commit", ()):
+        callback()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _drop_on_commit(session):
+    session.info.pop("on_commit", None)
+
+
+def pick_replica():
+    return random.choice(replica_engines) if replica_engines else None
+
+# expire_on_commit=False keeps loaded attributes usable after commit; an expired attribute
+# would need an implicit lazy load, which AsyncSession cannot do outside an await.
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False)
+Base = declarative_base()
+
+
+def request_user_id(request: Request) -> Optional[int]:
+    # The bearer token's user id, unverified: it only picks a database, and get_current_user
+    # still authenticates the request
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        user_id = jwt.get_unverified_claims(token).get("id")
+    except JWTError:
+        return None
+    return user_id if isinstance(user_id, int) else None
+
+
+# The one session dependency every route uses; the session is closed when the request ends
+async def get_db(request: Request):
+    async with AsyncSessionLocal() as db:
+        user_id = request_user_id(request)
+        db.info["user_id"] = user_id
+        if replica_engines and request.method in READ_METHODS and user_id not in sticky_users:
+            db.info["replica"] = pick_replica()
+        yield db
+
+
+def read_session() -> AsyncSession:
+    # For long reads outside a request (exports): a replica when there is one
+    session = AsyncSessionLocal()
+    session.info["replica"] = pick_replica()
+    return session
+
+
+def pool_status(pool) -> dict:
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(stats.snapshot())
+    return status
+
+
+def engine_status() -> dict:
+    return {
+        "async": pool_status(async_engine.pool),
+        "sync": pool_status(engine.pool),
+        "replicas": [pool_status(replica.pool) for replica in replica_engines],
+    }
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Iterable, Optional, Set
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))  # Keeps idle connections open through proxies
+EVENTS_MAX_CONNECTIONS = int(os.getenv("EVENTS_MAX_CONNECTIONS", "10000"))  # Per worker
+EVENTS_QUEUE_SIZE = 64  # Undelivered events per connection before it is told to resync
+SSE_RETRY_MS = 3000
+CLOSE = {"event": "shutdown"}  # Last event of a stream when the worker stops
+
+
+class TooManyConnections(Exception):
+    pass
+
+# -------------------------
+# Pub/sub
+# -------------------------
+# In-process fan-out keyed by user id. An idle connection is one bounded queue and one
+# coroutine parked on it; publishing touches only the queues of the users involved. Events
+# reach the connections held by the worker that made the change, so with several workers the
+# clients of the other workers catch up on their next fetch.
+
+class Subscription:
+    def __init__(self, broker: "Broker", user_id: int):
+        self.broker = broker
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(EVENTS_QUEUE_SIZE)
+
+    def close(self):
+        # Ends the stream after what it already has; the client reconnects elsewhere
+        while self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(CLOSE)
+
+    def deliver(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow client: drop what it has not read and have it refetch instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"event": "resync"})
+
+    async def next(self, timeout: float = EVENTS_HEARTBEAT_SECONDS) -> Optional[dict]:
+        # None when nothing arrived within timeout, i.e. time for a heartbeat
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def __init__(self, max_connections: int = EVENTS_MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self._subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+        self.connections = 0
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, user_id: int) -> Subscription:
+        if self.connections >= self.max_connections:
+            raise TooManyConnections("Too many open event streams; retry later")
+        subscription = Subscription(self, user_id)
+        self._subscribers[user_id].add(subscription)
+        self.connections += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is not None and subscription in subscribers:
+            subscribers.discard(subscription)
+            self.connections -= 1
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    def publish(self, user_ids: Iterable[int], event: dict):
+        self.published += 1
+        for user_id in set(user_ids):
+            for subscription in self._subscribers.get(user_id, ()):
+                subscription.deliver(event)
+                self.delivered += 1
+
+    def close(self):
+        # Called when the worker starts draining, so open streams do not hold up the shutdown
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.close()
+
+    def snapshot(self) -> dict:
+        return {
+            "connections": self.connections,
+            "users": len(self._subscribers),
+            "max_connections": self.max_connections,
+            "published": self.published,
+            "delivered": self.delivered,
+        }
+
+
+broker = Broker()
+
+
+def meeting_changed(kind: str, meeting: dict):
+    # kind is created, updated, confirmed, rejected or deleted; both parties of the meeting are told
+    broker.publish((meeting["patient_id"], meeting["doctor_id"]), {"event": f"meeting_{kind}", "meeting": meeting})
+
+# -------------------------
+# Transports
+# -------------------------
+
+async def sse_stream(subscription: Subscription) -> AsyncIterator[str]:
+    # text/event-stream body; the response cancels it when the client disconnects
+    with subscription:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while True:
+            event = await subscription.next()
+            if event is None:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+            if event is CLOSE:
+                return
+
+
+async def pump_websocket(websocket: WebSocket, subscription: Subscription):
+    # Sends events until the client goes away. Incoming messages are read only to notice the
+    # disconnect; the channel is push-only.
+    async def drain():
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    async def push():
+        while True:
+            event = await subscription.next()
+            if event is None:
+                await websocket.send_json({"event": "ping"})
+                continue
+            await websocket.send_text(json.dumps(event, default=str))
+            if event is CLOSE:
+                await websocket.close(code=1012)  # Service restart
+                return
+
+    with subscription:
+        tasks = [asyncio.create_task(drain()), asyncio.create_task(push())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
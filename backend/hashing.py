@@ -0,0 +1,128 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+# bcrypt releases the GIL while hashing, so a small thread pool gives real parallelism
+# without blocking the event loop. Work beyond workers + queue limit is rejected.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "32"))
+
+
+class HashingPoolBusy(Exception):
+    pass
+
+
+class HashingPool:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_seconds = deque(maxlen=1024)
+        self._hash_seconds = deque(maxlen=1024)
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.queue_limit:
+                self._rejected += 1
+                raise HashingPoolBusy("Password hashing queue is full")
+            self._pending += 1
+        enqueued = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, enqueued, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _timed(self, enqueued: float, fn, *args):
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._wait_seconds.append(started - enqueued)
+                self._hash_seconds.append(finished - started)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "wait_seconds": _summary(self._wait_seconds),
+                "hash_seconds": _summary(self._hash_seconds),
+            }
+
+
+def _summary(samples) -> dict:
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+# Built on first use or by start(), not at import: a process that never hashes (a migration,
+# an export) starts no threads, and each server worker builds its own after forking.
+_context: Optional[CryptContext] = None
+pool: Optional[HashingPool] = None
+
+
+def get_context() -> CryptContext:
+    global _context
+    if _context is None:
+        _context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _context
+
+
+def get_pool() -> HashingPool:
+    global pool
+    if pool is None:
+        pool = HashingPool(HASH_WORKERS, HASH_QUEUE_LIMIT)
+    return pool
+
+
+async def start():
+    # One throwaway hash loads the bcrypt backend and starts a worker thread before the first login
+    await get_pool().run(get_context().hash, "warm-up")
+
+
+def stop():
+    global pool
+    if pool is not None:
+        pool.shutdown()
+        pool = None
+
+
+async def hash_password(password: str) -> str:
+    return await get_pool().run(get_context().hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await get_pool().run(get_context().verify, password, hashed_password)
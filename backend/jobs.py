@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, on_commit
+import models
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKER = os.getenv("JOB_WORKER", "true").lower() in ("1", "true", "yes")  # Run a worker in this process
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))  # Seconds
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "60"))  # Seconds one attempt may run before it is abandoned
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "2"))  # Seconds before the first retry, doubled per attempt
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "600"))
+
+Handler = Callable[[dict], Awaitable[None]]
+HANDLERS: Dict[str, Handler] = {}
+
+
+def handler(kind: str):
+    def register(func: Handler) -> Handler:
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+async def enqueue(db: AsyncSession, kind: str, payload: dict, delay: float = 0, max_attempts: int = JOB_MAX_ATTEMPTS):
+    # Adds the job to the caller's transaction, so it exists exactly when the write it follows
+    # commits. The caller commits, and that wakes the worker; waking it sooner would have it poll
+    # before the job is visible and then sleep for a full interval.
+    if kind not in HANDLERS:
+        raise ValueError(f"No job handler registered for '{kind}'")
+    now = datetime.utcnow()
+    await db.execute(insert(models.Job).values(
+        kind=kind,
+        payload=json.dumps(payload),
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts,
+        run_after=now + timedelta(seconds=delay),
+        created_at=now,
+    ))
+    on_commit(db, queue.wake)
+
+
+def backoff(attempts: int) -> float:
+    # Exponential with +-25% jitter so failing jobs do not retry in lockstep
+    delay = min(JOB_BACKOFF_BASE * 2 ** (attempts - 1), JOB_BACKOFF_MAX)
+    return delay * random.uniform(0.75, 1.25)
+
+# -------------------------
+# Worker
+# -------------------------
+
+class JobQueue:
+    # Polls the jobs table and runs due jobs, never more than `concurrency` at once. Claiming is
+    # a single UPDATE ... RETURNING (with SKIP LOCKED on Postgres), so several processes can run
+    # workers against one table. A job whose worker died is reclaimed once its lock expires.
+    def __init__(self, concurrency: int = JOB_CONCURRENCY, poll_interval: float = JOB_POLL_INTERVAL):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._wake = asyncio.Event()
+        self._poller: Optional[asyncio.Task] = None
+        self._running: set = set()
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def wake(self):
+        self._wake.set()
+
+    def start(self):
+        if self._poller is None:
+            self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self, timeout: float = 10):
+        # Stops claiming, then gives in-flight jobs up to timeout seconds; unfinished ones are
+        # picked up again after their lock expires
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        if self._running:
+            await asyncio.wait(self._running, timeout=timeout)
+
+    async def _poll(self):
+        while True:
+            try:
+                free = self.concurrency - len(self._running)
+                claimed = await self._claim(free) if free > 0 else []
+                for job in claimed:
+                    task = asyncio.create_task(self._run(job))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+                if len(claimed) == free and free > 0:
+                    continue  # Possibly more due jobs waiting
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job poller failed")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self, limit: int):
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            due = (
+                select(models.Job.id)
+                .where(or_(
+                    and_(models.Job.status == "queued", models.Job.run_after <= now),
+                    and_(models.Job.status == "running", models.Job.locked_until < now),
+                ))
+                .order_by(models.Job.run_after)
+                .limit(limit)
+            )
+            if db.bind.dialect.name == "postgresql":
+                due = due.with_for_update(skip_locked=True)
+            stmt = (
+                update(models.Job)
+                .where(models.Job.id.in_(due.scalar_subquery()))
+                .values(status="running", attempts=models.Job.attempts + 1, locked_until=now + timedelta(seconds=JOB_TIMEOUT))
+                .returning(models.Job)
+            )
+            jobs = (await db.scalars(stmt, execution_options={"synchronize_session": False})).all()
+            await db.commit()
+            return jobs
+
+    async def _run(self, job: models.Job):
+        try:
+            await asyncio.wait_for(HANDLERS[job.kind](json.loads(job.payload)), JOB_TIMEOUT)
+        except Exception as exc:
+            await self._finish(job, error=exc)
+        else:
+            await self._finish(job)
+
+    async def _finish(self, job: models.Job, error: Optional[Exception] = None):
+        now = datetime.utcnow()
+        values = {"locked_until": None, "updated_at": now}
+        if error is None:
+            values.update(status="done", last_error=None)
+            self.completed += 1
+        elif job.attempts < job.max_attempts:
+            values.update(status="queued", run_after=now + timedelta(seconds=backoff(job.attempts)), last_error=repr(error))
+            self.retried += 1
+            logger.warning("Job %s (%s) failed on attempt %d, retrying: %r", job.id, job.kind, job.attempts, error)
+        else:
+            values.update(status="failed", last_error=repr(error))
+            self.failed += 1
+            logger.error("Job %s (%s) failed permanently after %d attempts: %r", job.id, job.kind, job.attempts, error)
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(models.Job).where(models.Job.id == job.id).values(**values), execution_options={"synchronize_session": False})
+            await db.commit()
+
+    def snapshot(self) -> dict:
+        return {
+            "worker": self._poller is not None,
+            "concurrency": self.concurrency,
+            "in_flight": len(self._running),
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+queue = JobQueue()
+
+
+async def status_counts(db: AsyncSession) -> Dict[str, int]:
+    rows = await db.execute(select(models.Job.status, func.count()).group_by(models.Job.status))
+    return {status: count for status, count in rows}
+
+# -------------------------
+# Handlers
+# -------------------------
+# Notification delivery is not wired to a mail or SMS provider yet; the handlers record the
+# event so the request path already hands the work off.
+
+@handler("appointment_requested")
+async def appointment_requested(payload: dict):
+    logger.info("Notify doctor %s: appointment %s requested for %s", payload["doctor_id"], payload["meeting_id"], payload["scheduled_date"])
+
+
+@handler("meeting_status_changed")
+async def meeting_status_changed(payload: dict):
+    logger.info("Notify patient %s: meeting %s is now %s", payload["patient_id"], payload["meeting_id"], payload["status"])
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import signal
+import threading
+from contextlib import AsyncExitStack, contextmanager
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+import attachments
+import audit
+import database
+import events
+import hashing
+import jobs
+import tokens
+
+logger = logging.getLogger(__name__)
+
+# serve.py migrates once before starting its workers and turns this off for them; a single
+# `uvicorn main:app` migrates on startup instead
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+MIGRATION_LOCK_KEY = 727_001  # Postgres advisory lock id shared by every process that migrates
+INITIAL_REVISION = "0001_initial_schema"
+INITIAL_TABLES = {"users", "meetings", "medical_records", "medicines"}  # What create_all made before migrations
+
+
+class State:
+    # Read by /health: a load balancer routes to a worker only while it is ready and not draining
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+
+
+state = State()
+
+# -------------------------
+# Migrations
+# -------------------------
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    return config
+
+
+@contextmanager
+def migration_lock():
+    # Serializes migrations across processes and hosts: the first one upgrades, the rest wait
+    # and then find nothing to do
+    url = make_url(database.URL_DATABASE)
+    if url.get_backend_name() == "postgresql":
+        with database.engine.connect() as connection:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            try:
+                yield
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    elif url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        import fcntl
+        with open(url.database + ".migrate-lock", "w") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+    else:
+        yield
+
+
+def stamp_unversioned(config: Config):
+    # A database created by Base.metadata.create_all has the initial tables but no alembic_version;
+    # upgrading it from scratch would fail creating users. It is stamped at the initial revision
+    # and upgraded from there. Any other unversioned schema is left alone rather than guessed at.
+    with database.engine.connect() as connection:
+        tables = set(inspect(connection).get_table_names())
+    if not tables or "alembic_version" in tables:
+        return
+    if tables != INITIAL_TABLES:
+        raise RuntimeError(
+            f"The database has tables but no migration history ({', '.join(sorted(tables))}); "
+            "stamp it at the revision it matches with `alembic stamp <revision>` before upgrading."
+        )
+    logger.warning("Database was created without migrations; stamping it at %s", INITIAL_REVISION)
+    command.stamp(config, INITIAL_REVISION)
+
+
+def migrate():
+    config = alembic_config()
+    with migration_lock():
+        stamp_unversioned(config)
+        command.upgrade(config, "head")
+
+
+def schema_is_current() -> bool:
+    heads = set(ScriptDirectory.from_config(alembic_config()).get_heads())
+    with database.engine.connect() as connection:
+        return set(MigrationContext.configure(connection).get_current_heads()) == heads
+
+# -------------------------
+# Startup and shutdown
+# -------------------------
+
+async def warm_database():
+    # Opens each pool's steady-state connections (primary and replicas) up front, so the first
+    # requests after a deploy do not each pay for a new connection
+    for async_engine in (database.async_engine, *database.replica_engines):
+        pool = async_engine.pool
+        size = pool.size() if isinstance(pool, QueuePool) else 1
+        async with AsyncExitStack() as stack:
+            for _ in range(size):
+                connection = await stack.enter_async_context(async_engine.connect())
+                await connection.execute(text("SELECT 1"))
+
+
+def begin_drain():
+    # First thing on SIGTERM: stop reporting healthy and end the event streams, which would
+    # otherwise keep the in-flight drain waiting until its timeout
+    state.draining = True
+    events.broker.close()
+
+
+def install_signal_handlers(loop: asyncio.AbstractEventLoop):
+    # Runs ahead of the server's own handler, which is kept and still performs the shutdown
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(begin_drain)
+            if callable(previous):
+                previous(signum, frame)
+
+        signal.signal(sig, handler)
+
+
+async def startup():
+    os.makedirs(attachments.UPLOAD_DIR, exist_ok=True)
+    if MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(migrate)
+    elif not await asyncio.to_thread(schema_is_current):
+        raise RuntimeError("The database schema is not at the latest migration; run `alembic upgrade head`.")
+    await hashing.start()
+    await warm_database()
+    await tokens.revocations.refresh()
+    # Background jobs (see jobs.py) run inside the API process; JOB_WORKER=false leaves them to other processes
+    if jobs.JOB_WORKER:
+        jobs.queue.start()
+    audit.log.start()
+    install_signal_handlers(asyncio.get_running_loop())
+    state.ready = True
+    logger.info("Worker %d ready", os.getpid())
+
+
+async def shutdown():
+    # In-flight requests have finished (or timed out) by the time the server calls this
+    begin_drain()
+    await jobs.queue.stop()
+    await audit.log.stop()  # Writes out the buffered events
+    hashing.stop()
+    for async_engine in (database.async_engine, *database.replica_engines):
+        await async_engine.dispose()
+    database.engine.dispose()
+    state.ready = False
@@ -1,27 +1,53 @@
 import logging
-import os
-from datetime import datetime, timedelta, timezone
-from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File, Request
+from contextlib import asynccontextmanager
+from urllib.parse import urlencode
+from datetime import datetime, timedelta
+from fastapi import FastAPI, HTTPException, Body, Depends, Query, Response, status, UploadFile, File, Request, WebSocket
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import FileResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from typing import Annotated, List
-
-from database import engine, SessionLocal
+from starlette.background import BackgroundTask
+from jose import JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Annotated, List, Literal, Optional
+
+import attachments
+import audit
+import bulk
+import database
+import events
+from database import get_db
+import hashing
+import jobs
+import lifecycle
+from hashing import HashingPoolBusy, verify_password
+import profiling
+import search
+import tokens
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, Page
+from scheduling import MAX_SLOT_RANGE, SlotConflict
+import cache
 import crud
 import models
 import schemas
 
-app = FastAPI()
+# Process setup (upload directory, migrations, warm pools and caches, the job worker) runs here
+# rather than at import; see lifecycle.py and serve.py for the multi-worker entry point
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await lifecycle.startup()
+    try:
+        yield
+    finally:
+        await lifecycle.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
-UPLOAD_DIR = "uploads"
-if not os.path.exists(UPLOAD_DIR):
-    os.makedirs(UPLOAD_DIR)
+UPLOAD_DIR = attachments.UPLOAD_DIR
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 origins = [
     "http://localhost:3000",
@@ -33,28 +59,82 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", *profiling.PROFILE_HEADERS],
 )
 
+# Per-request query counts and DB time; see profiling.py for the debug headers and slow request log
+for profiled_engine in (database.async_engine, *database.replica_engines):
+    profiling.instrument(profiled_engine.sync_engine)
+app.add_middleware(profiling.QueryProfilerMiddleware)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-models.Base.metadata.create_all(bind=engine)
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-SECRET_KEY = os.environ.get("SECRET_KEY", "sdh433423sd342345lklvb99034")
-ALGORITHM = os.environ.get("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = 10
 REFRESH_TOKEN_EXPIRE_MINUTES = 10
 
-db_dependency = Annotated[Session, Depends(lambda: SessionLocal())]
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+
+# Pagination helpers shared by every list endpoint
+class PageParams:
+    def __init__(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    ):
+        self.cursor = cursor
+        self.limit = limit
+
+page_dependency = Annotated[PageParams, Depends()]
+
+def page_response(page: Page, response: Response, schema: Optional[type] = None):
+    # The body stays a plain list; the token for the next page travels in a header
+    headers = {"X-Next-Cursor": page.next_cursor} if page.next_cursor else {}
+    if schema is not None:
+        # Alternate representation (e.g. shallow meetings) that bypasses the route's response_model
+        items = [schema.model_validate(item) for item in page.items]
+        return JSONResponse(content=jsonable_encoder(items), headers=headers)
+    response.headers.update(headers)
+    return page.items
+
+def stream_response(stmt, fmt: bulk.Format) -> StreamingResponse:
+    # ?format=ndjson|csv: every matching row, streamed flat from a server-side cursor instead of paged
+    columns = [column.key for column in stmt.selected_columns]
+    return StreamingResponse(bulk.stream_rows(stmt, columns, fmt), media_type=bulk.MEDIA_TYPES[fmt])
+
+async def cached_response(request: Request, db: AsyncSession, role: str, build) -> Response:
+    # Directory reads served from cache.responses, keyed by path, caller role and query string.
+    # A matching If-None-Match is answered with 304 before build() ever reaches the database.
+    query = urlencode(sorted(request.query_params.multi_items()))
+    key = await cache.responses.key("users", request.url.path, role, query)
+    entry = await cache.responses.get(key)
+    if entry is None:
+        # Built on the primary: a lagging replica would store the data from before the write that
+        # just bumped the generation, and serve it to everyone until the entry expires
+        db.info.pop("replica", None)
+        content, headers = await build()
+        entry = cache.CachedResponse.build(JSONResponse(content=jsonable_encoder(content)).body, headers)
+        await cache.responses.set(key, entry)
+    headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if entry.etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+@app.exception_handler(SlotConflict)
+async def slot_conflict_handler(request: Request, exc: SlotConflict):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+@app.exception_handler(attachments.AttachmentTooLarge)
+async def attachment_too_large_handler(request: Request, exc: attachments.AttachmentTooLarge):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+@app.exception_handler(HashingPoolBusy)
+async def hashing_pool_busy_handler(request: Request, exc: HashingPoolBusy):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
 # Helper functions to check user role
 def is_patient(user: models.User) -> bool:
@@ -66,57 +146,95 @@ def is_doctor(user: models.User) -> bool:
 def is_admin(user: models.User) -> bool:
     return user.role == "admin"
 
+def can_read_record(user: schemas.Principal, doctor_id: int, patient_id: int) -> bool:
+    return is_admin(user) or user.id in (doctor_id, patient_id)
+
+def can_write_record(user: schemas.Principal, doctor_id: int) -> bool:
+    return is_admin(user) or (is_doctor(user) and user.id == doctor_id)
+
+# Who to name in the audit log (see audit.py) for record and medicine access
+def actor(user: schemas.Principal) -> audit.Actor:
+    return audit.Actor(user.id, user.role)
+
+async def audit_actor(token: Optional[str] = Depends(optional_oauth2_scheme)) -> audit.Actor:
+    # For endpoints that do not require a token: the signed claims when one is sent, else anonymous
+    if not token:
+        return audit.ANONYMOUS
+    try:
+        claims = await tokens.decode(token)
+    except JWTError:
+        return audit.ANONYMOUS
+    return audit.Actor(claims.get("id"), claims.get("role"))
+
+def audit_meeting_records(who: audit.Actor, meetings) -> None:
+    # Meetings served with their records count as reads of those records
+    audit.log.record_many(who, "read", "medical_record", (record.id for meeting in meetings for record in meeting.medical_records))
+
 # ----------------
 # User Endpoints
 # ----------------
 @app.post("/register", response_model=schemas.User, status_code=status.HTTP_201_CREATED, tags=["Users"])
 async def register_user(user: schemas.UserCreate, db: db_dependency) -> schemas.User:
-    db_user = crud.get_user(db=db, username=user.username)
+    db_user = await crud.get_user(db=db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="User already exists")
-    return crud.create_user(db=db, user=user)
+    return await crud.create_user(db=db, user=user)
 
 @app.get("/users", response_model=List[schemas.User],tags=["Users"])
-async def list_users(db: db_dependency):
-    users = crud.get_users(db=db)
-    return users
+async def list_users(db: db_dependency, page: page_dependency, response: Response, role: Optional[str] = None):
+    users = await crud.get_users(db=db, role=role, cursor=page.cursor, limit=page.limit)
+    return page_response(users, response)
 
 @app.get("/user/{user_id}", response_model=schemas.User, tags=["Users"])
-async def get_user_by_id(user_id: int, db: db_dependency):
-    user = crud.get_user_by_id(db, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
-
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_user_by_id(user_id: int, request: Request, db: db_dependency):
+    async def build():
+        user = await crud.get_user_by_id(db, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return schemas.User.model_validate(user), {}
+    return await cached_response(request, db, "public", build)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = await tokens.decode(token)
         user_username: str = payload.get("sub")
+        user_id: int | None = payload.get("id")
         if user_username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user_id = crud.get_user_id(db, user_username)
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if user is None:
+    # Fast path: a cached principal answers without touching the database
+    principal = cache.principals.get(user_id) if user_id is not None else None
+    if principal is not None and principal.username == user_username:
+        return principal
+    if user_id is not None:
+        user = await crud.get_user_by_id(db, user_id)
+        if user is None and db.info.pop("replica", None) is not None:
+            # Just registered and not on the replica yet; this request reads from the primary
+            user = await crud.get_user_by_id(db, user_id)
+    else:
+        user = await crud.get_user(db, user_username)
+    if user is None or user.username != user_username:
         raise credentials_exception
-    return user
+    principal = schemas.Principal.model_validate(user)
+    cache.principals.set(principal.id, principal)
+    return principal
 
 @app.put("/user/{user_id}", response_model=schemas.User,tags=["Users"])
 async def update_user(user_id: int, user: schemas.UserCreate, db: db_dependency):
-    db_user = crud.update_user(db, user_id, user)
+    db_user = await crud.update_user(db, user_id, user)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 @app.delete("/user/{user_id}", response_model=dict,tags=["Users"])
 async def delete_user(user_id: int, db: db_dependency):
-    result = crud.delete_user(db, user_id)
+    result = await crud.delete_user(db, user_id)
     if not result:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User deleted successfully"}
@@ -125,113 +243,203 @@ async def delete_user(user_id: int, db: db_dependency):
 # Admin Endpoints
 # ---------------
 @app.get("/patients", response_model=List[schemas.User], tags=["Admin"])
-async def list_patients(db: Session = Depends(get_db)):
-    return crud.get_patients(db)
+async def list_patients(page: page_dependency, request: Request, db: AsyncSession = Depends(get_db)):
+    async def build():
+        patients = await crud.get_patients(db, cursor=page.cursor, limit=page.limit)
+        headers = {"X-Next-Cursor": patients.next_cursor} if patients.next_cursor else {}
+        return [schemas.User.model_validate(user) for user in patients.items], headers
+    return await cached_response(request, db, "public", build)
 
 @app.put("/doctors/{doctor_id}/confirm", response_model=schemas.User)
 async def confirm_doctor_registration(
     doctor_id: int,  # <-- Use the same name as the path parameter
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     if not is_admin(current_user):
         raise HTTPException(status_code=403, detail="Admin privilege required")
-    doctor = crud.get_user_by_id(db, doctor_id)  # Updated to match argument
+    doctor = await crud.get_user_by_id(db, doctor_id)  # Updated to match argument
     if not is_doctor(doctor):
         raise HTTPException(status_code=403, detail="This user is not a doctor")
-    return crud.confirm_doctor(db, doctor_id)
+    return await crud.confirm_doctor(db, doctor_id)
 
 
+@app.get("/stats", response_model=schemas.Stats, tags=["Admin"])
+async def hospital_stats(
+    date_from: Optional[schemas.UTCDatetime] = None,
+    date_to: Optional[schemas.UTCDatetime] = None,
+    granularity: Literal["day", "week"] = "day",
+    current_user: schemas.Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin privilege required")
+    date_from, date_to = stats_range(date_from, date_to)
+    return await crud.get_stats(db, date_from, date_to, granularity)
+
 @app.get("/users", response_model=List[schemas.User])
-async def list_all_users(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def list_all_users(page: page_dependency, response: Response, role: Optional[str] = None, current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     if not is_admin(current_user):
         raise HTTPException(status_code=403, detail="Admin privilege required")
-    return crud.get_users(db)
+    return page_response(await crud.get_users(db, role=role, cursor=page.cursor, limit=page.limit), response)
 
 # -----------------
 # Patient Endpoints
 # -----------------
 @app.get("/doctors", response_model=List[schemas.User])
-async def get_doctors(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    if is_admin(current_user):
-        return crud.get_doctors(db)  # Admin sees all doctors
-    return crud.get_confirmed_doctors(db)  # Others see only confirmed doctors
+async def get_doctors(request: Request, current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    async def build():
+        if is_admin(current_user):
+            doctors = await crud.get_doctors(db)  # Admin sees all doctors
+        else:
+            doctors = await crud.get_confirmed_doctors(db)  # Others see only confirmed doctors
+        return [schemas.User.model_validate(user) for user in doctors], {}
+    return await cached_response(request, db, current_user.role, build)
 
 @app.post("/patients/{patient_id}/appointments/{doctor_id}", response_model=schemas.Meeting, tags=["Patients"])
-async def request_appointment(patient_id: int, doctor_id: int, meeting_data: schemas.MeetingCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def request_appointment(patient_id: int, doctor_id: int, meeting_data: schemas.MeetingCreate, current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     if not is_patient(current_user) or current_user.id != patient_id:
         raise HTTPException(status_code=403, detail="Only patients can request appointments")
-    return crud.create_meeting_request(db, meeting_data, patient_id, doctor_id)
+    return await crud.create_meeting_request(db, meeting_data, patient_id, doctor_id)
+
+@app.post("/patients/{patient_id}/appointments/{doctor_id}/reserve", response_model=schemas.Meeting, tags=["Patients"])
+async def reserve_appointment(patient_id: int, doctor_id: int, meeting_data: schemas.MeetingCreate, current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # Books a free slot from /doctors/{doctor_id}/slots; 409 if it is taken or not a slot
+    if not is_patient(current_user) or current_user.id != patient_id:
+        raise HTTPException(status_code=403, detail="Only patients can request appointments")
+    doctor = await crud.get_user_by_id(db, doctor_id)
+    if not doctor or not is_doctor(doctor):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    return await crud.reserve_slot(db, patient_id, doctor_id, meeting_data.scheduled_date)
+
+@app.get("/doctors/{doctor_id}/slots", response_model=List[schemas.Slot], tags=["Patients"])
+async def list_free_slots(doctor_id: int, date_from: schemas.UTCDatetime, date_to: schemas.UTCDatetime, current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if date_to <= date_from:
+        raise HTTPException(status_code=400, detail="date_to must be after date_from")
+    if date_to - date_from > MAX_SLOT_RANGE:
+        raise HTTPException(status_code=400, detail=f"Range cannot exceed {MAX_SLOT_RANGE.days} days")
+    doctor = await crud.get_user_by_id(db, doctor_id)
+    if not doctor or not is_doctor(doctor):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    return await crud.get_free_slots(db, doctor_id, date_from, date_to)
+
+@app.get("/doctors/{doctor_id}/working_hours", response_model=List[schemas.WorkingHours], tags=["Doctors"])
+async def get_working_hours(doctor_id: int, current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    return await crud.get_working_hours(db, doctor_id)
+
+@app.put("/doctors/{doctor_id}/working_hours", response_model=List[schemas.WorkingHours], tags=["Doctors"])
+async def set_working_hours(doctor_id: int, hours: List[schemas.WorkingHoursCreate], current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if not (is_admin(current_user) or (is_doctor(current_user) and current_user.id == doctor_id)):
+        raise HTTPException(status_code=403, detail="Only the doctor or an admin can change working hours")
+    return await crud.set_working_hours(db, doctor_id, hours)
+
+def stats_range(date_from: Optional[datetime], date_to: Optional[datetime]):
+    now = datetime.utcnow()
+    date_from = date_from or now - crud.DEFAULT_STATS_WINDOW
+    date_to = date_to or now + crud.DEFAULT_STATS_WINDOW
+    if date_to <= date_from:
+        raise HTTPException(status_code=400, detail="date_to must be after date_from")
+    if date_to - date_from > crud.MAX_STATS_RANGE:
+        raise HTTPException(status_code=400, detail=f"Range cannot exceed {crud.MAX_STATS_RANGE.days} days")
+    return date_from, date_to
+
+@app.get("/doctors/{doctor_id}/stats", response_model=schemas.Stats, tags=["Doctors"])
+async def doctor_stats(
+    doctor_id: int,
+    date_from: Optional[schemas.UTCDatetime] = None,
+    date_to: Optional[schemas.UTCDatetime] = None,
+    granularity: Literal["day", "week"] = "day",
+    current_user: schemas.Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    if not (is_admin(current_user) or (is_doctor(current_user) and current_user.id == doctor_id)):
+        raise HTTPException(status_code=403, detail="Only the doctor or an admin can view these statistics")
+    date_from, date_to = stats_range(date_from, date_to)
+    return await crud.get_stats(db, date_from, date_to, granularity, doctor_id=doctor_id)
 
 @app.get("/patient_requests", response_model=List[schemas.Meeting])
-def get_patient_requests(
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(get_current_user)
+async def get_patient_requests(
+    page: page_dependency,
+    response: Response,
+    filters: schemas.MeetingFilter = Depends(),
+    shallow: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_user)
 ):
     if current_user.role != "patient":
         raise HTTPException(status_code=403, detail="Not authorized")
-    
-    requests = db.query(models.Meeting).filter(models.Meeting.patient_id == current_user.id).all()
-    return requests
+
+    filters.patient_id = current_user.id
+    requests = await crud.get_meetings(db, filters, cursor=page.cursor, limit=page.limit, shallow=shallow)
+    if not shallow:
+        audit_meeting_records(actor(current_user), requests.items)
+    return page_response(requests, response, schemas.MeetingSummary if shallow else None)
 
 # -----------------
 # Doctor Endpoints
 # -----------------
 @app.get("/doctor_requests", response_model=List[schemas.Meeting])
-def get_doctor_requests(
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(get_current_user)
+async def get_doctor_requests(
+    page: page_dependency,
+    response: Response,
+    filters: schemas.MeetingFilter = Depends(),
+    shallow: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_user)
 ):
     if current_user.role != "doctor":
         raise HTTPException(status_code=403, detail="Not authorized")
-    
-    requests = db.query(models.Meeting).filter(models.Meeting.doctor_id == current_user.id).all()
-    return requests
 
-@app.patch("/meetings/{meeting_id}/{status}", tags=["Doctors"])
-async def confirm_meeting(meeting_id: int, status: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    filters.doctor_id = current_user.id
+    requests = await crud.get_meetings(db, filters, cursor=page.cursor, limit=page.limit, shallow=shallow)
+    if not shallow:
+        audit_meeting_records(actor(current_user), requests.items)
+    return page_response(requests, response, schemas.MeetingSummary if shallow else None)
+
+@app.patch("/meetings/{meeting_id}/{status}", response_model=schemas.Meeting, tags=["Doctors"])
+async def confirm_meeting(meeting_id: int, status: int, current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     if not is_doctor(current_user):
         raise HTTPException(status_code=403, detail="Only doctors can confirm meetings")
     if not current_user.is_confirmed:
         raise HTTPException(status_code=403, detail="Doctor is not confirmed")
-    return crud.confirm_meeting(db=db, meeting_id=meeting_id, status=status)
+    meeting = await crud.confirm_meeting(db=db, meeting_id=meeting_id, status=status)
+    if meeting is False:
+        raise HTTPException(status_code=400, detail="Invalid meeting status")
+    if meeting is None:
+        raise HTTPException(status_code=404, detail="Meeting not found")
+    return meeting
 
 @app.post("/meetings/{meeting_id}/records", response_model=schemas.MedicalRecord, tags=["Doctors"])
-async def create_medical_record(meeting_id: int, record_data: schemas.MedicalRecordCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def create_medical_record(meeting_id: int, record_data: schemas.MedicalRecordCreate, current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     if not is_doctor(current_user):
         raise HTTPException(status_code=403, detail="Only doctors can create medical records")
-    return crud.create_medical_record(db, meeting_id, record_data)
+    record = await crud.create_medical_record(db, meeting_id, record_data)
+    audit.log.record(actor(current_user), "create", "medical_record", record.id)
+    return record
 
 # ---------------
 # Token Endpoints
 # ---------------
-def authenticate_user(username: str, password: str, db: db_dependency):
-    user = crud.get_user(db=db, username=username)
-    if not user or not pwd_context.verify(password, user.hashed_password):
+async def authenticate_user(username: str, password: str, db: AsyncSession):
+    user = await crud.get_user(db=db, username=username)
+    if not user or not await verify_password(password, user.hashed_password):
         return False
     return user
 
+# Claims that describe the user; a token carrying them can be re-minted without the database
+TOKEN_CLAIMS = ("id", "sub", "name", "surname", "role")
+
 def create_access_token(data: dict, role: str, expires_delta: timedelta | None = None):
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=15))
-    to_encode.update({
-        'exp': expire,
-        'iat': datetime.now(timezone.utc),  # Issued-at timestamp
-        'role': role  # Add the user's role to the payload
-    })
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return tokens.encode({**data, "role": role}, expires_delta or timedelta(minutes=15))
 
 
 def create_refresh_token(data: dict, expires_delta: timedelta | None = None):
-    to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return tokens.encode({**data, "type": "refresh"}, expires_delta or timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES))
 
 
 @app.post("/token", tags=['Tokens'])
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(form_data.username, form_data.password, db)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -239,95 +447,139 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             headers={"WWW-Authenticate": "Bearer"}
         )
     # Pass the user's role to include it in the token payload
+    claims = {"id": user.id, "sub": user.username, "name": user.name, "surname": user.surname}
     access_token = create_access_token(
-        data={"id": user.id, "sub": user.username, "name": user.name, "surname": user.surname},
+        data=claims,
         role=user.role,
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
-    refresh_token = create_refresh_token(data={"sub": user.username})
+    refresh_token = create_refresh_token(data={**claims, "role": user.role})
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
 
-def verify_token(token: str = Depends(oauth2_scheme)):
+async def verify_token(token: str = Depends(oauth2_scheme)):
+    # Signed claims only: signature, expiry and the revocation filter, no user lookup. Changing
+    # or deleting a user revokes their tokens (see tokens.revoke_user).
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=403, detail="Token is invalid")
-        return payload
+        payload = await tokens.decode(token)
     except JWTError:
         raise HTTPException(status_code=403, detail="Token is invalid")
+    if any(payload.get(claim) is None for claim in TOKEN_CLAIMS):
+        raise HTTPException(status_code=403, detail="Token is invalid")
+    return payload
 
 
-@app.get("/verify-token/{token}", tags=['Tokens'])
-async def verify_user_token(token: str, db: Session = Depends(get_db)):
-    payload = verify_token(token=token)
-    username = payload.get("sub")
-    user = crud.get_user(db, username=username)
-
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Pass role and name in data without using timedelta here
-    new_token = create_access_token(
-        data={"id": user.id, "sub": user.username, "name": user.name, "surname": user.surname},
-        role = user.role,
-        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)  # Pass timedelta only as an argument here
+def reissue_access_token(payload: dict) -> str:
+    return create_access_token(
+        data={"id": payload["id"], "sub": payload["sub"], "name": payload["name"], "surname": payload["surname"]},
+        role=payload["role"],
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
+
+@app.get("/verify-token/{token}", tags=['Tokens'])
+async def verify_user_token(token: str):
+    payload = await verify_token(token=token)
     return {
         "message": "Token is valid",
-        "role": user.role,
-        "user_id": user.id,
-        "name": user.name,
-        "surname": user.surname,
-        "access_token": new_token
+        "role": payload["role"],
+        "user_id": payload["id"],
+        "name": payload["name"],
+        "surname": payload["surname"],
+        "access_token": reissue_access_token(payload)
     }
 
 
 @app.post("/refresh-token", tags=['Tokens'])
-async def refresh_access_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def refresh_access_token(token: str = Depends(oauth2_scheme)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        id: int = payload.get("id")
-        username: str = payload.get("sub")
-        # if user_id is None or username is None or role is None:
-        #     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid refresh token")
-        user = db.query(models.User).filter(models.User.username == username).first()
-        if user is None:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-        access_token = create_access_token(data={"id": id, "sub": username}, role={"role": user.role})
-
-        return {"access_token": access_token, "token_type": "bearer"}
-
-    except JWTError:
+        payload = await verify_token(token=token)
+    except HTTPException:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid refresh token")
+    return {"access_token": reissue_access_token(payload), "token_type": "bearer"}
+
+
+@app.post("/logout", status_code=status.HTTP_204_NO_CONTENT, tags=['Tokens'])
+async def logout(db: db_dependency, token: str = Depends(oauth2_scheme)):
+    payload = await verify_token(token=token)
+    if payload.get("jti") is not None:
+        await tokens.revoke_token(db, payload)
 
 # ---------------------
 # Appointment Endpoints
 # ---------------------
 @app.get("/meetings", response_model=List[schemas.Meeting], tags=["Appointments"])
-async def list_meetings(db: db_dependency):
-    return crud.get_meetings(db)
+async def list_meetings(db: db_dependency, page: page_dependency, response: Response, filters: schemas.MeetingFilter = Depends(), shallow: bool = False, fmt: Optional[bulk.Format] = Query(None, alias="format"), who: audit.Actor = Depends(audit_actor)):
+    if fmt is not None:
+        return stream_response(crud.meeting_rows(filters), fmt)
+    meetings = await crud.get_meetings(db, filters, cursor=page.cursor, limit=page.limit, shallow=shallow)
+    if not shallow:
+        audit_meeting_records(who, meetings.items)
+    return page_response(meetings, response, schemas.MeetingSummary if shallow else None)
 
 @app.get("/meetings/{meeting_id}", response_model=schemas.Meeting, tags=["Appointments"])
-async def get_meeting(meeting_id: int, db: db_dependency):
-    appointment = crud.get_meeting(db, meeting_id)
+async def get_meeting(meeting_id: int, db: db_dependency, who: audit.Actor = Depends(audit_actor)):
+    appointment = await crud.get_meeting(db, meeting_id)
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
+    audit_meeting_records(who, [appointment])
     return appointment
 
+MEETING_DETAIL_FIELDS = ("patient", "doctor", "medical_records", "medicines", "permissions")
+
+def meeting_permissions(user: schemas.Principal, meeting: models.Meeting) -> schemas.MeetingPermissions:
+    party = can_read_record(user, meeting.doctor_id, meeting.patient_id)
+    return schemas.MeetingPermissions(
+        can_reschedule=party,
+        can_cancel=party,
+        can_confirm=is_doctor(user) and bool(user.is_confirmed) and user.id == meeting.doctor_id and meeting.status == "Pending",
+        can_write_records=can_write_record(user, meeting.doctor_id),
+    )
+
+@app.get("/meetings/{meeting_id}/detail", response_model=schemas.MeetingDetail, response_model_exclude_unset=True, tags=["Appointments"])
+async def get_meeting_detail(
+    meeting_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated sections: " + ",".join(MEETING_DETAIL_FIELDS)),
+    current_user: schemas.Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # Everything a meeting page shows in one round trip; list views ask for fewer sections
+    sections = set(MEETING_DETAIL_FIELDS) if fields is None else {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = sections.difference(MEETING_DETAIL_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    if "medicines" in sections:
+        sections.add("medical_records")
+    meeting = await crud.get_meeting_detail(db, meeting_id, sections)
+    if meeting is None:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    if not can_read_record(current_user, meeting.doctor_id, meeting.patient_id):
+        raise HTTPException(status_code=403, detail="You can only view your own meetings")
+
+    detail = schemas.MeetingDetail.model_validate(schemas.MeetingSummary.model_validate(meeting).model_dump())
+    if "patient" in sections:
+        detail.patient = schemas.User.model_validate(meeting.patient)
+    if "doctor" in sections:
+        detail.doctor = schemas.User.model_validate(meeting.doctor)
+    if "medical_records" in sections:
+        record_schema = schemas.MedicalRecord if "medicines" in sections else schemas.MedicalRecordSummary
+        detail.medical_records = [record_schema.model_validate(record) for record in meeting.medical_records]
+        audit_meeting_records(actor(current_user), [meeting])
+    if "permissions" in sections:
+        detail.permissions = meeting_permissions(current_user, meeting)
+    return detail
+
 @app.put("/meetings/{meeting_id}", response_model=schemas.Meeting, tags=["Appointments"])
 async def update_meeting(meeting_id: int, appointment_update: schemas.MeetingCreate, db: db_dependency):
-    updated_appointment = crud.update_meeting(db, meeting_id, appointment_update)
+    updated_appointment = await crud.update_meeting(db, meeting_id, appointment_update)
     if not updated_appointment:
         raise HTTPException(status_code=404, detail="Meeting not found")
     return updated_appointment
 
 @app.delete("/meetings/{meeting_id}", response_model=dict, tags=["Appointments"])
 async def delete_meeting(meeting_id: int, db: db_dependency):
-    result = crud.delete_meeting(db, meeting_id)
+    result = await crud.delete_meeting(db, meeting_id)
     if not result:
         raise HTTPException(status_code=404, detail="Appointment not found")
     return {"message": "Meeting deleted successfully"}
@@ -337,71 +589,101 @@ async def delete_meeting(meeting_id: int, db: db_dependency):
 # Mediacl Records Endpoints
 # -------------------------
 @app.get("/medical_records", response_model=List[schemas.MedicalRecord], tags=["Medical Records"])
-async def list_medical_records(db: db_dependency):
-    return crud.get_medical_records(db)
+async def list_medical_records(db: db_dependency, page: page_dependency, response: Response, filters: schemas.MedicalRecordFilter = Depends(), fmt: Optional[bulk.Format] = Query(None, alias="format"), who: audit.Actor = Depends(audit_actor)):
+    if fmt is not None:
+        audit.log.record(who, "export", "medical_record", None)
+        return stream_response(crud.medical_record_rows(filters), fmt)
+    records = await crud.get_medical_records(db, filters, cursor=page.cursor, limit=page.limit)
+    audit.log.record_many(who, "read", "medical_record", (record.id for record in records.items))
+    return page_response(records, response)
 
 @app.get("/medical_records/{medical_record_id}", response_model=schemas.MedicalRecord, tags=["Medical Records"])
-async def get_medical_record(medical_record_id: int, db: db_dependency):
-    medical_record = crud.get_medical_record(db, medical_record_id)
+async def get_medical_record(medical_record_id: int, db: db_dependency, who: audit.Actor = Depends(audit_actor)):
+    medical_record = await crud.get_medical_record(db, medical_record_id)
     if not medical_record:
         raise HTTPException(status_code=404, detail="Medical Record not found")
+    audit.log.record(who, "read", "medical_record", medical_record_id)
     return medical_record
 
 @app.put("/medical_records/{medical_record_id}", response_model=schemas.MedicalRecord, tags=["Medical Records"])
 async def update_medical_record(
     medical_record_id: int,
     medical_record_update: schemas.MedicalRecordCreate,  # Use a dedicated schema for updates
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
     # Check if the user is a doctor
     if not is_doctor(current_user):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only doctors can update medical records.")
     # Perform the update
-    updated_medical_record = crud.update_medical_record(db, medical_record_id, medical_record_update.description)
+    updated_medical_record = await crud.update_medical_record(db, medical_record_id, medical_record_update.description)
     # Check if the record was found
     if not updated_medical_record:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Medical Record not found")
+    audit.log.record(actor(current_user), "update", "medical_record", medical_record_id)
     return updated_medical_record
 
 
 @app.delete("/medical_records/{medical_record_id}", response_model=dict, tags=["Medical Records"])
-async def delete_medical_record(medical_record_id: int, db: db_dependency):
-    result = crud.delete_medical_record(db, medical_record_id)
+async def delete_medical_record(medical_record_id: int, db: db_dependency, who: audit.Actor = Depends(audit_actor)):
+    result = await crud.delete_medical_record(db, medical_record_id)
     if not result:
         raise HTTPException(status_code=404, detail="Medical Record not found")
+    audit.log.record(who, "delete", "medical_record", medical_record_id)
     return {"message": "Medical Record deleted successfully"}
 
 # -------------------------
 # Medicone Endpoints
 # -------------------------
-@app.post("/medical_records/{medical_record_id}/medicines", response_model=schemas.Medicine, tags=["Medicines"])
-async def add_medicine(
-    medical_record_id: int, 
-    medicine_data: schemas.MedicineCreate, 
-    current_user: models.User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
-):
-    if not is_doctor(current_user):
+MAX_PRESCRIPTION_BATCH = 100
+
+async def check_prescriber(db: AsyncSession, user: schemas.Principal, medical_record_id: int):
+    # Record existence and the doctor's ownership of its meeting in one joined query
+    if not is_doctor(user):
         raise HTTPException(
             status_code=403, 
             detail="Only doctors can create medical records"
         )
-    medical_record = crud.get_medical_record(db, medical_record_id)
-    meeting = crud.get_meeting(db, medical_record.meeting_id)
-    if not meeting or meeting.doctor_id != current_user.id:
+    parties = await crud.get_record_parties(db, medical_record_id)
+    if parties is None:
+        raise HTTPException(status_code=404, detail="Medical Record not found")
+    if parties.doctor_id != user.id:
         raise HTTPException(
             status_code = 403,
             detail = "You can only prescribe medicines for your own meetings."
         )
-    return crud.create_medicine(db, medicine_data, medical_record_id)
+
+@app.post("/medical_records/{medical_record_id}/medicines", response_model=schemas.Medicine, tags=["Medicines"])
+async def add_medicine(
+    medical_record_id: int, 
+    medicine_data: schemas.MedicineCreate, 
+    current_user: schemas.Principal = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_db)
+):
+    await check_prescriber(db, current_user, medical_record_id)
+    medicine = await crud.create_medicine(db, medicine_data, medical_record_id)
+    audit.log.record(actor(current_user), "create", "medicine", medicine.id)
+    return medicine
+
+@app.post("/medical_records/{medical_record_id}/medicines/batch", response_model=List[schemas.Medicine], tags=["Medicines"])
+async def add_medicines(
+    medical_record_id: int,
+    medicines: List[schemas.MedicineCreate] = Body(..., min_length=1, max_length=MAX_PRESCRIPTION_BATCH),
+    current_user: schemas.Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # A whole prescription at once: one ownership query, one INSERT, one commit
+    await check_prescriber(db, current_user, medical_record_id)
+    created = await crud.create_medicines(db, medicines, medical_record_id)
+    audit.log.record_many(actor(current_user), "create", "medicine", (medicine.id for medicine in created))
+    return created
 
 @app.put("/medicines/{medicine_id}", response_model=schemas.Medicine, tags=["Medicines"])
 async def update_medicine(
     medicine_id: int,
     medicine_update: schemas.Medicine,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
     # Ensure the current user is a doctor
     if not is_doctor(current_user):
@@ -411,25 +693,27 @@ async def update_medicine(
         )
     
     # Validate the doctor is linked to the medicine's medical record
-    medicine = crud.get_medicine_by_id(db, medicine_id)
+    medicine = await crud.get_medicine_by_id(db, medicine_id)
     if not medicine:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Medicine not found.")
     
-    medical_record = crud.get_medical_record(db, medicine.medical_record_id)
-    appointment = crud.get_meeting(db, medical_record.meeting_id)
+    medical_record = await crud.get_medical_record(db, medicine.medical_record_id)
+    appointment = await crud.get_meeting(db, medical_record.meeting_id)
     if appointment.doctor_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You are not authorized to update this medicine."
         )
     # Update the medicine
-    return crud.update_medicine(db, medicine_id, medicine_update)
+    updated = await crud.update_medicine(db, medicine_id, medicine_update)
+    audit.log.record(actor(current_user), "update", "medicine", medicine_id)
+    return updated
 
 @app.delete("/medicines/{medicine_id}", response_model=dict, tags=["Medicines"])
 async def delete_medicine(
     medicine_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: schemas.Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
     # Ensure the current user is a doctor
     if not is_doctor(current_user):
@@ -439,12 +723,12 @@ async def delete_medicine(
         )
     
     # Validate the doctor is linked to the medicine's medical record
-    medicine = crud.get_medicine_by_id(db, medicine_id)
+    medicine = await crud.get_medicine_by_id(db, medicine_id)
     if not medicine:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Medicine not found.")
     
-    medical_record = crud.get_medical_record(db, medicine.medical_record_id)
-    appointment = crud.get_meeting(db, medical_record.meeting_id)
+    medical_record = await crud.get_medical_record(db, medicine.medical_record_id)
+    appointment = await crud.get_meeting(db, medical_record.meeting_id)
     if appointment.doctor_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -452,5 +736,251 @@ async def delete_medicine(
         )
     
     # Delete the medicine
-    result = crud.delete_medicine(db, medicine_id)
-    return {"message": "Medicine deleted successfully"}
\ No newline at end of file
+    result = await crud.delete_medicine(db, medicine_id)
+    audit.log.record(actor(current_user), "delete", "medicine", medicine_id)
+    return {"message": "Medicine deleted successfully"}
+
+# --------------------
+# Attachment Endpoints
+# --------------------
+@app.post("/medical_records/{medical_record_id}/attachments", response_model=schemas.Attachment, status_code=status.HTTP_201_CREATED, tags=["Attachments"])
+async def upload_attachment(
+    medical_record_id: int,
+    request: Request,
+    filename: str = Query(..., min_length=1),
+    current_user: schemas.Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # The raw request body is the file; it is written to disk as it arrives, never held in memory
+    parties = await crud.get_record_parties(db, medical_record_id)
+    if parties is None:
+        raise HTTPException(status_code=404, detail="Medical Record not found")
+    if not can_write_record(current_user, parties.doctor_id):
+        raise HTTPException(status_code=403, detail="Only the record's doctor can attach files")
+    sha256, size = await attachments.store(request.stream())
+    content_type = request.headers.get("content-type")
+    attachment = await crud.create_attachment(db, medical_record_id, attachments.safe_filename(filename), content_type, size, sha256)
+    audit.log.record(actor(current_user), "create", "attachment", attachment.id)
+    return attachment
+
+@app.get("/medical_records/{medical_record_id}/attachments", response_model=List[schemas.Attachment], tags=["Attachments"])
+async def list_attachments(medical_record_id: int, current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    parties = await crud.get_record_parties(db, medical_record_id)
+    if parties is None:
+        raise HTTPException(status_code=404, detail="Medical Record not found")
+    if not can_read_record(current_user, parties.doctor_id, parties.patient_id):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return await crud.get_attachments(db, medical_record_id)
+
+@app.get("/attachments/{attachment_id}", tags=["Attachments"])
+async def download_attachment(attachment_id: int, request: Request, current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # Supports single-range requests (206) for resumable downloads and PDF viewers
+    found = await crud.get_attachment(db, attachment_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    attachment, doctor_id, patient_id = found
+    if not can_read_record(current_user, doctor_id, patient_id):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if request.headers.get("if-none-match") == f'"{attachment.sha256}"':
+        return Response(status_code=304)
+    audit.log.record(actor(current_user), "read", "attachment", attachment_id)
+    return attachments.AttachmentResponse(attachment, request.headers.get("range"))
+
+@app.delete("/attachments/{attachment_id}", response_model=dict, tags=["Attachments"])
+async def delete_attachment(attachment_id: int, current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    found = await crud.get_attachment(db, attachment_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    if not can_write_record(current_user, found.doctor_id):
+        raise HTTPException(status_code=403, detail="Only the record's doctor can remove attachments")
+    await crud.delete_attachment(db, attachment_id)
+    audit.log.record(actor(current_user), "delete", "attachment", attachment_id)
+    return {"message": "Attachment deleted successfully"}
+
+# -------------
+# Job Endpoints
+# -------------
+@app.get("/jobs", response_model=List[schemas.Job], tags=["Admin"])
+async def list_jobs(page: page_dependency, response: Response, status: Optional[str] = None, kind: Optional[str] = None, current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin privilege required")
+    return page_response(await crud.get_jobs(db, status=status, kind=kind, cursor=page.cursor, limit=page.limit), response)
+
+@app.get("/jobs/{job_id}", response_model=schemas.Job, tags=["Admin"])
+async def get_job(job_id: int, current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin privilege required")
+    job = await crud.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# ---------------
+# Audit Endpoints
+# ---------------
+# Who read or changed which medical record, medicine or attachment, and when. Both endpoints
+# write out what is still buffered first, so they include everything up to the request.
+def require_table_sink():
+    if audit.log.path:
+        raise HTTPException(status_code=409, detail="Audit events go to a file on this deployment; read it there")
+
+@app.get("/audit", response_model=List[schemas.AuditEvent], tags=["Admin"])
+async def list_audit_events(page: page_dependency, response: Response, filters: schemas.AuditEventFilter = Depends(), current_user: schemas.Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin privilege required")
+    require_table_sink()
+    await audit.log.flush()
+    db.info.pop("replica", None)  # Read from the primary, which has what was just flushed
+    return page_response(await crud.get_audit_events(db, filters, cursor=page.cursor, limit=page.limit), response)
+
+@app.get("/audit/verify", response_model=dict, tags=["Admin"])
+async def verify_audit_log(current_user: schemas.Principal = Depends(get_current_user)):
+    # Walks every chain; reads the whole table, so it is for occasional checks
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin privilege required")
+    require_table_sink()
+    await audit.log.flush()
+    async with database.AsyncSessionLocal() as db:
+        return await audit.verify_table(db)
+
+# ----------------
+# Event Endpoints
+# ----------------
+# Pushes meeting changes (created, updated, confirmed, rejected, deleted) to both parties, so open pages
+# no longer re-fetch /doctor_requests and /patient_requests to notice them. EventSource and
+# WebSocket clients cannot set headers, so the token may also come as ?token=. Only the signed
+# claims are checked: an open stream holds no database session.
+async def event_user_id(token: Optional[str]) -> Optional[int]:
+    try:
+        payload = await tokens.decode(token or "")
+    except JWTError:
+        return None
+    return payload.get("id")
+
+@app.get("/events", tags=["Events"])
+async def meeting_events(request: Request, token: Optional[str] = None):
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    user_id = await event_user_id(token)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        subscription = events.broker.subscribe(user_id)
+    except events.TooManyConnections as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "5"})
+    return StreamingResponse(
+        events.sse_stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also runs when the client leaves before the stream starts
+        background=BackgroundTask(events.broker.unsubscribe, subscription),
+    )
+
+@app.websocket("/ws/events")
+async def meeting_events_ws(websocket: WebSocket, token: Optional[str] = None):
+    user_id = await event_user_id(token)
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    try:
+        subscription = events.broker.subscribe(user_id)
+    except events.TooManyConnections:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    await websocket.accept()
+    await events.pump_websocket(websocket, subscription)
+
+# -----------------
+# Search Endpoints
+# -----------------
+@app.get("/search", response_model=List[schemas.SearchHit], tags=["Search"])
+async def search_records(
+    page: page_dependency,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    target: search.Target = "records",
+    current_user: schemas.Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # Admins search everything, doctors their own meetings, patients their own records
+    hits = await search.search(db, current_user, target, q, cursor=page.cursor, limit=page.limit)
+    target_type = "medical_record" if target == "records" else "medicine"
+    audit.log.record_many(actor(current_user), "read", target_type, (hit.id for hit in hits.items))
+    return page_response(hits, response)
+
+# -----------------
+# Bulk Endpoints
+# -----------------
+@app.post("/bulk/{entity}/import", response_model=schemas.ImportReport, tags=["Bulk"])
+async def bulk_import(
+    entity: bulk.Entity,
+    request: Request,
+    fmt: bulk.Format = Query("ndjson", alias="format"),
+    current_user: schemas.Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # The request body is parsed as it arrives; it is never buffered whole
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin privilege required")
+    return await bulk.import_rows(db, entity, bulk.iter_records(request.stream(), fmt))
+
+AUDITED_ENTITIES = {"medical_records": "medical_record", "medicines": "medicine"}
+
+@app.get("/bulk/{entity}/export", tags=["Bulk"])
+async def bulk_export(
+    entity: bulk.Entity,
+    fmt: bulk.Format = Query("ndjson", alias="format"),
+    current_user: schemas.Principal = Depends(get_current_user),
+):
+    if not is_admin(current_user):
+        raise HTTPException(status_code=403, detail="Admin privilege required")
+    if entity in AUDITED_ENTITIES:
+        audit.log.record(actor(current_user), "export", AUDITED_ENTITIES[entity], None)
+    return StreamingResponse(
+        bulk.export_rows(entity, fmt),
+        media_type=bulk.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{entity}.{fmt}"'},
+    )
+
+# -----------------
+# Metrics Endpoints
+# -----------------
+@app.get("/health", tags=["Metrics"])
+async def health():
+    # 503 before warm-up finishes and once SIGTERM starts the drain
+    if not lifecycle.state.ready or lifecycle.state.draining:
+        return JSONResponse(status_code=503, content={"status": "draining" if lifecycle.state.draining else "starting"})
+    return {"status": "ok"}
+
+@app.get("/metrics/hashing", response_model=dict, tags=["Metrics"])
+async def hashing_metrics():
+    return hashing.get_pool().snapshot()
+
+@app.get("/metrics/db", response_model=dict, tags=["Metrics"])
+async def db_pool_metrics():
+    return database.engine_status()
+
+@app.get("/metrics/cache", response_model=dict, tags=["Metrics"])
+async def cache_metrics():
+    return {"principals": cache.principals.snapshot(), "responses": cache.responses.snapshot()}
+
+@app.get("/metrics/tokens", response_model=dict, tags=["Metrics"])
+async def token_metrics():
+    return tokens.revocations.snapshot()
+
+@app.get("/metrics/events", response_model=dict, tags=["Metrics"])
+async def event_metrics():
+    return events.broker.snapshot()
+
+@app.get("/metrics/audit", response_model=dict, tags=["Metrics"])
+async def audit_metrics():
+    return audit.log.snapshot()
+
+@app.get("/metrics/jobs", response_model=dict, tags=["Metrics"])
+async def job_metrics(db: db_dependency):
+    return {"queue": jobs.queue.snapshot(), "statuses": await jobs.status_counts(db)}
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Metrics"])
+async def prometheus_metrics():
+    return profiling.metrics.render()
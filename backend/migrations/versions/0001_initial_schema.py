@@ -0,0 +1,83 @@
+"""Initial schema
+
+The tables as they were created by Base.metadata.create_all before migrations existed.
+Databases created that way should be stamped rather than upgraded:
+    alembic stamp 0001_initial_schema
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_initial_schema"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("surname", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=True),
+        sa.Column("is_confirmed", sa.Boolean(), nullable=True),
+        sa.Column("role", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "meetings",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("patient_id", sa.Integer(), nullable=True),
+        sa.Column("doctor_id", sa.Integer(), nullable=True),
+        sa.Column("scheduled_date", sa.DateTime(), nullable=False),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["doctor_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["patient_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_meetings_id", "meetings", ["id"])
+
+    op.create_table(
+        "medical_records",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("meeting_id", sa.Integer(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["meeting_id"], ["meetings.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_medical_records_id", "medical_records", ["id"])
+
+    op.create_table(
+        "medicines",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("dosage", sa.Float(), nullable=False),
+        sa.Column("frequency", sa.String(), nullable=False),
+        sa.Column("medical_record_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["medical_record_id"], ["medical_records.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_medicines_id", "medicines", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("medicines")
+    op.drop_table("medical_records")
+    op.drop_table("meetings")
+    op.drop_table("users")
@@ -0,0 +1,46 @@
+"""Indexes for the hot query columns
+
+Covers the filters used by crud.py: meetings by doctor and date, by patient and status,
+by date and by status alone, records by meeting, medicines by record and users by role.
+On Postgres the indexes are built CONCURRENTLY so existing tables stay writable.
+
+Revision ID: 0002_hot_path_indexes
+Revises: 0001_initial_schema
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_hot_path_indexes"
+down_revision: Union[str, Sequence[str], None] = "0001_initial_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_meetings_doctor_id_scheduled_date", "meetings", ["doctor_id", "scheduled_date"]),
+    ("ix_meetings_patient_id_status", "meetings", ["patient_id", "status"]),
+    ("ix_meetings_scheduled_date", "meetings", ["scheduled_date"]),
+    ("ix_meetings_status", "meetings", ["status"]),
+    ("ix_medical_records_meeting_id", "medical_records", ["meeting_id"]),
+    ("ix_medicines_medical_record_id", "medicines", ["medical_record_id"]),
+    ("ix_users_role", "users", ["role"]),
+]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
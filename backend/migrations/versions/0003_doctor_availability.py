@@ -0,0 +1,64 @@
+"""Doctor working hours and one live booking per slot
+
+Adds doctor_availability and a partial unique index on meetings (doctor_id, scheduled_date)
+for every meeting that is not rejected. Existing duplicate bookings must be resolved before
+upgrading; the upgrade stops and lists them if any are found.
+
+Revision ID: 0003_doctor_availability
+Revises: 0002_hot_path_indexes
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_doctor_availability"
+down_revision: Union[str, Sequence[str], None] = "0002_hot_path_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LIVE_MEETING = sa.text("status <> 'Reject'")
+
+
+def check_duplicate_bookings() -> None:
+    # The unique index would fail on them with a bare constraint error naming no meeting
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT doctor_id, scheduled_date, COUNT(*) FROM meetings WHERE status <> 'Reject' "
+        "GROUP BY doctor_id, scheduled_date HAVING COUNT(*) > 1 ORDER BY doctor_id, scheduled_date LIMIT 20"
+    )).all()
+    if duplicates:
+        listed = "; ".join(f"doctor {doctor_id} at {scheduled_date} ({count} meetings)" for doctor_id, scheduled_date, count in duplicates)
+        raise RuntimeError(
+            "Cannot add one live booking per slot: some slots are booked more than once. Reject or "
+            f"reschedule all but one meeting in each before upgrading: {listed}"
+        )
+
+
+def upgrade() -> None:
+    check_duplicate_bookings()
+    op.create_table(
+        "doctor_availability",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("doctor_id", sa.Integer(), nullable=False),
+        sa.Column("weekday", sa.Integer(), nullable=False),
+        sa.Column("start_time", sa.Time(), nullable=False),
+        sa.Column("end_time", sa.Time(), nullable=False),
+        sa.Column("slot_minutes", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["doctor_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_doctor_availability_id", "doctor_availability", ["id"])
+    op.create_index("ix_doctor_availability_doctor_id", "doctor_availability", ["doctor_id"])
+    op.create_index(
+        "uq_meetings_doctor_slot", "meetings", ["doctor_id", "scheduled_date"], unique=True,
+        postgresql_where=LIVE_MEETING, sqlite_where=LIVE_MEETING,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_meetings_doctor_slot", table_name="meetings")
+    op.drop_table("doctor_availability")
@@ -0,0 +1,76 @@
+"""Full-text search over medical record descriptions and medicine names
+
+Postgres gets GIN indexes on the to_tsvector expressions search.py queries, built
+CONCURRENTLY. SQLite gets external-content FTS5 tables that triggers keep in sync with
+medical_records and medicines; existing rows are indexed by a rebuild. A later
+batch_alter_table on either content table recreates it on SQLite and drops its triggers,
+so such a migration has to create them again.
+
+Revision ID: 0004_full_text_search
+Revises: 0003_doctor_availability
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_full_text_search"
+down_revision: Union[str, Sequence[str], None] = "0003_doctor_availability"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+POSTGRES_INDEXES = {
+    "ix_medical_records_description_fts": "medical_records USING gin (to_tsvector('english', coalesce(description, '')))",
+    "ix_medicines_name_fts": "medicines USING gin (to_tsvector('simple', name))",
+}
+
+# (fts table, content table, indexed column, tokenizer)
+SQLITE_FTS = [
+    ("medical_records_fts", "medical_records", "description", "porter unicode61"),
+    ("medicines_fts", "medicines", "name", "unicode61"),
+]
+
+
+def sqlite_upgrade() -> None:
+    for fts, content, col, tokenizer in SQLITE_FTS:
+        op.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5({col}, content='{content}', content_rowid='id', tokenize='{tokenizer}')")
+        op.execute(f"""
+            CREATE TRIGGER {fts}_ai AFTER INSERT ON {content} BEGIN
+                INSERT INTO {fts}(rowid, {col}) VALUES (new.id, new.{col});
+            END""")
+        op.execute(f"""
+            CREATE TRIGGER {fts}_ad AFTER DELETE ON {content} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {col}) VALUES ('delete', old.id, old.{col});
+            END""")
+        op.execute(f"""
+            CREATE TRIGGER {fts}_au AFTER UPDATE OF {col} ON {content} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {col}) VALUES ('delete', old.id, old.{col});
+                INSERT INTO {fts}(rowid, {col}) VALUES (new.id, new.{col});
+            END""")
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, definition in POSTGRES_INDEXES.items():
+                op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+    elif dialect == "sqlite":
+        sqlite_upgrade()
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            for name in POSTGRES_INDEXES:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    elif dialect == "sqlite":
+        for fts, _, _, _ in SQLITE_FTS:
+            for suffix in ("ai", "ad", "au"):
+                op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {fts}")
@@ -0,0 +1,43 @@
+"""Attachments on medical records
+
+Metadata for files attached to medical records. The files themselves live in the
+content-addressed blob store under UPLOAD_DIR, keyed by sha256.
+
+Revision ID: 0005_attachments
+Revises: 0004_full_text_search
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_attachments"
+down_revision: Union[str, Sequence[str], None] = "0004_full_text_search"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "attachments",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("medical_record_id", sa.Integer(), nullable=False),
+        sa.Column("filename", sa.String(), nullable=False),
+        sa.Column("content_type", sa.String(), nullable=True),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["medical_record_id"], ["medical_records.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_attachments_id", "attachments", ["id"])
+    op.create_index("ix_attachments_medical_record_id", "attachments", ["medical_record_id"])
+    op.create_index("ix_attachments_sha256", "attachments", ["sha256"])
+
+
+def downgrade() -> None:
+    op.drop_table("attachments")
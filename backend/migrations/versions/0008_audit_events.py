@@ -0,0 +1,49 @@
+"""Audit event table
+
+Append-only, hash-chained log of medical record and medicine access written by audit.py. On
+Postgres it is partitioned by month on occurred_at: a default partition takes any row without a
+monthly one, and audit.ensure_partition creates the coming month's ahead of time.
+
+Revision ID: 0008_audit_events
+Revises: 0007_revoked_tokens
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_audit_events"
+down_revision: Union[str, Sequence[str], None] = "0007_revoked_tokens"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "audit_events",
+        sa.Column("chain", sa.String(), nullable=False),
+        sa.Column("seq", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("occurred_at", sa.DateTime(), nullable=False),
+        sa.Column("actor_id", sa.Integer(), nullable=True),
+        sa.Column("actor_role", sa.String(), nullable=True),
+        sa.Column("action", sa.String(), nullable=False),
+        sa.Column("target_type", sa.String(), nullable=False),
+        sa.Column("target_id", sa.Integer(), nullable=True),
+        sa.Column("prev_hash", sa.String(length=64), nullable=False),
+        sa.Column("hash", sa.String(length=64), nullable=False),
+        sa.PrimaryKeyConstraint("chain", "seq", "occurred_at"),
+        postgresql_partition_by="RANGE (occurred_at)",
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE TABLE audit_events_default PARTITION OF audit_events DEFAULT")
+    op.create_index("ix_audit_events_occurred_at", "audit_events", ["occurred_at"])
+    op.create_index("ix_audit_events_target", "audit_events", ["target_type", "target_id"])
+    op.create_index("ix_audit_events_actor_id", "audit_events", ["actor_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("audit_events")
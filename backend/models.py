@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, Enum, Float
+from sqlalchemy import BigInteger, Column, Integer, String, Boolean, ForeignKey, DateTime, Text, Enum, Float, Index, Time, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -16,11 +16,12 @@ class User(Base):
     surname = Column(String, nullable=False)  # Last Name
     hashed_password = Column(String)
     is_confirmed = Column(Boolean, default=False)  # Required for doctors
-    role = Column(String, nullable=False)
+    role = Column(String, nullable=False, index=True)
 
     # Relationships
     meetings_as_patient = relationship('Meeting', back_populates='patient', foreign_keys='Meeting.patient_id',  cascade="all, delete")
     meetings_as_doctor = relationship('Meeting', back_populates='doctor', foreign_keys='Meeting.doctor_id',  cascade="all, delete")
+    working_hours = relationship('DoctorAvailability', back_populates='doctor', cascade="all, delete")
 
 # Meeting model linking patients and doctors
 class Meeting(Base):
@@ -29,26 +30,37 @@ class Meeting(Base):
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey('users.id'))
     doctor_id = Column(Integer, ForeignKey('users.id'))
-    scheduled_date = Column(DateTime, nullable=False)
-    status = Column(String, default="Pending")  # Pending, Confirmed, Rescheduled, or Cancelled
+    scheduled_date = Column(DateTime, nullable=False, index=True)
+    status = Column(String, default="Pending", index=True)  # Pending, Confirmed, Rescheduled, or Cancelled
 
     # Relationships
     patient = relationship('User', back_populates='meetings_as_patient', foreign_keys=[patient_id])
     doctor = relationship('User', back_populates='meetings_as_doctor', foreign_keys=[doctor_id])
     medical_records = relationship('MedicalRecord', back_populates='meeting', cascade="all, delete")
 
+    __table_args__ = (
+        Index('ix_meetings_doctor_id_scheduled_date', 'doctor_id', 'scheduled_date'),
+        Index('ix_meetings_patient_id_status', 'patient_id', 'status'),
+        # A doctor's slot can hold one live booking; rejected meetings free it again
+        Index(
+            'uq_meetings_doctor_slot', 'doctor_id', 'scheduled_date', unique=True,
+            postgresql_where=text("status <> 'Reject'"), sqlite_where=text("status <> 'Reject'"),
+        ),
+    )
+
 # Medical Record model for a meeting
 class MedicalRecord(Base):
     __tablename__ = 'medical_records'
 
     id = Column(Integer, primary_key=True, index=True)
-    meeting_id = Column(Integer, ForeignKey('meetings.id'))
+    meeting_id = Column(Integer, ForeignKey('meetings.id'), index=True)
     description = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
     meeting = relationship('Meeting', back_populates='medical_records', foreign_keys=[meeting_id])
     medicines = relationship('Medicine', back_populates='medical_record', cascade="all, delete")
+    attachments = relationship('Attachment', back_populates='medical_record', cascade="all, delete")
 
 # Medicine model linked to a medical record
 class Medicine(Base):
@@ -58,7 +70,94 @@ class Medicine(Base):
     name = Column(String, nullable=False)
     dosage = Column(Float, nullable=False)  # Example: 250.0 (mg)
     frequency = Column(String, nullable=False)  # Example: "Twice a day"
-    medical_record_id = Column(Integer, ForeignKey('medical_records.id'), nullable=False)
+    medical_record_id = Column(Integer, ForeignKey('medical_records.id'), nullable=False, index=True)
 
     # Relationships
     medical_record = relationship('MedicalRecord', back_populates='medicines', foreign_keys=[medical_record_id])
+
+# Weekly working hours of a doctor, split into fixed-length appointment slots
+class DoctorAvailability(Base):
+    __tablename__ = 'doctor_availability'
+
+    id = Column(Integer, primary_key=True, index=True)
+    doctor_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    weekday = Column(Integer, nullable=False)  # 0 = Monday ... 6 = Sunday
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
+    slot_minutes = Column(Integer, nullable=False, default=30)
+
+    # Relationships
+    doctor = relationship('User', back_populates='working_hours', foreign_keys=[doctor_id])
+
+# A file attached to a medical record; the content lives in attachments.py's blob store
+class Attachment(Base):
+    __tablename__ = 'attachments'
+
+    id = Column(Integer, primary_key=True, index=True)
+    medical_record_id = Column(Integer, ForeignKey('medical_records.id'), nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=True)
+    size = Column(BigInteger, nullable=False)  # Bytes
+    sha256 = Column(String(64), nullable=False, index=True)  # Blob key, shared by identical uploads
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    medical_record = relationship('MedicalRecord', back_populates='attachments', foreign_keys=[medical_record_id])
+
+# A unit of background work run by jobs.JobQueue; rows double as the job history
+class Job(Base):
+    __tablename__ = 'jobs'
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False, index=True)  # Key into jobs.HANDLERS
+    payload = Column(Text, nullable=False)  # JSON
+    status = Column(String, nullable=False, default="queued")  # queued, running, done or failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # Not claimed before this time
+    locked_until = Column(DateTime, nullable=True)  # A running job past this is reclaimed
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+
+# Revoked access and refresh tokens, loaded into tokens.revocations. A row names either one
+# token (jti) or every token of a user issued before issued_before; it can go once expires_at
+# passes, since the tokens it covers have expired by then.
+class RevokedToken(Base):
+    __tablename__ = 'revoked_tokens'
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String, nullable=True, index=True)
+    user_id = Column(Integer, nullable=True)  # No foreign key: outlives a deleted user
+    issued_before = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Append-only record of who read or changed medical records and medicines, written in batches by
+# audit.AuditLog. Each writer process appends to its own hash chain (chain, seq); see audit.py.
+# On Postgres the table is range-partitioned by month on occurred_at, which is why it is part
+# of the primary key.
+class AuditEvent(Base):
+    __tablename__ = 'audit_events'
+
+    chain = Column(String, primary_key=True)
+    seq = Column(Integer, primary_key=True, autoincrement=False)
+    occurred_at = Column(DateTime, primary_key=True)
+    actor_id = Column(Integer, nullable=True)  # None for an anonymous caller; no foreign key, outlives the user
+    actor_role = Column(String, nullable=True)
+    action = Column(String, nullable=False)  # read, create, update, delete or export
+    target_type = Column(String, nullable=False)  # medical_record, medicine or attachment
+    target_id = Column(Integer, nullable=True)  # None for an export of many records
+    prev_hash = Column(String(64), nullable=False)
+    hash = Column(String(64), nullable=False)
+
+    __table_args__ = (
+        Index('ix_audit_events_occurred_at', 'occurred_at'),
+        Index('ix_audit_events_target', 'target_type', 'target_id'),
+        Index('ix_audit_events_actor_id', 'actor_id'),
+        {'postgresql_partition_by': 'RANGE (occurred_at)'},
+    )
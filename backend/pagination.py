@@ -0,0 +1,82 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional
+
+from sqlalchemy import DateTime, Integer, Select, String, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from schemas import naive_utc
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _cursor_value(column: Any, value: Any) -> Any:
+    # A cursor is client input: each value must be one its column can be compared with
+    if isinstance(column.type, DateTime):
+        if not isinstance(value, str):
+            raise InvalidCursor("Invalid cursor")
+        return naive_utc(datetime.fromisoformat(value))
+    if isinstance(column.type, Integer):
+        expected = (int,)
+    elif isinstance(column.type, String):
+        expected = (str,)
+    else:
+        expected = (int, float)  # Computed sort keys, such as search ranks
+    if isinstance(value, bool) or not isinstance(value, expected):
+        raise InvalidCursor("Invalid cursor")
+    return value
+
+
+def decode_cursor(token: str, columns: List[Any]) -> List[Any]:
+    # Rejects anything that was not produced by encode_cursor for the same column list
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise InvalidCursor("Invalid cursor")
+        return [_cursor_value(column, value) for column, value in zip(columns, values)]
+    except InvalidCursor:
+        raise
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("Invalid cursor") from exc
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+async def paginate(db: AsyncSession, stmt: Select, order_columns: List[Any], cursor: Optional[str] = None, limit: Optional[int] = None, scalars: bool = True) -> Page:
+    # Keyset pagination: order by a unique column tuple and resume strictly after the last row seen.
+    # scalars=False returns whole rows for statements selecting several columns.
+    limit = clamp_limit(limit)
+    if cursor:
+        values = decode_cursor(cursor, order_columns)
+        if len(order_columns) == 1:
+            stmt = stmt.where(order_columns[0] > values[0])
+        else:
+            stmt = stmt.where(tuple_(*order_columns) > tuple_(*values))
+    stmt = stmt.order_by(*order_columns).limit(limit + 1)
+    rows = (await db.scalars(stmt)).all() if scalars else (await db.execute(stmt)).all()
+    if len(rows) <= limit:
+        return Page(rows, None)
+    rows = rows[:limit]
+    last = rows[-1]
+    return Page(rows, encode_cursor([getattr(last, column.key) for column in order_columns]))
@@ -0,0 +1,190 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+DB_PROFILE_HEADERS = os.getenv("DB_PROFILE_HEADERS", "false").lower() in ("1", "true", "yes")  # Debug only
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", "50"))  # An N+1 shows up here long before it shows up in latency
+MAX_RECORDED_STATEMENTS = 200
+
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PROFILE_HEADERS = ["X-DB-Queries", "X-DB-Time-Ms", "X-DB-Slowest-Ms"]
+
+
+class RequestProfile:
+    # Statements executed on behalf of one request, filled in by the engine event hooks
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slowest: Optional[Tuple[float, str]] = None
+        self.statements: List[Tuple[float, str]] = []
+
+    def record(self, statement: str, seconds: float):
+        self.queries += 1
+        self.db_seconds += seconds
+        if self.slowest is None or seconds > self.slowest[0]:
+            self.slowest = (seconds, statement)
+        if len(self.statements) < MAX_RECORDED_STATEMENTS:
+            self.statements.append((seconds, statement))
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+# -------------------------
+# Engine hooks
+# -------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    profile = _current.get()
+    if profile is not None:
+        profile.record(statement, time.perf_counter() - started)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    started = exception_context.connection.info.get("query_started") if exception_context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def instrument(engine):
+    # Accepts a sync engine; pass AsyncEngine.sync_engine for async engines
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+# -------------------------
+# Metrics
+# -------------------------
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+class RouteMetrics:
+    # Per-route request, query and DB time aggregates, rendered in the Prometheus text format
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.queries: Dict[Tuple[str, str], Histogram] = {}
+        self.db_seconds: Dict[Tuple[str, str], Histogram] = {}
+        self.duration: Dict[Tuple[str, str], Histogram] = {}
+        self.slow_requests = 0
+
+    def observe(self, method: str, route: str, status: int, profile: RequestProfile, seconds: float, slow: bool):
+        key = (method, route)
+        with self._lock:
+            self.requests[(method, route, str(status))] = self.requests.get((method, route, str(status)), 0) + 1
+            self.queries.setdefault(key, Histogram(QUERY_BUCKETS)).observe(profile.queries)
+            self.db_seconds.setdefault(key, Histogram(SECONDS_BUCKETS)).observe(profile.db_seconds)
+            self.duration.setdefault(key, Histogram(SECONDS_BUCKETS)).observe(seconds)
+            self.slow_requests += slow
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            lines += ["# HELP http_requests_total Requests served, by route and status.", "# TYPE http_requests_total counter"]
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+            for name, help_text, series in (
+                ("http_request_duration_seconds", "Wall time per request.", self.duration),
+                ("db_queries_per_request", "SQL statements executed per request.", self.queries),
+                ("db_time_per_request_seconds", "Time spent in SQL statements per request.", self.db_seconds),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (method, route), histogram in sorted(series.items()):
+                    labels = f'method="{method}",route="{route}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    cumulative += histogram.counts[-1]
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+                    lines.append(f"{name}_count{{{labels}}} {cumulative}")
+            lines += ["# HELP slow_requests_total Requests over the slow request thresholds.", "# TYPE slow_requests_total counter",
+                      f"slow_requests_total {self.slow_requests}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = RouteMetrics()
+
+# -------------------------
+# Middleware
+# -------------------------
+
+class QueryProfilerMiddleware:
+    # Pure ASGI middleware so the profile lives in the request's own context and streaming
+    # responses are measured until their last chunk is sent
+    def __init__(self, app, headers: bool = DB_PROFILE_HEADERS):
+        self.app = app
+        self.headers = headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        status_code = 500
+        long_lived = False
+
+        async def send_wrapper(message):
+            nonlocal status_code, long_lived
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                long_lived = (b"content-type", b"text/event-stream") in [
+                    (key.lower(), value.split(b";")[0]) for key, value in message.get("headers", [])
+                ]
+                if self.headers:
+                    # Statements run while the body streams are not in the headers, only in the metrics
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"x-db-queries", str(profile.queries).encode()),
+                        (b"x-db-time-ms", f"{profile.db_seconds * 1000:.2f}".encode()),
+                        (b"x-db-slowest-ms", f"{(profile.slowest[0] if profile.slowest else 0) * 1000:.2f}".encode()),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._finish(scope, status_code, profile, time.perf_counter() - started, long_lived)
+
+    def _finish(self, scope, status_code: int, profile: RequestProfile, seconds: float, long_lived: bool = False):
+        route = scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        # An event stream is open for as long as the client stays; only its queries can be slow
+        slow = (seconds * 1000 >= SLOW_REQUEST_MS and not long_lived) or profile.queries >= SLOW_REQUEST_QUERIES
+        metrics.observe(scope["method"], path, status_code, profile, seconds, slow)
+        if slow:
+            statements = "\n".join(f"  {duration * 1000:8.2f} ms  {statement}" for duration, statement in profile.statements)
+            logger.warning(
+                "Slow request %s %s: %.1f ms, %d queries, %.1f ms in the database\n%s",
+                scope["method"], scope["path"], seconds * 1000, profile.queries, profile.db_seconds * 1000, statements,
+            )
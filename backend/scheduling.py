@@ -0,0 +1,91 @@
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+
+import models
+
+DEFAULT_SLOT_MINUTES = 30
+MAX_SLOT_RANGE = timedelta(days=31)
+
+
+class SlotConflict(Exception):
+    pass
+
+
+class Interval(NamedTuple):
+    start: datetime
+    end: datetime
+
+
+class IntervalIndex:
+    # Booked intervals of one doctor sorted by start, with a running maximum of end times.
+    # An interval [s, e) overlaps a booking iff some booking starting before e ends after s,
+    # which is one bisect plus one lookup into the running maximum.
+    def __init__(self, intervals: Iterable[Interval]):
+        ordered = sorted(intervals)
+        self._starts = [interval.start for interval in ordered]
+        self._max_ends = []
+        latest = None
+        for interval in ordered:
+            latest = interval.end if latest is None else max(latest, interval.end)
+            self._max_ends.append(latest)
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        candidates = bisect_left(self._starts, end)
+        return candidates > 0 and self._max_ends[candidates - 1] > start
+
+
+def _days(date_from: datetime, date_to: datetime) -> Iterable[date]:
+    day = date_from.date()
+    while day <= date_to.date():
+        yield day
+        day += timedelta(days=1)
+
+
+def working_slots(hours: Sequence[models.DoctorAvailability], date_from: datetime, date_to: datetime) -> List[Interval]:
+    # Every slot of the weekly schedule that lies inside [date_from, date_to)
+    by_weekday = {}
+    for block in hours:
+        by_weekday.setdefault(block.weekday, []).append(block)
+
+    slots = []
+    for day in _days(date_from, date_to):
+        for block in by_weekday.get(day.weekday(), []):
+            length = timedelta(minutes=block.slot_minutes)
+            start = datetime.combine(day, block.start_time)
+            block_end = datetime.combine(day, block.end_time)
+            while start + length <= block_end:
+                if start >= date_from and start + length <= date_to:
+                    slots.append(Interval(start, start + length))
+                start += length
+    slots.sort()
+    return slots
+
+
+def slot_length(hours: Sequence[models.DoctorAvailability], moment: datetime) -> timedelta:
+    # Booked meetings occupy the slot length of the block they fall in
+    for block in hours:
+        if block.weekday == moment.weekday() and block.start_time <= moment.time() < block.end_time:
+            return timedelta(minutes=block.slot_minutes)
+    return timedelta(minutes=DEFAULT_SLOT_MINUTES)
+
+
+def longest_slot(hours: Sequence[models.DoctorAvailability]) -> timedelta:
+    return timedelta(minutes=max([block.slot_minutes for block in hours] or [DEFAULT_SLOT_MINUTES]))
+
+
+def booked_intervals(hours: Sequence[models.DoctorAvailability], starts: Iterable[datetime]) -> List[Interval]:
+    return [Interval(start, start + slot_length(hours, start)) for start in starts]
+
+
+def free_slots(hours: Sequence[models.DoctorAvailability], booked: Iterable[Interval], date_from: datetime, date_to: datetime) -> List[Interval]:
+    index = IntervalIndex(booked)
+    return [slot for slot in working_slots(hours, date_from, date_to) if not index.overlaps(slot.start, slot.end)]
+
+
+def slot_at(hours: Sequence[models.DoctorAvailability], start: datetime) -> Optional[Interval]:
+    # The schedule slot beginning exactly at start, if there is one
+    for slot in working_slots(hours, start, start + longest_slot(hours)):
+        if slot.start == start:
+            return slot
+    return None
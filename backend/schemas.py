@@ -1,6 +1,14 @@
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
-from datetime import date, datetime
+from pydantic import AfterValidator, BaseModel, EmailStr, Field, model_validator
+from typing import Annotated, List, Literal, Optional, Union
+from datetime import date, datetime, time, timezone
+
+def naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    # Times are stored and compared as naive UTC; an aware input is converted, a naive one is taken as UTC
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+UTCDatetime = Annotated[datetime, AfterValidator(naive_utc)]
 
 # Base Schema for User
 class User(BaseModel):
@@ -23,38 +31,88 @@ class UserCreate(BaseModel):
     surname: str  # Last name
     role: str
 
-# Base Schema for Meeting
-class Meeting(BaseModel):
+# Authenticated caller, cached between requests by main.get_current_user
+class Principal(BaseModel):
+    id: int
+    username: str
+    name: str
+    surname: str
+    role: str
+    is_confirmed: Optional[bool] = False
+
+    class Config:
+        from_attributes = True
+
+# Meeting without its nested records, for shallow list views
+class MeetingSummary(BaseModel):
     id: int
     patient_id: int
     doctor_id: int
     scheduled_date: datetime
     status: str
-    medical_records: List['MedicalRecord'] = []
 
     class Config:
         from_attributes = True
 
+# Base Schema for Meeting
+class Meeting(MeetingSummary):
+    medical_records: List['MedicalRecord'] = []
+
+# What the caller may do with a meeting, so clients need not mirror the server's rules
+class MeetingPermissions(BaseModel):
+    can_reschedule: bool
+    can_cancel: bool
+    can_confirm: bool
+    can_write_records: bool  # Records, their medicines and attachments
+
+# A meeting with its parties, records and the caller's permissions in one response. Sections
+# left out through ?fields= are omitted; records come without medicines unless asked for.
+class MeetingDetail(MeetingSummary):
+    patient: Optional[User] = None
+    doctor: Optional[User] = None
+    medical_records: Optional[List[Union['MedicalRecord', 'MedicalRecordSummary']]] = None
+    permissions: Optional[MeetingPermissions] = None
+
 # Schema for Creating a Meeting
 class MeetingCreate(BaseModel):
     # doctor_id: int
-    scheduled_date: datetime
+    scheduled_date: UTCDatetime
+
+# Query filters for meeting lists
+class MeetingFilter(BaseModel):
+    status: Optional[str] = None
+    doctor_id: Optional[int] = None
+    patient_id: Optional[int] = None
+    date_from: Optional[UTCDatetime] = None  # Inclusive
+    date_to: Optional[UTCDatetime] = None  # Exclusive
+    order_by: Literal["id", "scheduled_date"] = "id"
 
 # Base Schema for Medical Record
-class MedicalRecord(BaseModel):
+# Medical record without its medicines
+class MedicalRecordSummary(BaseModel):
     id: int
     meeting_id: int
     description: Optional[str]
     created_at: datetime
-    medicines: List['Medicine'] = []
 
     class Config:
         from_attributes = True
 
+class MedicalRecord(MedicalRecordSummary):
+    medicines: List['Medicine'] = []
+
 # Schema for Creating a Medical Record
 class MedicalRecordCreate(BaseModel):
     description: Optional[str] = None
 
+# Query filters for medical record lists
+class MedicalRecordFilter(BaseModel):
+    meeting_id: Optional[int] = None
+    doctor_id: Optional[int] = None
+    patient_id: Optional[int] = None
+    date_from: Optional[UTCDatetime] = None  # Inclusive, on created_at
+    date_to: Optional[UTCDatetime] = None  # Exclusive, on created_at
+
 # Base Schema for Medicine
 class Medicine(BaseModel):
     id: int
@@ -66,8 +124,172 @@ class Medicine(BaseModel):
     class Config:
         from_attributes = True
 
+# A file attached to a medical record; the content is downloaded from /attachments/{id}
+class Attachment(BaseModel):
+    id: int
+    medical_record_id: int
+    filename: str
+    content_type: Optional[str]
+    size: int
+    sha256: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
 # Schema for Creating Medicine
 class MedicineCreate(BaseModel):
     name: str
     dosage: float
     frequency: str
+
+# Schema for setting one block of a doctor's weekly working hours
+class WorkingHoursCreate(BaseModel):
+    weekday: int = Field(ge=0, le=6)  # 0 = Monday ... 6 = Sunday
+    start_time: time
+    end_time: time
+    slot_minutes: int = Field(default=30, ge=5, le=480)
+
+    @model_validator(mode="after")
+    def check_times(self):
+        if self.end_time <= self.start_time:
+            raise ValueError("end_time must be after start_time")
+        return self
+
+# Base Schema for Working Hours
+class WorkingHours(WorkingHoursCreate):
+    id: int
+    doctor_id: int
+
+    class Config:
+        from_attributes = True
+
+# A bookable appointment slot
+class Slot(BaseModel):
+    start: datetime
+    end: datetime
+
+# Meeting counts by status for one day or week (period is its first day)
+class StatusCounts(BaseModel):
+    pending: int = 0
+    confirmed: int = 0
+    rejected: int = 0
+
+class PeriodStats(StatusCounts):
+    period: date
+
+# Dashboard aggregates for one doctor, or for every doctor when doctor_id is None
+class Stats(BaseModel):
+    doctor_id: Optional[int] = None
+    date_from: datetime  # Inclusive, on scheduled_date
+    date_to: datetime  # Exclusive
+    granularity: Literal["day", "week"]
+    totals: StatusCounts
+    periods: List[PeriodStats]
+    medical_records: int
+    prescriptions: int
+
+# One full-text search match: a medical record, or a medicine and the record it belongs to
+class SearchHit(BaseModel):
+    id: int
+    medical_record_id: int
+    meeting_id: int
+    patient_id: int
+    doctor_id: int
+    text: Optional[str] = None  # Record description or medicine name
+    rank: float  # Lower is more relevant
+
+    class Config:
+        from_attributes = True
+
+# A background job as reported by /jobs
+class Job(BaseModel):
+    id: int
+    kind: str
+    payload: str  # JSON
+    status: str
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    last_error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+# One entry of the audit log, as served by /audit
+class AuditEvent(BaseModel):
+    chain: str
+    seq: int
+    occurred_at: datetime
+    actor_id: Optional[int] = None
+    actor_role: Optional[str] = None
+    action: str
+    target_type: str
+    target_id: Optional[int] = None
+    prev_hash: str
+    hash: str
+
+    class Config:
+        from_attributes = True
+
+class AuditEventFilter(BaseModel):
+    date_from: Optional[UTCDatetime] = None  # Inclusive, on occurred_at
+    date_to: Optional[UTCDatetime] = None  # Exclusive, on occurred_at
+    actor_id: Optional[int] = None
+    action: Optional[str] = None
+    target_type: Optional[str] = None
+    target_id: Optional[int] = None
+
+# -------------------------
+# Bulk import rows
+# -------------------------
+
+# An id may be supplied to keep references between imported files intact
+class UserImport(BaseModel):
+    id: Optional[int] = None
+    username: str
+    email: EmailStr
+    name: str
+    surname: str
+    role: str
+    is_confirmed: bool = False
+    password: Optional[str] = None  # Hashed on import; costly, prefer hashed_password for large files
+    hashed_password: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_password(self):
+        if self.password is None and self.hashed_password is None:
+            raise ValueError("password or hashed_password is required")
+        return self
+
+class MeetingImport(BaseModel):
+    id: Optional[int] = None
+    patient_id: int
+    doctor_id: int
+    scheduled_date: datetime
+    status: str = "Pending"
+
+class MedicalRecordImport(BaseModel):
+    id: Optional[int] = None
+    meeting_id: int
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class MedicineImport(BaseModel):
+    id: Optional[int] = None
+    medical_record_id: int
+    name: str
+    dosage: float
+    frequency: str
+
+class RowError(BaseModel):
+    line: int
+    error: str
+
+class ImportReport(BaseModel):
+    entity: str
+    inserted: int = 0
+    failed: int = 0
+    errors: List[RowError] = []
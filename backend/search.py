@@ -0,0 +1,93 @@
+import re
+from typing import Literal, Optional
+
+from sqlalchemy import Select, column, false, func, literal_column, select, table
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pagination import Page, paginate
+import models
+import schemas
+
+# Full-text search over medical record descriptions and medicine names.
+# Postgres: GIN indexes on to_tsvector expressions. The query repeats the indexed expression
+# exactly, with inlined literals rather than bind parameters, so the planner can use them.
+# SQLite: external-content FTS5 tables kept in sync by triggers. Both come from migration 0004.
+
+Target = Literal["records", "medicines"]
+
+RECORD_CONFIG = "english"  # Stemmed: "fever" finds "fevers"
+MEDICINE_CONFIG = "simple"  # Drug names are not words to stem
+FTS_TABLES = {"records": "medical_records_fts", "medicines": "medicines_fts"}
+FTS_INDEXES = ("ix_medical_records_description_fts", "ix_medicines_name_fts")
+
+
+def is_search_object(name: Optional[str]) -> bool:
+    # Objects created by raw DDL in the migration that the ORM metadata does not describe
+    return bool(name) and (name in FTS_INDEXES or name.startswith(tuple(FTS_TABLES.values())))
+
+
+def _fts5_query(text: str) -> Optional[str]:
+    # Every word as a quoted term, implicitly ANDed; FTS5 syntax in user input is not interpreted
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"' for word in words) or None
+
+
+def _postgres_match(target: Target, text: str):
+    if target == "records":
+        config, indexed = RECORD_CONFIG, func.coalesce(models.MedicalRecord.description, literal_column("''"))
+    else:
+        config, indexed = MEDICINE_CONFIG, models.Medicine.name
+    document = func.to_tsvector(literal_column(f"'{config}'"), indexed)
+    query = func.websearch_to_tsquery(literal_column(f"'{config}'"), text)
+    return document.op("@@")(query), -func.ts_rank(document, query)
+
+
+def _scope(stmt: Select, principal: schemas.Principal) -> Select:
+    if principal.role == "admin":
+        return stmt
+    if principal.role == "doctor":
+        return stmt.where(models.Meeting.doctor_id == principal.id)
+    if principal.role == "patient":
+        return stmt.where(models.Meeting.patient_id == principal.id)
+    return stmt.where(false())
+
+
+def search_statement(db: AsyncSession, target: Target, text: str) -> Optional[Select]:
+    # Matching rows with their meeting and a rank where lower sorts first;
+    # None when text has no searchable terms
+    if target == "records":
+        model, text_column, record_id = models.MedicalRecord, models.MedicalRecord.description, models.MedicalRecord.id
+    else:
+        model, text_column, record_id = models.Medicine, models.Medicine.name, models.Medicine.medical_record_id
+    stmt = select(model.id.label("id"), record_id.label("medical_record_id"))
+
+    if db.bind.dialect.name == "postgresql":
+        match, rank = _postgres_match(target, text)
+        stmt = stmt.where(match)
+    else:
+        fts_query = _fts5_query(text)
+        if fts_query is None:
+            return None
+        fts = table(FTS_TABLES[target], column("rowid"))
+        fts_table = literal_column(FTS_TABLES[target])
+        rank = func.bm25(fts_table)
+        stmt = stmt.select_from(fts).join(model, model.id == fts.c.rowid).where(fts_table.op("MATCH")(fts_query))
+
+    if target == "medicines":
+        stmt = stmt.join(models.MedicalRecord, models.MedicalRecord.id == record_id)
+    return stmt.join(models.Meeting, models.Meeting.id == models.MedicalRecord.meeting_id).add_columns(
+        models.Meeting.id.label("meeting_id"),
+        models.Meeting.patient_id.label("patient_id"),
+        models.Meeting.doctor_id.label("doctor_id"),
+        text_column.label("text"),
+        rank.label("rank"),
+    )
+
+
+async def search(db: AsyncSession, principal: schemas.Principal, target: Target, text: str, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    # Ranked and keyset-paginated on (rank, id); the rank is computed once, inside a subquery
+    stmt = search_statement(db, target, text)
+    if stmt is None:
+        return Page([], None)
+    ranked = _scope(stmt, principal).subquery()
+    return await paginate(db, select(ranked), [ranked.c.rank, ranked.c.id], cursor, limit, scalars=False)
@@ -0,0 +1,49 @@
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+# database.py reads the URL at import, so the test database is chosen before anything imports it
+DB_DIR = tempfile.mkdtemp(prefix="hospital-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR}/test.db"
+os.environ["UPLOAD_DIR"] = os.path.join(DB_DIR, "uploads")
+for name in ("ASYNC_DATABASE_URL", "DATABASE_REPLICA_URLS", "AUDIT_LOG_FILE"):
+    os.environ.pop(name, None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import lifecycle  # noqa: E402
+import main  # noqa: E402
+
+_names = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def client():
+    # One migrated database for the session; tests keep apart by creating their own users
+    lifecycle.migrate()
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def make_user(client):
+    def make(role: str):
+        username = f"{role}{next(_names)}"
+        user = client.post("/register", json={
+            "username": username, "email": f"{username}@example.com", "password": "pw",
+            "name": "Test", "surname": "User", "role": role,
+        }).json()
+        token = client.post("/token", data={"username": username, "password": "pw"}).json()["access_token"]
+        return user, {"Authorization": f"Bearer {token}"}
+    return make
+
+
+@pytest.fixture
+def confirmed_doctor(client, make_user):
+    doctor, doctor_headers = make_user("doctor")
+    _, admin_headers = make_user("admin")
+    assert client.put(f"/doctors/{doctor['id']}/confirm", headers=admin_headers).status_code == 200
+    return doctor, doctor_headers
@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import os
+import time
+
+import pytest
+
+import attachments
+from database import AsyncSessionLocal
+import models
+from sqlalchemy import select
+
+
+@pytest.fixture
+def record(client, make_user, confirmed_doctor):
+    doctor, doctor_headers = confirmed_doctor
+    patient, patient_headers = make_user("patient")
+    meeting = client.post(f"/patients/{patient['id']}/appointments/{doctor['id']}", json={"scheduled_date": "2030-04-01T10:00:00"}, headers=patient_headers).json()
+    record = client.post(f"/meetings/{meeting['id']}/records", json={"description": "scan"}, headers=doctor_headers).json()
+    return record, doctor_headers
+
+
+def upload(client, record_id, headers, content: bytes) -> dict:
+    response = client.post(f"/medical_records/{record_id}/attachments", params={"filename": "scan.txt"}, content=content, headers=headers)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def reclaim(sha256: str) -> bool:
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await attachments.reclaim(db, sha256)
+    return asyncio.run(run())
+
+
+def age(path: str, seconds: float):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def queued_reclaims(sha256: str) -> int:
+    async def run():
+        async with AsyncSessionLocal() as db:
+            payloads = (await db.scalars(select(models.Job.payload).where(models.Job.kind == "reclaim_blob"))).all()
+            return sum(sha256 in payload for payload in payloads)
+    return asyncio.run(run())
+
+
+def test_delete_leaves_blob_to_a_delayed_reclaim(client, record):
+    record, headers = record
+    content = b"shared scan " + os.urandom(8)
+    sha256 = hashlib.sha256(content).hexdigest()
+    first = upload(client, record["id"], headers, content)
+    second = upload(client, record["id"], headers, content)
+    path = attachments.blob_path(sha256)
+
+    assert client.delete(f"/attachments/{first['id']}", headers=headers).status_code == 200
+    assert os.path.exists(path)
+    assert queued_reclaims(sha256) == 1
+    age(path, attachments.BLOB_GRACE_SECONDS + 1)
+    assert not reclaim(sha256)  # Still referenced by the second attachment
+    assert client.get(f"/attachments/{second['id']}", headers=headers).content == content
+
+    assert client.delete(f"/attachments/{second['id']}", headers=headers).status_code == 200
+    assert reclaim(sha256)
+    assert not os.path.exists(path)
+
+
+def test_blob_reused_by_a_pending_upload_is_kept(client, record):
+    record, headers = record
+    content = b"reused scan " + os.urandom(8)
+    sha256 = hashlib.sha256(content).hexdigest()
+    attachment = upload(client, record["id"], headers, content)
+    client.delete(f"/attachments/{attachment['id']}", headers=headers)
+    age(attachments.blob_path(sha256), attachments.BLOB_GRACE_SECONDS + 1)
+
+    # An identical upload has stored its content but not yet inserted its row
+    async def store():
+        async def body():
+            yield content
+        return await attachments.store(body())
+    assert asyncio.run(store()) == (sha256, len(content))
+
+    assert not reclaim(sha256)
+    assert os.path.exists(attachments.blob_path(sha256))
+
+
+def test_deleting_a_record_reclaims_its_blobs(client, record):
+    record, headers = record
+    content = b"record scan " + os.urandom(8)
+    sha256 = hashlib.sha256(content).hexdigest()
+    upload(client, record["id"], headers, content)
+    upload(client, record["id"], headers, content)
+
+    assert client.delete(f"/medical_records/{record['id']}", headers=headers).status_code == 200
+    assert queued_reclaims(sha256) == 1  # Once per blob, not per attachment
+    age(attachments.blob_path(sha256), attachments.BLOB_GRACE_SECONDS + 1)
+    assert reclaim(sha256)
+
+
+def test_deleting_a_meeting_reclaims_its_records_blobs(client, record):
+    record, headers = record
+    content = b"meeting scan " + os.urandom(8)
+    sha256 = hashlib.sha256(content).hexdigest()
+    upload(client, record["id"], headers, content)
+
+    assert client.delete(f"/meetings/{record['meeting_id']}", headers=headers).status_code == 200
+    assert queued_reclaims(sha256) == 1
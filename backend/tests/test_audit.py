@@ -0,0 +1,58 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+import audit
+import database
+
+
+def test_aware_range_is_taken_as_utc(client, make_user):
+    admin, admin_headers = make_user("admin")
+    audit.log.record(audit.Actor(admin["id"], "admin"), "probe", "test", admin["id"])
+    # The same instant as just before the event, written with a +05:00 offset
+    since = (datetime.now(timezone.utc) - timedelta(minutes=1)).astimezone(timezone(timedelta(hours=5)))
+
+    response = client.get("/audit", params={"actor_id": admin["id"], "date_from": since.isoformat()}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert [event["action"] for event in response.json()] == ["probe"]
+
+
+def write_chain(path, count=4) -> list:
+    log = audit.AuditLog(path=str(path))
+    for n in range(count):
+        log.record(audit.Actor(1, "doctor"), "read", "medical_record", n)
+    asyncio.run(log.flush())
+    return path.read_text().splitlines()
+
+
+def test_file_chain_reports_altered_and_missing_events(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    lines = write_chain(path)
+    assert audit.verify_file(str(path))["valid"]
+
+    altered = json.loads(lines[1])
+    altered["target_id"] = 99
+    path.write_text("\n".join([lines[0], json.dumps(altered), lines[3]]) + "\n")
+    errors = audit.verify_file(str(path))["errors"]
+    assert any("event 2 has been altered" in error for error in errors)
+    assert any("expected seq 3, found 4" in error for error in errors)
+
+
+def test_verify_endpoint_detects_an_edited_row(client, make_user):
+    admin, admin_headers = make_user("admin")
+    audit.log.record(audit.Actor(admin["id"], "admin"), "read", "medical_record", admin["id"])
+    assert client.get("/audit/verify", headers=admin_headers).json()["valid"]
+
+    event = client.get("/audit", params={"actor_id": admin["id"]}, headers=admin_headers).json()[0]
+    edit = text("UPDATE audit_events SET action = :action WHERE chain = :chain AND seq = :seq")
+    with database.engine.begin() as connection:
+        connection.execute(edit, {"action": "export", "chain": event["chain"], "seq": event["seq"]})
+    try:
+        report = client.get("/audit/verify", headers=admin_headers).json()
+        assert not report["valid"]
+        assert report["errors"] == [f"{event['chain']}: event {event['seq']} has been altered"]
+    finally:
+        with database.engine.begin() as connection:
+            connection.execute(edit, {"action": "read", "chain": event["chain"], "seq": event["seq"]})
@@ -0,0 +1,54 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+
+import bulk
+from database import AsyncSessionLocal
+import models
+
+
+def ndjson(rows) -> str:
+    return "".join(json.dumps(row) + "\n" for row in rows)
+
+
+def test_failed_batch_is_replayed_without_losing_earlier_batches(client, make_user, monkeypatch):
+    _, admin_headers = make_user("admin")
+    monkeypatch.setattr(bulk, "BATCH_SIZE", 2)
+    tag = uuid.uuid4().hex[:8]
+    rows = [
+        {"username": f"{tag}-{n}", "email": f"{tag}-{n}@example.com", "name": "Bulk", "surname": "User",
+         "role": "patient", "hashed_password": "x"}
+        for n in range(4)
+    ]
+    rows.insert(3, {**rows[0], "email": f"{tag}-dup@example.com"})  # Duplicate username, in the second batch
+
+    response = client.post("/bulk/users/import", content=ndjson(rows), headers=admin_headers)
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["inserted"], report["failed"]) == (4, 1)
+    assert [error["line"] for error in report["errors"]] == [4]
+
+    usernames = {user["username"] for user in client.get("/users", params={"limit": 500}, headers=admin_headers).json()}
+    assert {row["username"] for row in rows} <= usernames
+
+
+def test_import_that_fails_midway_leaves_nothing_behind(client, monkeypatch):
+    monkeypatch.setattr(bulk, "BATCH_SIZE", 2)
+    tag = uuid.uuid4().hex[:8]
+
+    async def records():
+        for n in range(3):
+            yield n + 1, {"username": f"{tag}-{n}", "email": f"{tag}-{n}@example.com", "name": "Bulk",
+                          "surname": "User", "role": "patient", "hashed_password": "x"}
+        raise ConnectionResetError("client went away")
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            with pytest.raises(ConnectionResetError):
+                await bulk.import_rows(db, "users", records())
+        async with AsyncSessionLocal() as db:
+            return await db.scalar(select(func.count()).where(models.User.username.like(f"{tag}-%")))
+    assert asyncio.run(run()) == 0
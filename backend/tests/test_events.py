@@ -0,0 +1,14 @@
+import events
+
+
+def test_status_change_is_published_under_the_new_status(client, make_user, confirmed_doctor, monkeypatch):
+    doctor, doctor_headers = confirmed_doctor
+    patient, patient_headers = make_user("patient")
+    published = []
+    monkeypatch.setattr(events.broker, "publish", lambda user_ids, event: published.append(event))
+    meeting = client.post(f"/patients/{patient['id']}/appointments/{doctor['id']}", json={"scheduled_date": "2030-05-02T10:00:00"}, headers=patient_headers).json()
+
+    assert client.patch(f"/meetings/{meeting['id']}/1", headers=doctor_headers).status_code == 200
+    assert client.patch(f"/meetings/{meeting['id']}/2", headers=doctor_headers).status_code == 200
+    assert [event["event"] for event in published] == ["meeting_created", "meeting_rejected", "meeting_confirmed"]
+    assert [event["meeting"]["status"] for event in published[1:]] == ["Reject", "Confirmed"]
@@ -0,0 +1,28 @@
+import asyncio
+
+from database import AsyncSessionLocal
+import jobs
+
+
+def enqueue(commit: bool) -> bool:
+    # Whether the worker was woken by the time the transaction ended
+    async def run():
+        jobs.queue._wake.clear()
+        async with AsyncSessionLocal() as db:
+            await jobs.enqueue(db, "appointment_requested", {"meeting_id": 0, "patient_id": 0, "doctor_id": 0, "scheduled_date": "2030-01-01T00:00:00"}, delay=3600)
+            woken_early = jobs.queue._wake.is_set()
+            if commit:
+                await db.commit()
+            else:
+                await db.rollback()
+        return not woken_early and jobs.queue._wake.is_set()
+    return asyncio.run(run())
+
+
+def test_worker_is_woken_after_commit(client):
+    assert enqueue(commit=True)
+
+
+def test_rolled_back_job_does_not_wake_worker(client):
+    assert not enqueue(commit=False)
+    assert not jobs.queue._wake.is_set()
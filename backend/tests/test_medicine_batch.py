@@ -0,0 +1,51 @@
+import pytest
+
+import main
+
+
+def prescription(*names):
+    return [{"name": name, "dosage": 1.5, "frequency": "twice daily"} for name in names]
+
+
+@pytest.fixture
+def record(client, make_user, confirmed_doctor):
+    doctor, doctor_headers = confirmed_doctor
+    patient, patient_headers = make_user("patient")
+    meeting = client.post(f"/patients/{patient['id']}/appointments/{doctor['id']}", json={"scheduled_date": "2030-09-02T10:00:00"}, headers=patient_headers).json()
+    record = client.post(f"/meetings/{meeting['id']}/records", json={"description": "flu"}, headers=doctor_headers).json()
+    return record, doctor_headers
+
+
+def medicine_names(client, record_id, headers):
+    return sorted(medicine["name"] for medicine in client.get(f"/medical_records/{record_id}", headers=headers).json()["medicines"])
+
+
+def test_batch_is_created_in_request_order(client, record):
+    record, headers = record
+    response = client.post(f"/medical_records/{record['id']}/medicines/batch", json=prescription("c", "a", "b"), headers=headers)
+    assert response.status_code == 200, response.text
+    created = response.json()
+    assert [medicine["name"] for medicine in created] == ["c", "a", "b"]
+    assert {medicine["medical_record_id"] for medicine in created} == {record["id"]}
+    assert medicine_names(client, record["id"], headers) == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize("body", [
+    [],
+    prescription("x") * (main.MAX_PRESCRIPTION_BATCH + 1),
+    prescription("ok") + [{"name": "no dosage", "frequency": "daily"}],
+])
+def test_invalid_batch_creates_nothing(client, record, body):
+    record, headers = record
+    response = client.post(f"/medical_records/{record['id']}/medicines/batch", json=body, headers=headers)
+    assert response.status_code == 422
+    assert medicine_names(client, record["id"], headers) == []
+
+
+def test_batch_is_limited_to_the_records_doctor(client, make_user, record):
+    record, _ = record
+    other, other_headers = make_user("doctor")
+    _, patient_headers = make_user("patient")
+    assert client.post(f"/medical_records/{record['id']}/medicines/batch", json=prescription("a"), headers=other_headers).status_code == 403
+    assert client.post(f"/medical_records/{record['id']}/medicines/batch", json=prescription("a"), headers=patient_headers).status_code == 403
+    assert client.post("/medical_records/999999999/medicines/batch", json=prescription("a"), headers=other_headers).status_code == 404
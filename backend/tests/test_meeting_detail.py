@@ -0,0 +1,51 @@
+import pytest
+
+
+@pytest.fixture
+def meeting(client, make_user, confirmed_doctor):
+    doctor, doctor_headers = confirmed_doctor
+    patient, patient_headers = make_user("patient")
+    meeting = client.post(f"/patients/{patient['id']}/appointments/{doctor['id']}", json={"scheduled_date": "2030-10-01T10:00:00"}, headers=patient_headers).json()
+    record = client.post(f"/meetings/{meeting['id']}/records", json={"description": "sprain"}, headers=doctor_headers).json()
+    medicine = {"name": "ibuprofen", "dosage": 2.0, "frequency": "daily"}
+    assert client.post(f"/medical_records/{record['id']}/medicines", json=medicine, headers=doctor_headers).status_code == 200
+    return meeting, (doctor, doctor_headers), (patient, patient_headers)
+
+
+def detail(client, meeting_id, headers, fields=None):
+    params = {} if fields is None else {"fields": fields}
+    return client.get(f"/meetings/{meeting_id}/detail", params=params, headers=headers)
+
+
+def test_full_detail_for_the_doctor(client, meeting):
+    meeting, (doctor, doctor_headers), (patient, _) = meeting
+    response = detail(client, meeting["id"], doctor_headers)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["patient"]["id"], body["doctor"]["id"]) == (patient["id"], doctor["id"])
+    assert [medicine["name"] for medicine in body["medical_records"][0]["medicines"]] == ["ibuprofen"]
+    assert body["permissions"] == {"can_reschedule": True, "can_cancel": True, "can_confirm": True, "can_write_records": True}
+
+
+def test_patient_permissions(client, meeting):
+    meeting, _, (_, patient_headers) = meeting
+    body = detail(client, meeting["id"], patient_headers, "permissions").json()
+    assert body["permissions"] == {"can_reschedule": True, "can_cancel": True, "can_confirm": False, "can_write_records": False}
+
+
+def test_sparse_fields(client, meeting):
+    meeting, (_, doctor_headers), _ = meeting
+    body = detail(client, meeting["id"], doctor_headers, "doctor, medical_records").json()
+    assert set(body) == {"id", "patient_id", "doctor_id", "scheduled_date", "status", "doctor", "medical_records"}
+    assert "medicines" not in body["medical_records"][0]  # Only with fields=medicines
+
+    body = detail(client, meeting["id"], doctor_headers, "medicines").json()
+    assert body["medical_records"][0]["medicines"][0]["name"] == "ibuprofen"
+
+
+def test_errors(client, make_user, meeting):
+    meeting, (_, doctor_headers), _ = meeting
+    _, stranger_headers = make_user("patient")
+    assert detail(client, meeting["id"], doctor_headers, "patient,diagnosis").status_code == 400
+    assert detail(client, meeting["id"], stranger_headers).status_code == 403
+    assert detail(client, 999999999, doctor_headers).status_code == 404
@@ -0,0 +1,43 @@
+def book(client, patient, patient_headers, doctor, when):
+    response = client.post(f"/patients/{patient['id']}/appointments/{doctor['id']}", json={"scheduled_date": when}, headers=patient_headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_reschedule_onto_booked_slot_conflicts(client, make_user, confirmed_doctor):
+    doctor, _ = confirmed_doctor
+    patient, patient_headers = make_user("patient")
+    first = book(client, patient, patient_headers, doctor, "2030-03-04T10:00:00")
+    second = book(client, patient, patient_headers, doctor, "2030-03-04T11:00:00")
+
+    response = client.put(f"/meetings/{second['id']}", json={"scheduled_date": first["scheduled_date"]}, headers=patient_headers)
+    assert response.status_code == 409
+    assert client.get(f"/meetings/{second['id']}").json()["scheduled_date"] == "2030-03-04T11:00:00"
+
+
+def test_reconfirming_rejected_meeting_whose_slot_was_rebooked_conflicts(client, make_user, confirmed_doctor):
+    doctor, doctor_headers = confirmed_doctor
+    patient, patient_headers = make_user("patient")
+    rejected = book(client, patient, patient_headers, doctor, "2030-03-05T10:00:00")
+    assert client.patch(f"/meetings/{rejected['id']}/1", headers=doctor_headers).json()["status"] == "Reject"
+    book(client, patient, patient_headers, doctor, "2030-03-05T10:00:00")
+
+    response = client.patch(f"/meetings/{rejected['id']}/2", headers=doctor_headers)
+    assert response.status_code == 409
+    assert client.get(f"/meetings/{rejected['id']}").json()["status"] == "Reject"
+
+
+def test_aware_times_are_taken_as_utc(client, make_user, confirmed_doctor):
+    doctor, doctor_headers = confirmed_doctor
+    patient, patient_headers = make_user("patient")
+    hours = [{"weekday": 0, "start_time": "09:00:00", "end_time": "10:00:00", "slot_minutes": 30}]
+    assert client.put(f"/doctors/{doctor['id']}/working_hours", json=hours, headers=doctor_headers).status_code == 200
+
+    # 2030-03-11 is a Monday; 11:30+02:00 is the 09:30 UTC slot
+    slots = client.get(f"/doctors/{doctor['id']}/slots", params={"date_from": "2030-03-11T00:00:00Z", "date_to": "2030-03-12T00:00:00+00:00"}, headers=patient_headers)
+    assert slots.status_code == 200
+    assert [slot["start"] for slot in slots.json()] == ["2030-03-11T09:00:00", "2030-03-11T09:30:00"]
+
+    reserved = client.post(f"/patients/{patient['id']}/appointments/{doctor['id']}/reserve", json={"scheduled_date": "2030-03-11T11:30:00+02:00"}, headers=patient_headers)
+    assert reserved.status_code == 200, reserved.text
+    assert reserved.json()["scheduled_date"] == "2030-03-11T09:30:00"
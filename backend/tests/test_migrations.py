@@ -0,0 +1,48 @@
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, text
+
+import database
+import lifecycle
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    # migrate() and the alembic env both read these, so the test upgrades its own database
+    url = f"sqlite:///{tmp_path}/fresh.db"
+    engine = create_engine(url)
+    monkeypatch.setattr(database, "URL_DATABASE", url)
+    monkeypatch.setattr(database, "engine", engine)
+    yield engine
+    engine.dispose()
+
+
+def test_database_created_without_migrations_is_stamped_and_upgraded(fresh_db):
+    command.upgrade(lifecycle.alembic_config(), lifecycle.INITIAL_REVISION)
+    with fresh_db.begin() as connection:
+        connection.execute(text("DROP TABLE alembic_version"))
+
+    lifecycle.migrate()
+    assert lifecycle.schema_is_current()
+
+
+def test_unknown_unversioned_schema_is_refused(fresh_db):
+    with fresh_db.begin() as connection:
+        connection.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY)"))
+
+    with pytest.raises(RuntimeError, match="no migration history"):
+        lifecycle.migrate()
+
+
+def test_duplicate_live_bookings_stop_the_slot_index(fresh_db):
+    command.upgrade(lifecycle.alembic_config(), "0002_hot_path_indexes")
+    with fresh_db.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, name, surname, role) VALUES (1, 'D', 'D', 'doctor'), (2, 'P', 'P', 'patient')"))
+        connection.execute(text(
+            "INSERT INTO meetings (patient_id, doctor_id, scheduled_date, status) VALUES "
+            "(2, 1, '2030-01-07 10:00:00.000000', 'Pending'), (2, 1, '2030-01-07 10:00:00.000000', 'Confirmed'), "
+            "(2, 1, '2030-01-07 11:00:00.000000', 'Pending'), (2, 1, '2030-01-07 11:00:00.000000', 'Reject')"
+        ))
+
+    with pytest.raises(RuntimeError, match=r"doctor 1 at 2030-01-07 10:00:00.000000 \(2 meetings\)$"):
+        lifecycle.migrate()
@@ -0,0 +1,72 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+import models
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def forge(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    columns = [models.Meeting.scheduled_date, models.Meeting.id]
+    values = [datetime(2030, 1, 7, 10, 0), 42]
+    assert decode_cursor(encode_cursor(values), columns) == values
+
+
+@pytest.mark.parametrize("values", [
+    [{"a": 1}],
+    ["12"],
+    [1.5],
+    [True],
+    [None],
+    [[1]],
+])
+def test_forged_integer_key_is_rejected(values):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(forge(values), [models.User.id])
+
+
+@pytest.mark.parametrize("values", [
+    [1234, 1],
+    ["not a date", 1],
+    ["2030-01-07T10:00:00", "1"],
+])
+def test_forged_datetime_key_is_rejected(values):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(forge(values), [models.Meeting.scheduled_date, models.Meeting.id])
+
+
+def test_forged_string_key_is_rejected():
+    columns = [models.AuditEvent.occurred_at, models.AuditEvent.chain, models.AuditEvent.seq]
+    with pytest.raises(InvalidCursor):
+        decode_cursor(forge(["2030-01-07T10:00:00", 7, 1]), columns)
+
+
+@pytest.mark.parametrize("cursor", [forge([{"a": 1}]), forge(["12"]), forge([1, 2]), "%%%"])
+def test_list_endpoint_answers_forged_cursor_with_400(client, make_user, cursor):
+    _, admin_headers = make_user("admin")
+    response = client.get("/users", params={"cursor": cursor}, headers=admin_headers)
+    assert response.status_code == 400
+
+
+def test_aware_cursor_value_is_taken_as_utc():
+    columns = [models.Meeting.scheduled_date, models.Meeting.id]
+    assert decode_cursor(forge(["2030-01-07T12:00:00+02:00", 1]), columns) == [datetime(2030, 1, 7, 10, 0), 1]
+
+
+def test_aware_meeting_filter_is_taken_as_utc(client, make_user, confirmed_doctor):
+    doctor, doctor_headers = confirmed_doctor
+    patient, patient_headers = make_user("patient")
+    for when in ("2030-03-06T10:00:00", "2030-03-06T11:00:00"):
+        response = client.post(f"/patients/{patient['id']}/appointments/{doctor['id']}", json={"scheduled_date": when}, headers=patient_headers)
+        assert response.status_code == 200, response.text
+
+    # 12:30+02:00 is 10:30 UTC, between the two bookings
+    response = client.get("/meetings", params={"doctor_id": doctor["id"], "date_from": "2030-03-06T12:30:00+02:00"}, headers=doctor_headers)
+    assert response.status_code == 200, response.text
+    assert [meeting["scheduled_date"] for meeting in response.json()] == ["2030-03-06T11:00:00"]
@@ -0,0 +1,48 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+import database
+
+
+@contextmanager
+def counted():
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(database.async_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(database.async_engine.sync_engine, "before_cursor_execute", listener)
+
+
+def add_meeting(client, patient, patient_headers, doctor, doctor_headers, hour: int):
+    meeting = client.post(f"/patients/{patient['id']}/appointments/{doctor['id']}", json={"scheduled_date": f"2030-06-03T{hour:02d}:00:00"}, headers=patient_headers).json()
+    for n in range(2):
+        record = client.post(f"/meetings/{meeting['id']}/records", json={"description": f"visit {n}"}, headers=doctor_headers).json()
+        medicine = {"name": "aspirin", "dosage": 1.0, "frequency": "daily"}
+        assert client.post(f"/medical_records/{record['id']}/medicines", json=medicine, headers=doctor_headers).status_code == 200
+
+
+def test_list_query_count_does_not_grow_with_rows(client, make_user, confirmed_doctor):
+    doctor, doctor_headers = confirmed_doctor
+    patient, patient_headers = make_user("patient")
+    add_meeting(client, patient, patient_headers, doctor, doctor_headers, 9)
+    lists = [("/meetings", {"doctor_id": doctor["id"]}), ("/medical_records", {"doctor_id": doctor["id"]})]
+
+    def counts():
+        result = []
+        for path, params in lists:
+            client.get(path, params=params, headers=doctor_headers)  # Caches the caller first
+            with counted() as statements:
+                response = client.get(path, params=params, headers=doctor_headers)
+            assert response.status_code == 200, response.text
+            result.append((len(response.json()), len(statements)))
+        return result
+
+    few = counts()
+    for hour in range(10, 14):
+        add_meeting(client, patient, patient_headers, doctor, doctor_headers, hour)
+    many = counts()
+    assert [rows for rows, _ in many] == [5, 10]
+    assert [queries for _, queries in many] == [queries for _, queries in few]
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sqlite3
+
+import pytest
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import database
+
+
+@pytest.fixture
+def replica(client, monkeypatch):
+    # A replica frozen at the moment sync() is called, like one that stopped replicating
+    primary = make_url(database.URL_DATABASE).database
+    path = os.path.join(os.path.dirname(primary), "replica.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    def sync():
+        source, target = sqlite3.connect(primary), sqlite3.connect(path)
+        with target:
+            source.backup(target)
+        source.close()
+        target.close()
+
+    sync()
+    monkeypatch.setattr(database, "replica_engines", [engine])
+    yield sync
+    asyncio.run(engine.dispose())
+
+
+def test_cached_directory_is_rebuilt_from_the_primary(client, make_user, replica):
+    doctor, _ = make_user("doctor")
+    _, admin_headers = make_user("admin")
+    _, patient_headers = make_user("patient")
+    replica()
+    assert doctor["id"] not in [user["id"] for user in client.get("/doctors", headers=patient_headers).json()]
+
+    # The confirmation bumps the cache generation while the replica still has the doctor unconfirmed
+    assert client.put(f"/doctors/{doctor['id']}/confirm", headers=admin_headers).status_code == 200
+    assert doctor["id"] in [user["id"] for user in client.get("/doctors", headers=patient_headers).json()]
+
+
+def book(client, patient, patient_headers, doctor) -> dict:
+    response = client.post(f"/patients/{patient['id']}/appointments/{doctor['id']}", json={"scheduled_date": "2030-11-04T10:00:00"}, headers=patient_headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_reads_go_to_the_replica_and_writers_stay_on_the_primary(client, make_user, confirmed_doctor, replica):
+    doctor, _ = confirmed_doctor
+    patient, patient_headers = make_user("patient")
+    _, bystander_headers = make_user("patient")
+    replica()
+    meeting = book(client, patient, patient_headers, doctor)
+
+    # Not replicated yet: everyone else reads the replica, the writer reads its own write
+    assert client.get(f"/meetings/{meeting['id']}", headers=bystander_headers).status_code == 404
+    assert client.get(f"/meetings/{meeting['id']}").status_code == 404
+    assert client.get(f"/meetings/{meeting['id']}", headers=patient_headers).status_code == 200
+
+    replica()
+    assert client.get(f"/meetings/{meeting['id']}", headers=bystander_headers).status_code == 200
+
+
+def test_writer_returns_to_the_replica_after_the_sticky_window(client, make_user, confirmed_doctor, replica, monkeypatch):
+    doctor, _ = confirmed_doctor
+    patient, patient_headers = make_user("patient")
+    replica()
+    monkeypatch.setattr(database, "sticky_users", database.StickyUsers(0))
+    meeting = book(client, patient, patient_headers, doctor)
+
+    assert client.get(f"/meetings/{meeting['id']}", headers=patient_headers).status_code == 404
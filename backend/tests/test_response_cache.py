@@ -0,0 +1,23 @@
+def test_unchanged_user_is_answered_with_304(client, make_user):
+    user, headers = make_user("patient")
+    first = client.get(f"/user/{user['id']}", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    again = client.get(f"/user/{user['id']}", headers={**headers, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+
+def test_write_invalidates_cached_user(client, make_user):
+    user, headers = make_user("patient")
+    etag = client.get(f"/user/{user['id']}", headers=headers).headers["etag"]
+
+    update = {"username": user["username"], "email": user["email"], "password": "pw", "name": "Renamed", "surname": "User", "role": "patient"}
+    assert client.put(f"/user/{user['id']}", json=update, headers=headers).status_code == 200
+
+    response = client.get(f"/user/{user['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["name"] == "Renamed"
+    assert response.headers["etag"] != etag
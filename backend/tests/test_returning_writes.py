@@ -0,0 +1,35 @@
+import pytest
+
+MISSING = 10 ** 9
+MEDICINE = {"id": MISSING, "name": "aspirin", "dosage": 1.0, "frequency": "daily", "medical_record_id": MISSING}
+USER = {"username": "nobody", "email": "nobody@example.com", "password": "pw", "name": "No", "surname": "Body", "role": "patient"}
+
+
+@pytest.mark.parametrize("method, path, body", [
+    ("PUT", f"/user/{MISSING}", USER),
+    ("DELETE", f"/user/{MISSING}", None),
+    ("PATCH", f"/meetings/{MISSING}/2", None),
+    ("PUT", f"/meetings/{MISSING}", {"scheduled_date": "2030-07-01T10:00:00"}),
+    ("DELETE", f"/meetings/{MISSING}", None),
+    ("PUT", f"/medical_records/{MISSING}", {"description": "gone"}),
+    ("DELETE", f"/medical_records/{MISSING}", None),
+    ("PUT", f"/medicines/{MISSING}", MEDICINE),
+    ("DELETE", f"/medicines/{MISSING}", None),
+])
+def test_write_to_missing_row_is_404(client, confirmed_doctor, method, path, body):
+    _, doctor_headers = confirmed_doctor
+    response = client.request(method, path, json=body, headers=doctor_headers)
+    assert response.status_code == 404, response.text
+
+
+def test_update_returns_the_written_row(client, make_user, confirmed_doctor):
+    doctor, doctor_headers = confirmed_doctor
+    patient, patient_headers = make_user("patient")
+    meeting = client.post(f"/patients/{patient['id']}/appointments/{doctor['id']}", json={"scheduled_date": "2030-07-01T10:00:00"}, headers=patient_headers).json()
+    record = client.post(f"/meetings/{meeting['id']}/records", json={"description": "before"}, headers=doctor_headers).json()
+
+    updated = client.put(f"/medical_records/{record['id']}", json={"description": "after"}, headers=doctor_headers).json()
+    assert (updated["id"], updated["description"], updated["medicines"]) == (record["id"], "after", [])
+    confirmed = client.patch(f"/meetings/{meeting['id']}/2", headers=doctor_headers).json()
+    assert confirmed["status"] == "Confirmed"
+    assert [item["description"] for item in confirmed["medical_records"]] == ["after"]
@@ -0,0 +1,41 @@
+import asyncio
+import time
+from datetime import datetime
+
+from database import AsyncSessionLocal
+import tokens
+
+
+def revoke(user_id: int, commit: bool):
+    async def run():
+        async with AsyncSessionLocal() as db:
+            await tokens.revoke_user(db, user_id)
+            if commit:
+                await db.commit()
+            else:
+                await db.rollback()
+    asyncio.run(run())
+
+
+def test_user_revocation_applies_only_once_committed(client):
+    revoke(90001, commit=False)
+    assert 90001 not in tokens.revocations.user_cutoffs
+    revoke(90002, commit=True)
+    assert 90002 in tokens.revocations.user_cutoffs
+
+
+def test_refresh_keeps_revocations_made_here(client):
+    # As if the refresh had read the table just before these commits
+    tokens.revocations.add_user(90003, datetime.utcnow())
+    tokens.revocations.add_token("not-in-the-table", time.time() + 60)
+    cutoff = tokens.revocations.user_cutoffs[90003]
+    asyncio.run(tokens.revocations.refresh())
+
+    assert tokens.revocations.user_cutoffs[90003] == cutoff
+    assert "not-in-the-table" in tokens.revocations.filter
+
+
+def test_logged_out_token_is_rejected(client, make_user):
+    _, headers = make_user("patient")
+    assert client.post("/logout", headers=headers).status_code == 204
+    assert client.get("/doctors", headers=headers).status_code == 401
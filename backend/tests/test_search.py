@@ -0,0 +1,56 @@
+import uuid
+
+
+def records_for(client, make_user, doctor_headers, doctor, descriptions):
+    patient, patient_headers = make_user("patient")
+    ids = []
+    for hour, description in enumerate(descriptions, start=9):
+        meeting = client.post(f"/patients/{patient['id']}/appointments/{doctor['id']}", json={"scheduled_date": f"2030-08-01T{hour:02d}:00:00"}, headers=patient_headers).json()
+        ids.append(client.post(f"/meetings/{meeting['id']}/records", json={"description": description}, headers=doctor_headers).json()["id"])
+    return patient_headers, ids
+
+
+def search(client, headers, q, **params):
+    response = client.get("/search", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_hits_are_ranked_and_scoped_to_the_caller(client, make_user, confirmed_doctor):
+    term = f"zq{uuid.uuid4().hex[:10]}"
+    doctor, doctor_headers = confirmed_doctor
+    patient_headers, (strong, weak) = records_for(client, make_user, doctor_headers, doctor, [
+        f"{term} {term} {term}",
+        f"{term} mentioned once among a great many other words about the visit and the follow up",
+    ])
+    other_doctor, other_headers = make_user("doctor")
+    _, admin_headers = make_user("admin")
+    assert client.put(f"/doctors/{other_doctor['id']}/confirm", headers=admin_headers).status_code == 200
+    _, (elsewhere,) = records_for(client, make_user, other_headers, other_doctor, [f"{term} elsewhere"])
+
+    assert [hit["id"] for hit in search(client, doctor_headers, term).json()] == [strong, weak]
+    assert [hit["id"] for hit in search(client, patient_headers, term).json()] == [strong, weak]
+    assert [hit["id"] for hit in search(client, other_headers, term).json()] == [elsewhere]
+    assert sorted(hit["id"] for hit in search(client, admin_headers, term).json()) == sorted([strong, weak, elsewhere])
+
+
+def test_hits_page_by_rank(client, make_user, confirmed_doctor):
+    term = f"zq{uuid.uuid4().hex[:10]}"
+    doctor, doctor_headers = confirmed_doctor
+    _, ids = records_for(client, make_user, doctor_headers, doctor, [f"{term} {term}", f"{term} and more words", f"{term} and a few more words here"])
+
+    first = search(client, doctor_headers, term, limit=2)
+    second = search(client, doctor_headers, term, limit=2, cursor=first.headers["x-next-cursor"])
+    assert [hit["id"] for hit in first.json() + second.json()] == ids
+    assert "x-next-cursor" not in second.headers
+
+
+def test_medicines_are_found_by_name(client, make_user, confirmed_doctor):
+    term = f"zq{uuid.uuid4().hex[:10]}"
+    doctor, doctor_headers = confirmed_doctor
+    _, (record,) = records_for(client, make_user, doctor_headers, doctor, ["checkup"])
+    medicine = client.post(f"/medical_records/{record}/medicines", json={"name": term, "dosage": 1.0, "frequency": "daily"}, headers=doctor_headers).json()
+
+    hits = search(client, doctor_headers, term, target="medicines").json()
+    assert [(hit["id"], hit["medical_record_id"], hit["text"]) for hit in hits] == [(medicine["id"], record, term)]
+    assert search(client, doctor_headers, term).json() == []  # Not in any record description
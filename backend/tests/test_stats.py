@@ -0,0 +1,9 @@
+def test_stats_accept_aware_range(client, make_user, confirmed_doctor):
+    doctor, doctor_headers = confirmed_doctor
+    _, admin_headers = make_user("admin")
+    params = {"date_from": "2030-01-01T00:00:00Z", "date_to": "2030-02-01T00:00:00+01:00"}
+
+    response = client.get("/stats", params=params, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["date_to"] == "2030-01-31T23:00:00"
+    assert client.get(f"/doctors/{doctor['id']}/stats", params=params, headers=doctor_headers).status_code == 200
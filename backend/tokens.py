@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import math
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from jose import JWTError, jwt
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, on_commit
+import models
+
+SECRET_KEY = os.environ.get("SECRET_KEY", "sdh433423sd342345lklvb99034")
+ALGORITHM = os.environ.get("ALGORITHM", "HS256")
+# Tokens never outlive this, which also bounds how long a revocation row has to be kept
+MAX_TOKEN_LIFETIME = timedelta(minutes=int(os.getenv("MAX_TOKEN_LIFETIME_MINUTES", "60")))
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "30"))
+REVOCATION_ERROR_RATE = 0.001  # Bloom filter false positive rate; each one costs a confirming query
+MIN_FILTER_CAPACITY = 1024
+
+# -------------------------
+# Signing keys
+# -------------------------
+# JWT_KEYS="2026-10:new-secret,2026-04:old-secret" lists every key that verifies; JWT_ACTIVE_KID
+# (by default the first) signs, and its id goes in the token's "kid" header. To rotate, add the new
+# key everywhere, then make it active, then drop the old one after MAX_TOKEN_LIFETIME. Without
+# JWT_KEYS, SECRET_KEY is the only key.
+
+def _parse_keys(spec: Optional[str]) -> Dict[str, str]:
+    if not spec:
+        return {"default": SECRET_KEY}
+    keys = {}
+    for entry in spec.split(","):
+        kid, separator, secret = entry.strip().partition(":")
+        if not separator or not kid or not secret:
+            raise ValueError("JWT_KEYS entries must look like 'kid:secret'.")
+        keys[kid] = secret
+    return keys
+
+
+KEYS = _parse_keys(os.getenv("JWT_KEYS"))
+ACTIVE_KID = os.getenv("JWT_ACTIVE_KID") or next(iter(KEYS))
+
+if ACTIVE_KID not in KEYS:
+    raise ValueError(f"JWT_ACTIVE_KID '{ACTIVE_KID}' is not listed in JWT_KEYS.")
+
+
+def encode(claims: dict, expires_delta: timedelta) -> str:
+    now = datetime.now(timezone.utc)
+    to_encode = {
+        **claims,
+        "iat": now.timestamp(),  # Fractional, so a revocation cuts off exactly at its instant
+        "exp": now + min(expires_delta, MAX_TOKEN_LIFETIME),
+        "jti": uuid.uuid4().hex,  # Lets a single token be revoked
+    }
+    return jwt.encode(to_encode, KEYS[ACTIVE_KID], algorithm=ALGORITHM, headers={"kid": ACTIVE_KID})
+
+
+async def decode(token: str) -> dict:
+    # Signature, expiry and revocation, all from the token and process memory. Raises JWTError.
+    # Tokens from before key rotation carry no kid and are checked against the active key.
+    kid = jwt.get_unverified_header(token).get("kid", ACTIVE_KID)
+    key = KEYS.get(kid)
+    if key is None:
+        raise JWTError("Unknown signing key")
+    claims = jwt.decode(token, key, algorithms=[ALGORITHM])
+    if await revocations.is_revoked(claims):
+        raise JWTError("Token has been revoked")
+    return claims
+
+# -------------------------
+# Revocation
+# -------------------------
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = REVOCATION_ERROR_RATE):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    # This process's view of revoked_tokens: a Bloom filter of revoked jtis and the exact
+    # cutoffs of user-wide revocations, which are few (account changes and deletions). Rebuilt
+    # from the table every REVOCATION_REFRESH_SECONDS, so a revocation made by another worker
+    # applies within that interval and one made here applies as soon as it commits. A filter hit
+    # is confirmed against the table: a false positive costs a query, never a wrongly rejected token.
+    def __init__(self, refresh_seconds: float = REVOCATION_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.filter = BloomFilter(MIN_FILTER_CAPACITY)
+        self.user_cutoffs: Dict[int, float] = {}
+        self.local_tokens: Dict[str, float] = {}  # jti -> expiry of tokens revoked by this process
+        self.loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.refreshes = 0
+        self.confirmations = 0
+
+    def add_token(self, jti: str, expires_at: float):
+        self.filter.add(jti)
+        self.local_tokens[jti] = expires_at
+
+    def add_user(self, user_id: int, issued_before: datetime):
+        cutoff = issued_before.replace(tzinfo=timezone.utc).timestamp()
+        self.user_cutoffs[user_id] = max(cutoff, self.user_cutoffs.get(user_id, cutoff))
+
+    async def is_revoked(self, claims: dict) -> bool:
+        await self._ensure_fresh()
+        cutoff = self.user_cutoffs.get(claims.get("id"))
+        if cutoff is not None and claims.get("iat", 0) < cutoff:
+            return True
+        jti = claims.get("jti")
+        if jti is None or jti not in self.filter:
+            return False
+        self.confirmations += 1
+        async with AsyncSessionLocal() as db:
+            stmt = select(models.RevokedToken.id).where(models.RevokedToken.jti == jti).limit(1)
+            return await db.scalar(stmt) is not None
+
+    async def _ensure_fresh(self):
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.refresh_seconds:
+            return
+        async with self._lock:
+            # Concurrent requests wait for the one refresh instead of each running their own
+            if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.refresh_seconds:
+                await self.refresh()
+
+    async def refresh(self):
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at < now), execution_options={"synchronize_session": False})
+            await db.commit()
+            rows = (await db.execute(
+                select(models.RevokedToken.jti, models.RevokedToken.user_id, models.RevokedToken.issued_before)
+            )).all()
+        # Revocations this process made are merged back in: the rows may have been read before
+        # their commit. Each is kept until the tokens it covers have expired.
+        horizon = time.time() - MAX_TOKEN_LIFETIME.total_seconds()
+        local_cutoffs = {user_id: cutoff for user_id, cutoff in self.user_cutoffs.items() if cutoff > horizon}
+        self.local_tokens = {jti: expires_at for jti, expires_at in self.local_tokens.items() if expires_at > time.time()}
+        revoked = BloomFilter(max(MIN_FILTER_CAPACITY, 2 * (len(rows) + len(self.local_tokens))))
+        self.user_cutoffs = {}
+        for jti, user_id, issued_before in rows:
+            if jti is not None:
+                revoked.add(jti)
+            if user_id is not None and issued_before is not None:
+                self.add_user(user_id, issued_before)
+        for jti in self.local_tokens:
+            revoked.add(jti)
+        for user_id, cutoff in local_cutoffs.items():
+            self.user_cutoffs[user_id] = max(cutoff, self.user_cutoffs.get(user_id, cutoff))
+        self.filter = revoked
+        self.loaded_at = time.monotonic()
+        self.refreshes += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "signing_keys": list(KEYS),
+            "active_kid": ACTIVE_KID,
+            "revoked_tokens": self.filter.count,
+            "revoked_users": len(self.user_cutoffs),
+            "filter_bits": self.filter.size,
+            "filter_hashes": self.filter.hashes,
+            "refreshes": self.refreshes,
+            "confirmations": self.confirmations,
+        }
+
+
+revocations = RevocationList()
+
+
+async def revoke_token(db: AsyncSession, claims: dict):
+    # A single token, e.g. on logout
+    expires_at = datetime.fromtimestamp(claims["exp"], timezone.utc).replace(tzinfo=None)
+    await db.execute(insert(models.RevokedToken).values(jti=claims["jti"], expires_at=expires_at, created_at=datetime.utcnow()))
+    await db.commit()
+    revocations.add_token(claims["jti"], claims["exp"])
+
+
+async def revoke_user(db: AsyncSession, user_id: int):
+    # Every token issued to the user up to now. Joins the caller's transaction; the caller commits,
+    # and only then does this process start rejecting the tokens.
+    now = datetime.utcnow()
+    await db.execute(insert(models.RevokedToken).values(
+        user_id=user_id, issued_before=now, expires_at=now + MAX_TOKEN_LIFETIME, created_at=now,
+    ))
+    on_commit(db, lambda: revocations.add_user(user_id, now))
@@ -1,9 +1,30 @@
-import React, { useContext, useState } from "react";
+import React, { useContext, useEffect, useState } from "react";
 import { UserContext } from "../../context/UserContext";
 import { useNavigate } from "react-router-dom";
 import Modal from "./Modal";
 import "./Home.css";
 
+// List endpoints answer one page at a time; follow X-Next-Cursor until the last page.
+// Returns null if any page fails.
+const fetchAllPages = async (url, token) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const pageUrl = cursor ? `${url}?cursor=${encodeURIComponent(cursor)}` : url;
+    const response = await fetch(pageUrl, {
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    });
+    if (!response.ok) {
+      return null;
+    }
+    items.push(...(await response.json()));
+    cursor = response.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return items;
+};
+
 const HomePage = () => {
   const [token, userRole, userName, userId] = useContext(UserContext);
 
@@ -25,13 +46,8 @@ const HomePage = () => {
   //################################################################################
   const fetchDoctors = async () => {
     try {
-      const response = await fetch("http://localhost:8000/doctors", {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
-      if (response.ok) {
-        const data = await response.json();
+      const data = await fetchAllPages("http://localhost:8000/doctors", token);
+      if (data) {
         setDoctors(data);
         setShowDoctors(true); // Show doctors list after fetching data
       } else {
@@ -44,13 +60,8 @@ const HomePage = () => {
 
   const fetchPatients= async () => {
     try {
-      const response = await fetch("http://localhost:8000/patients", {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
-      if (response.ok) {
-        const data = await response.json();
+      const data = await fetchAllPages("http://localhost:8000/patients", token);
+      if (data) {
         setPatients(data);
         setShowPatients(true); // Show doctors list after fetching data
       } else {
@@ -64,13 +75,8 @@ const HomePage = () => {
   //################################################################################
   const fetchPatientRequests = async () => {
     try {
-      const response = await fetch("http://localhost:8000/patient_requests", {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
-      if (response.ok) {
-        const data = await response.json();
+      const data = await fetchAllPages("http://localhost:8000/patient_requests", token);
+      if (data) {
         setRequests(data);
         setShowRequests(true); // Show requests after fetching
       } else {
@@ -83,13 +89,8 @@ const HomePage = () => {
 
   const fetchDoctorRequests = async () => {
     try {
-      const response = await fetch("http://localhost:8000/doctor_requests", {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
-      if (response.ok) {
-        const data = await response.json();
+      const data = await fetchAllPages("http://localhost:8000/doctor_requests", token);
+      if (data) {
         setRequests(data);
         setShowRequests(true); // Show requests after fetching
         setShowMedicalRecords(false)
@@ -101,6 +102,33 @@ const HomePage = () => {
     }
   };
 
+  //################################################################################
+  // While the requests list is open, the server pushes meeting changes instead of us re-fetching
+  useEffect(() => {
+    if (!token || !showRequests) {
+      return undefined;
+    }
+    const source = new EventSource(`http://localhost:8000/events?token=${encodeURIComponent(token)}`);
+    const refetch = () => (userRole === "doctor" ? fetchDoctorRequests() : fetchPatientRequests());
+    const applyChange = (event) => {
+      const { meeting } = JSON.parse(event.data);
+      setRequests((prevRequests) =>
+        prevRequests.map((req) => (req.id === meeting.id ? { ...req, ...meeting } : req))
+      );
+    };
+    const removeMeeting = (event) => {
+      const { meeting } = JSON.parse(event.data);
+      setRequests((prevRequests) => prevRequests.filter((req) => req.id !== meeting.id));
+    };
+    source.addEventListener("meeting_created", refetch);
+    source.addEventListener("meeting_confirmed", applyChange);
+    source.addEventListener("meeting_rejected", applyChange);
+    source.addEventListener("meeting_updated", applyChange);
+    source.addEventListener("meeting_deleted", removeMeeting);
+    source.addEventListener("resync", refetch);
+    return () => source.close();
+  }, [token, showRequests, userRole]); // eslint-disable-line react-hooks/exhaustive-deps
+
   //################################################################################
   const handleDoctorsListClick = () => {
     if (!token) {
@@ -283,13 +311,8 @@ const HomePage = () => {
 
   const fetchMedicalRecords = async () => {
     try {
-      const response = await fetch("http://localhost:8000/medical_records", {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
-      if (response.ok) {
-        const data = await response.json();
+      const data = await fetchAllPages("http://localhost:8000/medical_records", token);
+      if (data) {
         setMedicalRecords(data);
         setShowMedicalRecords(true); // Show the medical records list
         // setShowDoctors(false);